@@ -1,14 +1,36 @@
 import os
+import sys
+import json
 import asyncio
 import time
+from collections import OrderedDict
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
-from meteostat import Point, Daily
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+# The shared modules (cache_backend.py, ...) live at the repository root: run
+# from there as ``uvicorn api_llm.main:app``, or ``pip install -e .`` first.
+
+# first, so the import time of everything below is measured (lifecycle.py)
+from lifecycle import Lifecycle
+lifecycle = Lifecycle("api_llm")
+
+from cache_backend import CacheBackend, get_backend
+from grid import snap, cell_key
+from rate_limit import Scheduler, RateLimited, INTERACTIVE, BATCH, BACKGROUND
+from breaker import Breakers, CircuitOpen
+from metrics import Metrics, MetricsMiddleware, stage
+from payloads import CompressionMiddleware, dumps, stream_json
+from meteostat_store import MeteostatStore, DEFAULT_DATA_DIR as METEOSTAT_DATA_DIR
+from series_cache import SeriesCache, DEFAULT_SERIES_PATH, PAST_TTL
+from prefetch import Prefetcher, PrefetchMiddleware, prefetching, refresh_within
 
 
 import httpx
 from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,70 +39,677 @@ OPEN_METEO_BASE = os.getenv("OPEN_METEO_BASE", "https://api.open-meteo.com/v1/fo
 NASA_POWER_BASE = os.getenv("NASA_POWER_BASE", "https://power.larc.nasa.gov/api/temporal")
 IMD_BASE = "https://mausam.imd.gov.in/api" 
 
-app = FastAPI(title="LLM Data Proxy (Weather/Agro/Hydro)")
+@asynccontextmanager
+async def _lifespan(app):
+    with lifecycle.starting():
+        await _startup()
+    # meteostat (and pandas under it) is imported on first use; load it while idle
+    lifecycle.warm_imports(["meteostat"])
+    try:
+        yield
+    finally:
+        lifecycle.stopping()
+        await _shutdown()
+
+metrics = Metrics("api_llm")
+app = FastAPI(title="LLM Data Proxy (Weather/Agro/Hydro)", default_response_class=metrics.JSONResponse,
+              lifespan=_lifespan)
+lifecycle.register(metrics.registry)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Replays popular and configured GETs ahead of expiry; see prefetch.py
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+prefetcher = Prefetcher(app, os.getenv("PREFETCH_CONFIG"), include=("/api/weather/", "/api/agro/", "/api/imd/"))
+app.add_middleware(PrefetchMiddleware, prefetcher=prefetcher)
 
 # -------------------------
 # Simple async TTL cache
 # -------------------------
 class SimpleTTLCache:
-    def __init__(self):
-        self._store: Dict[str, Dict[str, Any]] = {}
+    """
+    Bounded async TTL cache with request coalescing.
+
+    Only one fetch per key runs at a time; concurrent callers await the same
+    in-flight task and share its result or exception. Entries past their TTL
+    are still served for ``stale_ttl`` seconds while a single background
+    refresh replaces them, so callers never block at the expiry boundary.
+
+    The store is kept in LRU order and bounded by ``max_entries`` and an
+    approximate ``max_bytes`` budget (size of the JSON-encoded value).
+    ``sweep()`` drops entries that are past their stale window.
+
+    An optional shared ``backend`` (see cache_backend.py) sits behind the
+    in-process store: misses read through it before calling upstream, and
+    fresh values are written back so other workers and restarts reuse them.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 backend: Optional[CacheBackend] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self._store: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
         self._lock = asyncio.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0   # callers that joined a fetch already in flight
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expired = 0
 
-    async def get_or_set(self, key: str, ttl: int, coro):
+    async def get_or_set(self, key: str, ttl: int, coro, stale_ttl: Optional[int] = None):
+        # stale_ttl defaults to the entry's own TTL
+        stale_ttl = ttl if stale_ttl is None else stale_ttl
         now = time.time()
+        # a prefetch replay refreshes entries that are about to expire
+        ahead = refresh_within.get()
+        async with self._lock:
+            item = self._store.get(key)
+            if item and item["expiry"] - now >= ahead:
+                self._store.move_to_end(key)
+                self.hits += 1
+                return item["value"]
+            if item and item["expiry"] <= now < item["expiry"] + item["stale_ttl"] and not ahead:
+                # expired but still servable: refresh in the background
+                self._store.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self._start_fetch(key, ttl, stale_ttl, coro)
+                return item["value"]
+            task = self._inflight.get(key)
+            if task is None:
+                self.misses += 1
+                task = self._start_fetch(key, ttl, stale_ttl, coro)
+            else:
+                self.coalesced += 1
+        # shield so a cancelled waiter does not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Fresh value for ``key`` from memory or the shared backend, else None."""
         async with self._lock:
             item = self._store.get(key)
-            if item and item["expiry"] > now:
+            if item and item["expiry"] > time.time():
+                self._store.move_to_end(key)
+                self.hits += 1
                 return item["value"]
-        # not found or expired, fetch
-        value = await coro()
+        hit = await self._backend_read(key)
+        if hit is None:
+            return None
+        value, expiry, size = hit
+        self.shared_hits += 1
         async with self._lock:
-            self._store[key] = {"value": value, "expiry": now + ttl}
+            self._put(key, {"value": value, "expiry": expiry, "stale_ttl": 0, "size": size})
         return value
 
-cache = SimpleTTLCache()
-client = httpx.AsyncClient()
+    async def last_good(self, key: str) -> Optional[Any]:
+        """Most recent value for ``key`` however old (within the backend's stale grace), else None."""
+        async with self._lock:
+            item = self._store.get(key)
+            if item is not None:
+                return item["value"]
+        hit = await self._backend_call("get_stale", key)
+        return hit[0] if hit is not None else None
+
+    async def set(self, key: str, value: Any, ttl: int, stale_ttl: Optional[int] = None):
+        stale_ttl = ttl if stale_ttl is None else stale_ttl
+        size = await self._backend_write(key, value, ttl)
+        async with self._lock:
+            self._put(key, {"value": value, "expiry": time.time() + ttl, "stale_ttl": stale_ttl, "size": size})
+
+    def _start_fetch(self, key: str, ttl: int, stale_ttl: int, coro) -> asyncio.Task:
+        # must be called with self._lock held
+        task = asyncio.ensure_future(self._fetch(key, ttl, stale_ttl, coro))
+        task.add_done_callback(_consume_task_exception)
+        self._inflight[key] = task
+        return task
+
+    async def _fetch(self, key: str, ttl: int, stale_ttl: int, coro):
+        try:
+            hit = await self._backend_read(key)
+            if hit is not None and hit[1] - time.time() >= refresh_within.get():
+                value, expiry, size = hit
+                self.shared_hits += 1
+            else:
+                value = await coro()
+                expiry = time.time() + ttl
+                size = await self._backend_write(key, value, ttl)
+            async with self._lock:
+                self._put(key, {"value": value, "expiry": expiry, "stale_ttl": stale_ttl, "size": size})
+            return value
+        finally:
+            async with self._lock:
+                self._inflight.pop(key, None)
+
+    async def _backend_call(self, method: str, *args):
+        # the shared store is an optimisation; never fail a request over it
+        if self.backend is None:
+            return None
+        try:
+            return await asyncio.to_thread(getattr(self.backend, method), *args)
+        except Exception:
+            return None
+
+    # Sizing encodes the whole value, which for Meteostat and batch envelopes
+    # is too slow for the event loop; it runs on the thread that does the
+    # backend read or write anyway.
+
+    async def _backend_read(self, key: str) -> Optional[tuple]:
+        """``(value, expires_at, size)`` from the shared backend, else None."""
+        def read():
+            hit = self.backend.get(key)
+            return None if hit is None else (hit[0], hit[1], _approx_size(hit[0]))
+        if self.backend is None:
+            return None
+        try:
+            return await asyncio.to_thread(read)
+        except Exception:
+            return None
+
+    async def _backend_write(self, key: str, value: Any, ttl: int) -> int:
+        """Write ``value`` through to the shared backend; returns its size."""
+        def write():
+            if self.backend is not None:
+                try:
+                    self.backend.set(key, value, ttl)
+                except Exception:
+                    pass   # the shared store is an optimisation; never fail a request over it
+            return _approx_size(value)
+        return await asyncio.to_thread(write)
+
+    def _put(self, key: str, item: Dict[str, Any]):
+        # must be called with self._lock held
+        self._remove(key)
+        if item["size"] > self.max_bytes:
+            # larger than the whole budget; serve it but don't keep it
+            return
+        self._store[key] = item
+        self._bytes += item["size"]
+        while self._store and (len(self._store) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._store))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> bool:
+        item = self._store.pop(key, None)
+        if item is None:
+            return False
+        self._bytes -= item["size"]
+        return True
+
+    async def sweep(self) -> int:
+        """Drop entries past their stale window; returns how many were removed."""
+        now = time.time()
+        async with self._lock:
+            dead = [k for k, it in self._store.items() if it["expiry"] + it["stale_ttl"] <= now]
+            for k in dead:
+                self._remove(k)
+            self.expired += len(dead)
+        await self._backend_call("purge_expired")
+        return len(dead)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._store),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "shared_hits": self.shared_hits,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "inflight": len(self._inflight),
+        }
+
+
+def _consume_task_exception(task: asyncio.Task):
+    # Background refreshes may have no waiter; mark their errors as retrieved.
+    if not task.cancelled():
+        task.exception()
+
+def _approx_size(value: Any) -> int:
+    # JSON length is a cheap, stable proxy for the memory a payload pins
+    try:
+        return len(dumps(value))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+cache = SimpleTTLCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    backend=get_backend(),
+)
+CACHE_SWEEP_INTERVAL = int(os.getenv("CACHE_SWEEP_INTERVAL", "60"))
+client: Optional[httpx.AsyncClient] = None   # opened and closed by the lifespan
+
+# Provider usage policies (requests/s, burst); see rate_limit.py
+UPSTREAM_LIMITS = {
+    "api.open-meteo.com": {"rate": 10, "burst": 20},
+    "power.larc.nasa.gov": {"rate": 2, "burst": 5},
+    "mausam.imd.gov.in": {"rate": 1, "burst": 2},
+    "bulk.meteostat.net": {"rate": 2, "burst": 5},
+}
+scheduler = Scheduler(UPSTREAM_LIMITS)
+breakers = Breakers()
+
+# Per-slot store for hourly series, so overlapping date ranges are fetched once
+series_cache = SeriesCache(os.getenv("AGRI_SERIES_PATH", DEFAULT_SERIES_PATH))
+
+# Meteostat runs on its own threads, with bulk files and fetched days kept on disk
+meteostat_store = MeteostatStore(
+    os.getenv("METEOSTAT_DATA_DIR", METEOSTAT_DATA_DIR),
+    workers=int(os.getenv("METEOSTAT_WORKERS", "2")),
+    max_bytes=int(os.getenv("METEOSTAT_MAX_BYTES", str(512 * 1024 * 1024))),
+)
+
+async def _upstream_get(url: str, params: Dict[str, Any], timeout: float, priority: int = INTERACTIVE) -> httpx.Response:
+    """
+    client.get behind the upstream's circuit breaker and rate limiter. Raises
+    CircuitOpen while the upstream is known to be down and RateLimited instead
+    of queueing too long.
+    """
+    host = urlsplit(url).hostname
+    if prefetching():
+        priority = BACKGROUND   # cache warm-up never competes with users
+    breaker = breakers.get(host)
+    breaker.before_call()
+    healthy, error = None, None
+    try:
+        await scheduler.acquire(host, priority=priority)
+        t0 = time.perf_counter()
+        try:
+            response = await client.get(url, params=params, timeout=timeout)
+        except httpx.RequestError as e:
+            metrics.observe_upstream(host, type(e).__name__, time.perf_counter() - t0)
+            healthy, error = False, f"{type(e).__name__}: {e}"
+            raise
+        metrics.observe_upstream(host, response.status_code, time.perf_counter() - t0)
+        healthy = response.status_code < 500
+        if not healthy:
+            error = f"HTTP {response.status_code}"
+    finally:
+        breaker.after_call(healthy, error)
+    if response.status_code == 429:
+        try:
+            backoff = float(response.headers.get("Retry-After", 1))
+        except ValueError:
+            backoff = 1.0
+        scheduler.penalize(host, None, backoff)
+    return response
+
+@app.exception_handler(RateLimited)
+@app.exception_handler(CircuitOpen)
+async def _upstream_unavailable(request, exc):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": exc.retry_after_header})
+
+async def _get_or_stale(key: str, ttl: int, fetch) -> Dict[str, Any]:
+    """cache.get_or_set, but answer from the last good payload (marked stale) while the upstream's breaker is open."""
+    try:
+        with stage("cache"):
+            return await cache.get_or_set(key, ttl, fetch)
+    except CircuitOpen:
+        payload = await cache.last_good(key)
+        if payload is None:
+            raise
+        return {**payload, "stale": True}
+
+async def _sweep_cache_forever():
+    while True:
+        await asyncio.sleep(CACHE_SWEEP_INTERVAL)
+        await cache.sweep()
+        await asyncio.to_thread(series_cache.purge_expired)
+
+async def _startup():
+    global client
+    client = httpx.AsyncClient()
+    app.state.cache_sweeper = asyncio.create_task(_sweep_cache_forever())
+    if PREFETCH_ENABLED:
+        prefetcher.start()
+
+async def _shutdown():
+    app.state.cache_sweeper.cancel()
+    await prefetcher.stop()
+    meteostat_store.close()
+    await client.aclose()
+
+def _at_point(payload: Dict[str, Any], latitude: float, longitude: float) -> Dict[str, Any]:
+    # cached payloads are shared by a whole grid cell; echo the caller's own point
+    return {**payload, "latitude": latitude, "longitude": longitude}
+
+# -------------------------
+# Response shaping: fields= projection and compact (columnar) mode
+# -------------------------
+# Compact data is {"columns": {"time": [...], var: [...]}, "units": {var: unit}}
+FIELDS_DOC = "Comma-separated variables to keep (default: all)"
+COMPACT_DOC = "Columnar output: one array per variable instead of the upstream layout"
+STREAM_MIN_ROWS = int(os.getenv("STREAM_MIN_ROWS", "1000"))   # stream row lists at least this long
+
+METEOSTAT_UNITS = {"tavg": "°C", "tmin": "°C", "tmax": "°C", "prcp": "mm", "snow": "mm",
+                   "wdir": "°", "wspd": "km/h", "wpgt": "km/h", "pres": "hPa", "tsun": "min"}
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+def _shape_open_meteo(data: Dict[str, Any], fields: Optional[List[str]], compact: bool) -> Dict[str, Any]:
+    hourly = data.get("hourly") or {}
+    units = data.get("hourly_units") or {}
+    keep = [k for k in hourly if k != "time" and (fields is None or k in fields)]
+    if compact:
+        return {"columns": {"time": hourly.get("time", []), **{k: hourly[k] for k in keep}},
+                "units": {k: units.get(k) for k in keep}}
+    if fields is None:
+        return data
+    return {**data,
+            "hourly": {"time": hourly.get("time", []), **{k: hourly[k] for k in keep}},
+            "hourly_units": {k: v for k, v in units.items() if k == "time" or k in keep}}
+
+def _shape_nasa_power(data: Dict[str, Any], fields: Optional[List[str]], compact: bool) -> Dict[str, Any]:
+    series = (data.get("properties") or {}).get("parameter") or {}
+    meta = data.get("parameters") or {}
+    keep = [k for k in series if fields is None or k in fields]
+    if compact:
+        fill = (data.get("header") or {}).get("fill_value", -999)
+        times = list(series[keep[0]]) if keep else []
+        columns = {"time": times}
+        for k in keep:
+            values = series[k]
+            columns[k] = [None if values.get(t) == fill else values.get(t) for t in times]
+        return {"columns": columns, "units": {k: (meta.get(k) or {}).get("units") for k in keep}}
+    if fields is None:
+        return data
+    return {**data,
+            "properties": {**data.get("properties", {}), "parameter": {k: series[k] for k in keep}},
+            "parameters": {k: v for k, v in meta.items() if k in keep}}
+
+def _shape_records(rows: List[Dict[str, Any]], fields: Optional[List[str]], compact: bool, units: Dict[str, str]):
+    cols = [k for k in (rows[0] if rows else {}) if k != "time" and (fields is None or k in fields)]
+    if compact:
+        columns = {"time": [r.get("time") for r in rows]}
+        for k in cols:
+            columns[k] = [r.get(k) for r in rows]
+        return {"columns": columns, "units": {k: units.get(k) for k in cols}}
+    if fields is None:
+        return rows
+    return [{"time": r.get("time"), **{k: r.get(k) for k in cols}} for r in rows]
+
+def _shaped(envelope: Dict[str, Any], shape, fields: Optional[List[str]], compact: bool, *args) -> Dict[str, Any]:
+    if fields is None and not compact:
+        return envelope
+    return {**envelope, "data": shape(envelope["data"], fields, compact, *args)}
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return cache.stats()
+
+@app.get("/api/upstreams/status")
+def get_upstreams_status():
+    return {"breakers": breakers.status(), "rate_limits": scheduler.stats()}
+
+@app.get("/api/prefetch/status")
+def get_prefetch_status():
+    return prefetcher.stats()
+
+_CACHE_EVENTS = ("hits", "stale_hits", "misses", "coalesced", "shared_hits", "evictions", "expired")
+metrics.registry.callback("simple_ttl_cache_entries", "Entries in the in-process cache", lambda: cache.stats()["entries"])
+metrics.registry.callback("simple_ttl_cache_bytes", "Approximate bytes held by the in-process cache",
+                          lambda: cache.stats()["bytes"])
+metrics.registry.callback("simple_ttl_cache_inflight", "Upstream fetches in flight", lambda: cache.stats()["inflight"])
+metrics.registry.callback(
+    "simple_ttl_cache_events_total", "In-process cache lookups and evictions by kind",
+    lambda: {e: v for e, v in cache.stats().items() if e in _CACHE_EVENTS}, type="counter", labelnames=("event",))
+metrics.registry.callback(
+    "series_cache_days_total", "Days of time-series requests answered from stored slots (hit) or fetched (miss)",
+    lambda: {"hit": series_cache.hits, "miss": series_cache.misses}, type="counter", labelnames=("result",))
+metrics.registry.callback("prefetch_replays_total", "Requests replayed by the cache warm-up",
+                          lambda: prefetcher.counts["replays"], type="counter")
+metrics.registry.callback(
+    "upstream_circuit_open", "1 while the upstream's circuit breaker is open or half-open",
+    lambda: {host: int(b["state"] != "closed") for host, b in breakers.status().items()}, labelnames=("upstream",))
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return await metrics.endpoint()
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness probe: 200 once startup has finished, 503 before that and while shutting down."""
+    return JSONResponse(lifecycle.report(), status_code=200 if lifecycle.ready else 503)
+
+# --------------------------
+# Time-series helpers (see series_cache.py)
+# --------------------------
+IST = timezone(timedelta(hours=5, minutes=30))
+SERIES_MAX_DAYS = int(os.getenv("SERIES_MAX_DAYS", "366"))
+
+def _date_range(start: str, end: str, fmt: str) -> List[date]:
+    try:
+        first = datetime.strptime(start, fmt).date()
+        last = datetime.strptime(end, fmt).date()
+    except ValueError:
+        pattern = fmt.replace("%Y", "YYYY").replace("%m", "MM").replace("%d", "DD")
+        raise HTTPException(status_code=400, detail=f"Invalid date format. Use {pattern}.")
+    if last < first:
+        raise HTTPException(status_code=400, detail="End date must not be before start date.")
+    if (last - first).days >= SERIES_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {SERIES_MAX_DAYS} days.")
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+def _slot_expiry(settled_before: str, ttl: int, fill_value=None):
+    """Slots before ``settled_before`` keep PAST_TTL; later and missing values expire with ``ttl``."""
+    def expires_at(slot: str, value) -> float:
+        now = time.time()
+        if value is None or value == fill_value or slot >= settled_before:
+            return now + ttl
+        return now + PAST_TTL
+    return expires_at
+
+def _slot_horizon(ttl: int) -> float:
+    """
+    How long stored slots must stay live to be reused. 0 normally. During a
+    prefetch replay, slots expiring within its horizon are fetched again too.
+    Otherwise the rebuilt envelope would carry them well past their expiry.
+    The horizon is capped at ``ttl``, so a full-day refresh does not
+    re-download settled history.
+    """
+    return min(refresh_within.get(), ttl)
 
 # --------------------------
 # Open-Meteo Weather
 # --------------------------
+OPEN_METEO_HOURLY = "temperature_2m,relative_humidity_2m,precipitation,weather_code,wind_speed_10m"
+OPEN_METEO_BATCH_SIZE = int(os.getenv("OPEN_METEO_BATCH_SIZE", "50"))   # locations per upstream call
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_POINTS = int(os.getenv("BATCH_MAX_POINTS", "10000"))
+
+def _open_meteo_key(latitude: float, longitude: float) -> str:
+    return f"open_meteo_weather:{cell_key('open_meteo', latitude, longitude)}"
+
+def _open_meteo_envelope(latitude, longitude, grid_lat, grid_lon, data) -> Dict[str, Any]:
+    return {
+        "source": "Open-Meteo",
+        "latitude": latitude,
+        "longitude": longitude,
+        "grid": {"latitude": grid_lat, "longitude": grid_lon},
+        "data": data,
+        "last_updated": str(datetime.utcnow()),
+    }
+
+OPEN_METEO_SETTLE_HOURS = 24   # earlier hours are analysis, not forecast; later runs leave them alone
+
+def _open_meteo_slots(day: date) -> List[str]:
+    return [f"{day.isoformat()}T{h:02d}:00" for h in range(24)]
+
 @app.get("/api/weather/open-meteo")
 async def get_open_meteo_weather(
     latitude: float = Query(..., ge=-90, le=90),
     longitude: float = Query(..., ge=-180, le=180),
-    ttl: int = Query(3600, description="Cache TTL seconds (default 1 hour)"),
+    ttl: int = Query(3600, description="Cache TTL seconds for forecast hours (default 1 hour)"),
+    start_date: Optional[str] = Query(None, description="YYYY-MM-DD (default today, Asia/Kolkata)"),
+    end_date: Optional[str] = Query(None, description="YYYY-MM-DD (default start + 6 days)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DOC, examples=["temperature_2m,precipitation"]),
+    compact: bool = Query(False, description=COMPACT_DOC),
 ):
-    key = f"open_meteo_weather:{latitude}:{longitude}"
+    # snap to the model grid so nearby points share one cache entry
+    key = _open_meteo_key(latitude, longitude)
+    grid_lat, grid_lon = snap("open_meteo", latitude, longitude)
+    today = datetime.now(IST).date()
+    start_date = start_date or today.isoformat()
+    days = _date_range(start_date, end_date or start_date, "%Y-%m-%d")
+    if end_date is None:
+        days = [days[0] + timedelta(days=i) for i in range(7)]
+    if (days[0], days[-1]) != (today, today + timedelta(days=6)):
+        # the default window keeps the plain key, which the batch endpoint shares
+        key = f"{key}:{days[0]}:{days[-1]}"
+    variables = OPEN_METEO_HOURLY.split(",")
 
-    async def _fetch():
+    async def _fetch_range(first: date, last: date):
         params = {
-            "latitude": latitude,
-            "longitude": longitude,
-            "hourly": "temperature_2m,relative_humidity_2m,precipitation,weather_code,wind_speed_10m",
+            "latitude": grid_lat,
+            "longitude": grid_lon,
+            "hourly": OPEN_METEO_HOURLY,
             "timezone": "Asia/Kolkata",
+            "start_date": first.isoformat(),
+            "end_date": last.isoformat(),
         }
         try:
-            response = await client.get(OPEN_METEO_BASE, params=params, timeout=10)
+            response = await _upstream_get(OPEN_METEO_BASE, params, timeout=10)
             response.raise_for_status()
             data = response.json()
-            return {
-                "source": "Open-Meteo",
-                "latitude": latitude,
-                "longitude": longitude,
-                "data": data,
-                "last_updated": str(datetime.utcnow()),
-            }
         except httpx.HTTPStatusError as e:
             raise HTTPException(status_code=e.response.status_code, detail=f"API error: {e}")
         except httpx.RequestError as e:
             raise HTTPException(status_code=503, detail=f"Request failed: {e}")
+        hourly = data.get("hourly") or {}
+        times = hourly.get("time") or []
+        series = {v: dict(zip(times, hourly.get(v) or [])) for v in variables}
+        return series, {k: v for k, v in data.items() if k != "hourly"}
+
+    async def _fetch():
+        settled = (datetime.now(IST) - timedelta(hours=OPEN_METEO_SETTLE_HOURS)).strftime("%Y-%m-%dT%H:00")
+        series, meta = await series_cache.ensure(
+            "open_meteo", cell_key("open_meteo", latitude, longitude), variables, days,
+            _open_meteo_slots, _fetch_range, _slot_expiry(settled, ttl), _slot_horizon(ttl))
+        times = [t for d in days for t in _open_meteo_slots(d)]
+        data = {**(meta or {}), "hourly": {"time": times, **{v: [series[v].get(t) for t in times] for v in variables}}}
+        return _open_meteo_envelope(latitude, longitude, grid_lat, grid_lon, data)
+
+    envelope = _at_point(await _get_or_stale(key, ttl, _fetch), latitude, longitude)
+    return _shaped(envelope, _shape_open_meteo, _parse_fields(fields), compact)
 
-    return await cache.get_or_set(key, ttl, _fetch)
+class BatchPoint(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    id: Optional[str] = None
+
+class OpenMeteoBatchRequest(BaseModel):
+    points: List[BatchPoint]
+    ttl: int = 3600
+    fields: Optional[List[str]] = None
+    compact: bool = False
+
+@app.post("/api/weather/open-meteo/batch")
+async def get_open_meteo_weather_batch(body: OpenMeteoBatchRequest):
+    """
+    Open-Meteo forecasts for many points, streamed as NDJSON (one line per point).
+    Points are grouped by grid cell; uncached cells are fetched with Open-Meteo's
+    multi-location support, OPEN_METEO_BATCH_SIZE cells per call, with at most
+    BATCH_CONCURRENCY calls in flight.
+    """
+    if not body.points:
+        raise HTTPException(status_code=400, detail="'points' must not be empty")
+    if len(body.points) > BATCH_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_POINTS} points per request")
+
+    cells: Dict[str, List[Any]] = {}
+    for i, p in enumerate(body.points):
+        cells.setdefault(_open_meteo_key(p.latitude, p.longitude), []).append((i, p))
+    keys = list(cells)
+    chunks = [keys[i:i + OPEN_METEO_BATCH_SIZE] for i in range(0, len(keys), OPEN_METEO_BATCH_SIZE)]
+
+    async def fetch_chunk(chunk: List[str]) -> List[tuple]:
+        out, missing = [], []
+        for key in chunk:
+            hit = await cache.get(key)
+            if hit is not None:
+                out.append((key, hit, None))
+            else:
+                missing.append(key)
+        if not missing:
+            return out
+        nodes = [snap("open_meteo", cells[k][0][1].latitude, cells[k][0][1].longitude) for k in missing]
+        params = {
+            "latitude": ",".join(str(n[0]) for n in nodes),
+            "longitude": ",".join(str(n[1]) for n in nodes),
+            "hourly": OPEN_METEO_HOURLY,
+            "timezone": "Asia/Kolkata",
+        }
+        try:
+            response = await _upstream_get(OPEN_METEO_BASE, params, timeout=30, priority=BATCH)
+            response.raise_for_status()
+            data = response.json()
+        except RateLimited as e:
+            return out + [(k, None, f"Rate limited: {e}") for k in missing]
+        except CircuitOpen as e:
+            for k in missing:
+                last = await cache.last_good(k)
+                out.append((k, {**last, "stale": True}, None) if last is not None else (k, None, str(e)))
+            return out
+        except httpx.HTTPError as e:
+            return out + [(k, None, f"Request failed: {e}") for k in missing]
+        # a single location comes back as an object, several as a list
+        data = data if isinstance(data, list) else [data]
+        for key, node, loc in zip(missing, nodes, data):
+            env = _open_meteo_envelope(node[0], node[1], node[0], node[1], loc)
+            await cache.set(key, env, body.ttl)
+            out.append((key, env, None))
+        # locations come back in request order; a short answer must not drop points silently
+        err = f"upstream returned {len(data)} of {len(missing)} locations"
+        return out + [(k, None, err) for k in missing[len(data):]]
+
+    async def lines():
+        pending = set()
+        todo = iter(chunks)
+        for chunk in todo:
+            pending.add(asyncio.ensure_future(fetch_chunk(chunk)))
+            if len(pending) >= BATCH_CONCURRENCY:
+                break
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for key, env, err in task.result():
+                    for i, p in cells[key]:
+                        line = {"index": i, "id": p.id}
+                        if err is not None:
+                            line.update({"latitude": p.latitude, "longitude": p.longitude, "error": err})
+                        else:
+                            line.update(_shaped(_at_point(env, p.latitude, p.longitude), _shape_open_meteo,
+                                                body.fields or None, body.compact))
+                        yield dumps(line) + b"\n"
+                nxt = next(todo, None)
+                if nxt is not None:
+                    pending.add(asyncio.ensure_future(fetch_chunk(nxt)))
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 # --------------------------
 # NASA POWER Agro-climatic
 # --------------------------
+NASA_POWER_PARAMETERS = ["T2M", "RH2M", "PRECTOTCORR"]   # Temperature, Relative Humidity, Precipitation
+NASA_POWER_FILL_VALUE = -999
+NASA_POWER_SETTLE_DAYS = 7   # the most recent days are provisional and get revised
+
+def _nasa_power_slots(day: date) -> List[str]:
+    return [f"{day:%Y%m%d}{h:02d}" for h in range(24)]
+
 @app.get("/api/agro/nasa-power")
 async def get_nasa_power_agro(
     latitude: float = Query(..., ge=-90, le=90),
@@ -88,43 +717,61 @@ async def get_nasa_power_agro(
     start_date: str = Query(..., description="Start date in YYYYMMDD format"),
     end_date: str = Query(..., description="End date in YYYYMMDD format"),
     ttl: int = Query(86400, description="Cache TTL seconds (default 1 day)"),
+    fields: Optional[str] = Query(None, description=FIELDS_DOC, examples=["T2M,PRECTOTCORR"]),
+    compact: bool = Query(False, description=COMPACT_DOC),
 ):
-    key = f"nasa_power_agro:{latitude}:{longitude}:{start_date}:{end_date}"
+    key = f"nasa_power_agro:{cell_key('nasa_power', latitude, longitude)}:{start_date}:{end_date}"
+    grid_lat, grid_lon = snap("nasa_power", latitude, longitude)
+    days = _date_range(start_date, end_date, "%Y%m%d")
 
-    async def _fetch():
+    async def _fetch_range(first: date, last: date):
         # Correct NASA POWER endpoint format:
         # https://power.larc.nasa.gov/api/temporal/{temporal}/point
         url = f"{NASA_POWER_BASE}/hourly/point"
 
         params = {
-            "parameters": "T2M,RH2M,PRECTOTCORR",   # Temperature, Relative Humidity, Precipitation
+            "parameters": ",".join(NASA_POWER_PARAMETERS),
             "community": "ag",
-            "longitude": longitude,
-            "latitude": latitude,
-            "start": start_date,   # YYYYMMDD
-            "end": end_date,       # YYYYMMDD
+            "longitude": grid_lon,
+            "latitude": grid_lat,
+            "start": first.strftime("%Y%m%d"),   # YYYYMMDD
+            "end": last.strftime("%Y%m%d"),       # YYYYMMDD
             "format": "JSON",
         }
 
         try:
-            response = await client.get(url, params=params, timeout=30)
+            response = await _upstream_get(url, params, timeout=30)
             response.raise_for_status()
             data = response.json()
-            return {
-                "source": "NASA POWER",
-                "latitude": latitude,
-                "longitude": longitude,
-                "start_date": start_date,
-                "end_date": end_date,
-                "data": data,
-                "last_updated": str(datetime.utcnow()),
-            }
         except httpx.HTTPStatusError as e:
             raise HTTPException(status_code=e.response.status_code, detail=f"NASA POWER API error: {e.response.text}")
         except httpx.RequestError as e:
             raise HTTPException(status_code=503, detail=f"Request to NASA POWER API failed: {e}")
+        props = data.get("properties") or {}
+        meta = {**data, "properties": {k: v for k, v in props.items() if k != "parameter"}}
+        return props.get("parameter") or {}, meta
+
+    async def _fetch():
+        settled = (datetime.now(IST) - timedelta(days=NASA_POWER_SETTLE_DAYS)).strftime("%Y%m%d00")
+        series, meta = await series_cache.ensure(
+            "nasa_power", cell_key("nasa_power", latitude, longitude), NASA_POWER_PARAMETERS, days,
+            _nasa_power_slots, _fetch_range, _slot_expiry(settled, ttl, NASA_POWER_FILL_VALUE), _slot_horizon(ttl))
+        data = {**(meta or {}), "properties": {**(meta or {}).get("properties", {}), "parameter": series}}
+        if "header" in data:
+            data["header"] = {**data["header"], "start": start_date, "end": end_date}
+        return {
+            "source": "NASA POWER",
+            "latitude": latitude,
+            "longitude": longitude,
+            "grid": {"latitude": grid_lat, "longitude": grid_lon},
+            "start_date": start_date,
+            "end_date": end_date,
+            "data": data,
+            "last_updated": str(datetime.utcnow()),
+        }
 
-    return await cache.get_or_set(key, ttl, _fetch)
+    envelope = _at_point(await _get_or_stale(key, ttl, _fetch), latitude, longitude)
+    return _shaped(envelope, _shape_nasa_power, _parse_fields(fields), compact)
 
 # ---------------------------
 # Meteostat Climate Data
@@ -133,43 +780,53 @@ async def get_nasa_power_agro(
 async def get_meteostat_data(
     latitude: float = Query(..., ge=-90, le=90),
     longitude: float = Query(..., ge=-180, le=180),
-    start_date: str = Query(..., example="2024-01-01"),
-    end_date: str = Query(..., example="2024-01-07"),
-    ttl: int = Query(3600, ge=60, le=86400) # Default TTL of 1 hour, min 1 minute, max 1 day
+    start_date: str = Query(..., examples=["2024-01-01"]),
+    end_date: str = Query(..., examples=["2024-01-07"]),
+    ttl: int = Query(3600, ge=60, le=86400), # Default TTL of 1 hour, min 1 minute, max 1 day
+    fields: Optional[str] = Query(None, description=FIELDS_DOC, examples=["tavg,prcp"]),
+    compact: bool = Query(False, description=COMPACT_DOC),
 ):
-    key = f"meteostat:{latitude}:{longitude}:{start_date}:{end_date}"
+    key = f"meteostat:{cell_key('meteostat', latitude, longitude)}:{start_date}:{end_date}"
+    grid_lat, grid_lon = snap("meteostat", latitude, longitude)
 
     async def _fetch():
         try:
-            start = datetime.strptime(start_date, "%Y-%m-%d")
-            end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+            start = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date, "%Y-%m-%d").date()
         except ValueError:
             raise HTTPException(
                 status_code=400, detail="Invalid date format. Use YYYY-MM-DD."
             )
+        if end < start:
+            raise HTTPException(status_code=400, detail="end_date must not be before start_date.")
 
-        # Use the Point class to create a location object
-        location = Point(latitude, longitude)
+        # Daily records of the nearest station; only days not held locally are
+        # downloaded (from Meteostat's bulk endpoint), off the event loop
+        with stage("meteostat"):
+            station, response_data = await meteostat_store.daily(
+                grid_lat, grid_lon, start, end,
+                before_fetch=lambda: scheduler.acquire("bulk.meteostat.net"))
 
-        # Get daily weather data
-        data = Daily(location, start, end)
-        data = data.fetch()
-
-        if data.empty:
+        if not response_data:
             raise HTTPException(status_code=404, detail="No data found for the specified location and date range.")
 
-        # Convert the pandas DataFrame to a dictionary for JSON response
-        response_data = data.reset_index().to_dict('records')
-
         return {
             "source": "Meteostat",
             "latitude": latitude,
             "longitude": longitude,
+            "grid": {"latitude": grid_lat, "longitude": grid_lon},
+            "station": station,
             "data": response_data,
             "last_updated": str(datetime.utcnow())
         }
 
-    return await cache.get_or_set(key, ttl, _fetch)
+    envelope = _at_point(await _get_or_stale(key, ttl, _fetch), latitude, longitude)
+    fields = _parse_fields(fields)
+    if not compact and len(envelope["data"]) >= STREAM_MIN_ROWS:
+        # long daily ranges: stream the rows instead of rendering one big body
+        head = {k: v for k, v in envelope.items() if k != "data"}
+        return stream_json(head, "data", _shape_records(envelope["data"], fields, False, METEOSTAT_UNITS))
+    return _shaped(envelope, _shape_records, fields, compact, METEOSTAT_UNITS)
 
 # ---------------------------
 # Drought Indices / Rainfall Anomalies (IMD API)
@@ -196,7 +853,7 @@ async def get_imd_drought(
         
         try:
             # Note: This API might require a whitelisted IP. For local testing, it might not work.
-            response = await client.get(api_endpoint, params=params, timeout=10)
+            response = await _upstream_get(api_endpoint, params, timeout=10)
             response.raise_for_status()
             data = response.json()
             return {
@@ -210,7 +867,7 @@ async def get_imd_drought(
         except httpx.RequestError as e:
             raise HTTPException(status_code=503, detail=f"Request to IMD API failed: {e}")
 
-    return await cache.get_or_set(key, ttl, _fetch)
+    return await _get_or_stale(key, ttl, _fetch)
 
 # ------------------------
 # Root info
@@ -221,9 +878,18 @@ def root():
         "message": "LLM Data Proxy",
         "endpoints": {
             "weather_open_meteo": "/api/weather/open-meteo?latitude=28.7041&longitude=77.1025",
+            "weather_open_meteo_batch": "POST /api/weather/open-meteo/batch",
             "nasa_power_agro": "/api/agro/nasa-power?latitude=28.7041&longitude=77.1025&start_date=20240101&end_date=20240107",
             "climate_meteostat": "/api/climate/meteostat?station_id=7651&start_date=2023-01-01&end_date=2023-01-31",
-            "imd_drought": "/api/imd/drought?district_id=5"
+            "imd_drought": "/api/imd/drought?district_id=5",
+            "cache_stats": "/api/cache/stats",
+            "upstreams_status": "/api/upstreams/status",
+            "prefetch_status": "/api/prefetch/status",
+            "metrics": "/metrics",
+            "ready": "/ready"
         },
         "notes": "Endpoints may require specific parameters. Please refer to the docstrings or source code for details."
     }
+
+
+lifecycle.imported()
@@ -0,0 +1,416 @@
+"""
+Benchmark harness for myPoint.py and api_llm/main.py against stubbed upstreams.
+
+    python bench/run.py                         # all scenarios, compare with bench/baseline.json
+    python bench/run.py --app myPoint --scenario weather,prices --concurrency 1,16
+    python bench/run.py --latency-ms 200 --error-rate 0.05
+    python bench/run.py --save-baseline         # record a new baseline
+    python bench/run.py --record --fixtures bench/fixtures.new --concurrency 1 --requests 50
+
+For every (scenario, concurrency) the app is started fresh under uvicorn
+(bench/serve.py), with empty caches in a temporary directory and every
+upstream call routed to bench/stub_server.py. ``--requests`` requests are
+then sent by ``concurrency`` workers, drawn round-robin from the scenario's
+fixed pool of seeded request targets. Reported per run:
+
+  - throughput (requests/s), latency p50/p95/p99/max (ms), error rate
+  - resident memory of the app process at start and at its peak (MB)
+  - cache hit rate, from the app's own /metrics counters
+  - upstream requests the stub served, and startup time: until /ready
+    answered (as seen from here) and the app's own ready_s (see lifecycle.py)
+
+Results go to bench/results/latest.json. If a baseline exists, runs whose
+p95 grew or whose throughput fell by more than ``--tolerance`` are reported
+as regressions and the exit status is 1. bench/baseline.json was recorded
+with the default settings; baselines are machine-specific, so record one on
+the machine you compare on before trusting a comparison.
+
+Record mode: with ``--record`` the stub forwards every request it has no
+fixture for to the real upstream and saves the answer in ``--fixtures``
+(see stub_server.py). Run it against an empty directory, with the apps' API
+keys (OGD_API_KEY, ...) in the environment, then review the files and
+replace bench/fixtures with them. No comparison is made in record mode.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Request target: (method, path, params or JSON body)
+Target = Tuple[str, str, Optional[Dict]]
+
+# ---------- scenarios ----------
+
+KERALA = (8.3, 12.7, 74.9, 77.4)   # lat min/max, lon min/max
+DISTRICTS = ["Ernakulam", "Thrissur", "Idukki", "Palakkad"]
+
+
+def _points(n: int, seed: int) -> List[Tuple[float, float]]:
+    rng = random.Random(seed)
+    return [(round(rng.uniform(KERALA[0], KERALA[1]), 4), round(rng.uniform(KERALA[2], KERALA[3]), 4))
+            for _ in range(n)]
+
+
+# Coarse outline of Kerala (lat, lon), north tip clockwise: Western Ghats down, coast back up.
+# Farm lookups fall inside it; the KERALA box is ~half sea and neighbouring states.
+KERALA_OUTLINE = [(12.79, 74.86), (12.45, 75.25), (12.05, 75.60), (11.85, 75.95), (11.70, 76.40),
+                  (11.25, 76.30), (10.95, 76.75), (10.75, 76.85), (10.40, 76.85), (10.30, 77.20),
+                  (9.90, 77.30), (9.55, 77.20), (9.10, 77.30), (8.75, 77.20), (8.30, 77.15),
+                  (8.38, 76.98), (8.90, 76.55), (9.50, 76.32), (9.97, 76.22), (10.50, 76.05),
+                  (10.90, 75.88), (11.25, 75.77), (11.75, 75.48), (12.10, 75.20), (12.50, 74.98)]
+
+
+def _inside(lat: float, lon: float, outline: List[Tuple[float, float]]) -> bool:
+    # ray casting along the latitude
+    inside = False
+    for (a_lat, a_lon), (b_lat, b_lon) in zip(outline, outline[1:] + outline[:1]):
+        if (a_lat > lat) != (b_lat > lat) and lon < a_lon + (lat - a_lat) / (b_lat - a_lat) * (b_lon - a_lon):
+            inside = not inside
+    return inside
+
+
+def _land_points(n: int, seed: int) -> List[Tuple[float, float]]:
+    rng = random.Random(seed)
+    out: List[Tuple[float, float]] = []
+    while len(out) < n:
+        p = (round(rng.uniform(KERALA[0], KERALA[1]), 4), round(rng.uniform(KERALA[2], KERALA[3]), 4))
+        if _inside(p[0], p[1], KERALA_OUTLINE):
+            out.append(p)
+    return out
+
+
+def _get(path: str, pool: List[Dict]) -> List[Target]:
+    return [("GET", path, params) for params in pool]
+
+
+SCENARIOS: Dict[str, Dict[str, Callable[[], List[Target]]]] = {
+    "myPoint": {
+        "prices": lambda: _get("/marketInfo/prices", [{"state": "Kerala", "district": d, "limit": 100} for d in DISTRICTS]),
+        "weather": lambda: _get("/v1/weather", [{"lat": a, "lon": b} for a, b in _points(40, 1)]),
+        "soil": lambda: _get("/v1/soil/soilgrids", [{"lat": a, "lon": b} for a, b in _points(5, 2)]),
+        "air": lambda: _get("/v1/air/nearest", [{"lat": a, "lon": b} for a, b in _points(10, 3)]),
+        "geocode_reverse": lambda: _get("/v1/geocode/reverse",
+                                        [{"lat": a, "lon": b} for a, b in _land_points(20, 4)]),
+        "farm_context": lambda: _get("/v1/context/farm", [
+            {"lat": a, "lon": b, "crop": "banana", "sowing_date": "2025-03-01"} for a, b in _points(5, 2)]),
+        "irrigation_batch": lambda: [("POST", "/v1/irrigation/schedule/batch", {"plots": [
+            {"lat": a, "lon": b, "crop": random.Random(i).choice(["rice", "banana", "coconut", "cassava"]),
+             "sowing_date": "2025-04-01"} for i, (a, b) in enumerate(_points(200, 5))]})],
+    },
+    "api_llm": {
+        "open_meteo": lambda: _get("/api/weather/open-meteo",
+                                   [{"latitude": a, "longitude": b} for a, b in _points(40, 1)]),
+        "open_meteo_batch": lambda: [("POST", "/api/weather/open-meteo/batch", {"points": [
+            {"latitude": a, "longitude": b} for a, b in _points(200, 6)]})],
+        "nasa_power": lambda: _get("/api/agro/nasa-power", [
+            {"latitude": a, "longitude": b, "start_date": "20250601", "end_date": "20250607"} for a, b in _points(10, 7)]),
+        "imd_drought": lambda: _get("/api/imd/drought", [{"district_id": str(433 + i)} for i in range(4)]),
+    },
+}
+
+APPS = {
+    # module:app, working directory
+    "myPoint": ("myPoint:app", ROOT),
+    "api_llm": ("api_llm.main:app", ROOT),
+}
+
+# Cache counters in each app's /metrics: (metric, label, hit values, all values)
+CACHE_METRICS = {
+    "myPoint": ("cache_requests_total", "result", {"hit", "coalesced", "stale"},
+                {"hit", "coalesced", "miss", "refresh", "stale"}),
+    "api_llm": ("simple_ttl_cache_events_total", "event", {"hits", "stale_hits", "shared_hits", "coalesced"},
+                {"hits", "stale_hits", "shared_hits", "coalesced", "misses"}),
+}
+
+# ---------- processes ----------
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return None
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60) -> float:
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return time.monotonic() - t0
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def start_stub(port: int, latency_ms: float, error_rate: float, config: Optional[str],
+               fixtures: Optional[str] = None, record: bool = False) -> subprocess.Popen:
+    cmd = [sys.executable, os.path.join(BENCH_DIR, "stub_server.py"), "--port", str(port),
+           "--latency-ms", str(latency_ms), "--error-rate", str(error_rate)]
+    if config:
+        cmd += ["--config", config]
+    if fixtures:
+        cmd += ["--fixtures", fixtures]
+    if record:
+        cmd.append("--record")
+    proc = subprocess.Popen(cmd)
+    _wait_ready(f"http://127.0.0.1:{port}/_stub/stats", proc)
+    return proc
+
+
+def start_app(app: str, port: int, stub_port: int, data_dir: str) -> Tuple[subprocess.Popen, float]:
+    target, cwd = APPS[app]
+    env = {
+        **os.environ,
+        "AGRI_CACHE_PATH": os.path.join(data_dir, "cache.sqlite3"),
+        "AGRI_PRICE_DB": os.path.join(data_dir, "prices.sqlite3"),
+        "AGRI_SERIES_PATH": os.path.join(data_dir, "series.sqlite3"),
+        "METEOSTAT_DATA_DIR": os.path.join(data_dir, "meteostat"),
+        "PRICE_SYNC_STATES": "",
+        "PREFETCH_ENABLED": "0",
+    }
+    proc = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "serve.py"), target, "--port", str(port),
+                             "--stub-url", f"http://127.0.0.1:{stub_port}"], cwd=cwd, env=env)
+    startup = _wait_ready(f"http://127.0.0.1:{port}/ready", proc)
+    return proc, startup
+
+
+def stop(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+# ---------- measuring ----------
+
+
+def _cache_counts(text: str, app: str) -> Dict[str, float]:
+    metric, label, _, _ = CACHE_METRICS[app]
+    out: Dict[str, float] = {}
+    for m in re.finditer(rf'^{metric}\{{{label}="([^"]+)"\}} (\S+)$', text, re.M):
+        out[m.group(1)] = float(m.group(2))
+    return out
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[i]
+
+
+async def drive(base: str, targets: List[Target], requests: int, concurrency: int, pid: int):
+    """Send ``requests`` requests with ``concurrency`` workers; returns (latencies s, statuses, elapsed s, peak RSS MB)."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    queue = iter(range(requests))
+    peak = [_rss_mb(pid) or 0.0]
+    done = asyncio.Event()
+
+    async def sample_memory():
+        while not done.is_set():
+            peak[0] = max(peak[0], _rss_mb(pid) or 0.0)
+            await asyncio.sleep(0.1)
+
+    async def worker(client: httpx.AsyncClient):
+        for i in queue:
+            method, path, data = targets[i % len(targets)]
+            t0 = time.perf_counter()
+            try:
+                if method == "GET":
+                    resp = await client.get(path, params=data)
+                else:
+                    resp = await client.request(method, path, json=data)
+                status = str(resp.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+        sampler = asyncio.ensure_future(sample_memory())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await sampler
+    return latencies, statuses, elapsed, peak[0]
+
+
+def run_one(app: str, scenario: str, concurrency: int, requests: int, stub_port: int) -> Dict:
+    targets = SCENARIOS[app][scenario]()
+    port = _free_port()
+    with tempfile.TemporaryDirectory(prefix="bench-") as data_dir:
+        proc, startup = start_app(app, port, stub_port, data_dir)
+        base = f"http://127.0.0.1:{port}"
+        try:
+            httpx.post(f"http://127.0.0.1:{stub_port}/_stub/reset")
+            rss_start = _rss_mb(proc.pid)
+            before = _cache_counts(httpx.get(f"{base}/metrics").text, app)
+            latencies, statuses, elapsed, rss_peak = asyncio.run(drive(base, targets, requests, concurrency, proc.pid))
+            after = _cache_counts(httpx.get(f"{base}/metrics").text, app)
+            stub = httpx.get(f"http://127.0.0.1:{stub_port}/_stub/stats").json()
+            readiness = httpx.get(f"{base}/ready").json()
+        finally:
+            stop(proc)
+
+    _, _, hit_values, all_values = CACHE_METRICS[app]
+    delta = {k: after.get(k, 0.0) - before.get(k, 0.0) for k in all_values}
+    lookups = sum(delta.values())
+    lat = sorted(x * 1000.0 for x in latencies)
+    errors = sum(n for s, n in statuses.items() if not s.startswith(("2", "3")))
+    return {
+        "app": app,
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": round(errors / max(1, len(latencies)), 4),
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(_percentile(lat, 50), 2),
+        "p95_ms": round(_percentile(lat, 95), 2),
+        "p99_ms": round(_percentile(lat, 99), 2),
+        "max_ms": round(lat[-1], 2) if lat else None,
+        "rss_start_mb": round(rss_start, 1) if rss_start else None,
+        "rss_peak_mb": round(rss_peak, 1) if rss_peak else None,
+        "cache_hit_rate": round(sum(delta[k] for k in hit_values) / lookups, 4) if lookups else None,
+        "cache_lookups": int(lookups),
+        "upstream_requests": stub["requests"],
+        "startup_s": round(startup, 2),
+        "app_ready_s": readiness.get("ready_s"),
+    }
+
+# ---------- reporting ----------
+
+COLUMNS = [("app", 8), ("scenario", 17), ("concurrency", 4), ("throughput_rps", 9), ("p50_ms", 9), ("p95_ms", 9),
+           ("p99_ms", 9), ("error_rate", 7), ("rss_peak_mb", 8), ("cache_hit_rate", 7), ("upstream_requests", 6)]
+HEADERS = {"concurrency": "c", "throughput_rps": "req/s", "error_rate": "err", "rss_peak_mb": "rss MB",
+           "cache_hit_rate": "hit", "upstream_requests": "upstr"}
+
+
+def print_header():
+    print(" ".join(HEADERS.get(k, k).rjust(w) for k, w in COLUMNS))
+
+
+def print_row(r: Dict):
+    print(" ".join(str(r[k] if r.get(k) is not None else "-").rjust(w) for k, w in COLUMNS), flush=True)
+
+
+def _key(r: Dict) -> str:
+    return f"{r['app']}/{r['scenario']}/c{r['concurrency']}"
+
+
+def compare(rows: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    base = {_key(r): r for r in baseline.get("results", [])}
+    problems = []
+    for r in rows:
+        b = base.get(_key(r))
+        if b is None:
+            continue
+        if b["p95_ms"] and r["p95_ms"] > b["p95_ms"] * (1 + tolerance):
+            problems.append(f"{_key(r)}: p95 {b['p95_ms']} -> {r['p95_ms']} ms")
+        if b["throughput_rps"] and r["throughput_rps"] < b["throughput_rps"] * (1 - tolerance):
+            problems.append(f"{_key(r)}: throughput {b['throughput_rps']} -> {r['throughput_rps']} req/s")
+        if r["error_rate"] > b["error_rate"] + 0.01:
+            problems.append(f"{_key(r)}: error rate {b['error_rate']} -> {r['error_rate']}")
+    return problems
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--app", default="all", choices=["all", *APPS])
+    ap.add_argument("--scenario", help="comma-separated scenario names (default: all)")
+    ap.add_argument("--concurrency", default="1,8,32", help="comma-separated levels")
+    ap.add_argument("--requests", type=int, default=300, help="requests per run")
+    ap.add_argument("--latency-ms", type=float, default=50, help="stub latency per upstream call")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of upstream calls the stub fails")
+    ap.add_argument("--stub-config", help="per-host injection config for the stub (see stub_server.py)")
+    ap.add_argument("--fixtures", help="stub fixture directory (default: bench/fixtures)")
+    ap.add_argument("--record", action="store_true", help="save live answers for requests with no fixture")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95/throughput change")
+    args = ap.parse_args(argv)
+
+    apps = list(APPS) if args.app == "all" else [args.app]
+    wanted = set(args.scenario.split(",")) if args.scenario else None
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    stub_port = _free_port()
+    stub = start_stub(stub_port, args.latency_ms, args.error_rate, args.stub_config, args.fixtures, args.record)
+    rows = []
+    print_header()
+    try:
+        for app in apps:
+            for scenario in SCENARIOS[app]:
+                if wanted and scenario not in wanted:
+                    continue
+                for c in levels:
+                    row = run_one(app, scenario, c, args.requests, stub_port)
+                    rows.append(row)
+                    print_row(row)
+    finally:
+        stop(stub)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {"requests": args.requests, "latency_ms": args.latency_ms, "error_rate": args.error_rate,
+                     "stub_config": args.stub_config, "python": sys.version.split()[0]},
+        "results": rows,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, "latest.json"), "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=1)
+
+    if args.record:
+        print(f"fixtures recorded to {args.fixtures or 'bench/fixtures'}")
+        return 0
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=1)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            problems = compare(rows, json.load(fh), args.tolerance)
+        for p in problems:
+            print("REGRESSION", p)
+        if problems:
+            return 1
+        print("no regressions against", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
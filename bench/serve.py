@@ -0,0 +1,58 @@
+"""
+Run one of the apps under uvicorn with every upstream call routed to the
+stub server (bench/stub_server.py) instead of the internet. bench/run.py
+starts the apps this way; the apps themselves know nothing about the stub.
+
+    python bench/serve.py myPoint:app --port 8000 --stub-url http://127.0.0.1:8900
+
+A request for
+
+    https://api.open-meteo.com/v1/forecast?latitude=...
+
+is sent as
+
+    http://127.0.0.1:8900/api.open-meteo.com/v1/forecast?latitude=...
+
+The rewrite happens in httpx's transport, below the apps' clients, so rate
+limits, circuit breakers, metrics and cache keys still see the real upstream
+host.
+"""
+import os
+import sys
+import argparse
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def route_to_stub(base_url: str):
+    """Send every request of every httpx.AsyncHTTPTransport in this process to ``base_url``."""
+    base = httpx.URL(base_url)
+    send = httpx.AsyncHTTPTransport.handle_async_request
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        request.url = base.copy_with(path=base.path.rstrip("/") + "/" + url.host + url.path, query=url.query)
+        request.headers["Host"] = base.netloc.decode("ascii")
+        return await send(self, request)
+
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("app", help="module:app, e.g. myPoint:app or api_llm.main:app")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--stub-url", required=True)
+    args = ap.parse_args(argv)
+
+    route_to_stub(args.stub_url)
+    # the apps import as top-level modules from the repository root, as under `uvicorn` there
+    sys.path.insert(0, ROOT)
+    import uvicorn
+    uvicorn.run(args.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
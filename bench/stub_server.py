@@ -0,0 +1,219 @@
+"""
+Stub upstream server for benchmarks: serves recorded fixtures for every
+upstream the apps call, with configurable latency and error injection.
+
+    python bench/stub_server.py --port 8900 [--config stub.json] [--fixtures DIR] [--record]
+
+Apps reach it through bench/serve.py, which routes their HTTP clients here:
+a request for https://<host><path> arrives as /<host><path>.
+
+Fixtures are bench/fixtures/<host>.json:
+
+    {"routes": [{"path": "/v1/forecast", "match": {"daily": "..."}, "status": 200,
+                 "page": "records", "repeat_for": "latitude", "body": {...}}]}
+
+  - match (optional): query parameters that must be equal; the most
+    specific matching route wins
+  - page (optional): the body list sliced by the offset/limit parameters
+  - repeat_for (optional): for a comma-separated parameter (Open-Meteo
+    multi-location calls) the body is returned once per value, as a list
+
+With --record, requests with no fixture are forwarded to the real upstream
+and a successful response is saved as a new route (bench/run.py --record
+drives this). A multi-location answer is saved once with ``repeat_for``; a
+response to an offset/limit request is saved with ``page`` set to its list.
+A recorded route has no ``match``, so it answers every later request for its
+path. Query parameters, API keys among them, are not saved.
+
+Injection config, per host with a default (also PUT /_stub/config):
+
+    {"default": {"latency_ms": 50, "jitter_ms": 20, "error_rate": 0.0,
+                 "error_status": 503, "timeout_rate": 0.0, "timeout_s": 30},
+     "hosts": {"rest.isric.org": {"latency_ms": 400}}}
+
+GET /_stub/stats gives requests per host and status; POST /_stub/reset clears them.
+"""
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+DEFAULT_INJECTION = {"latency_ms": 50, "jitter_ms": 20, "error_rate": 0.0, "error_status": 503,
+                     "timeout_rate": 0.0, "timeout_s": 30}
+
+
+class Fixtures:
+    def __init__(self, directory: str = FIXTURES_DIR):
+        self.directory = directory
+        self.routes: Dict[str, List[Dict]] = {}
+        for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name), encoding="utf-8") as fh:
+                    self.routes[name[:-5]] = json.load(fh)["routes"]
+
+    def find(self, host: str, path: str, query: Dict[str, str]) -> Optional[Dict]:
+        best, best_score = None, -1
+        for route in self.routes.get(host, ()):
+            if route["path"] != path:
+                continue
+            match = route.get("match") or {}
+            if all(query.get(k) == str(v) for k, v in match.items()) and len(match) > best_score:
+                best, best_score = route, len(match)
+        return best
+
+    def add(self, host: str, route: Dict):
+        self.routes.setdefault(host, []).append(route)
+        with open(os.path.join(self.directory, f"{host}.json"), "w", encoding="utf-8") as fh:
+            json.dump({"routes": self.routes[host]}, fh, indent=1)
+
+
+def recorded_route(path: str, query: Dict[str, str], status: int, body: Any) -> Dict:
+    """A fixture route for a live response, generalised so it also answers other locations and pages."""
+    route: Dict[str, Any] = {"path": path, "status": status}
+    for name, value in query.items():
+        n = len(value.split(","))
+        if n > 1 and isinstance(body, list) and len(body) == n:
+            route["repeat_for"] = name
+            body = body[0]
+            break
+    if isinstance(body, dict) and ("offset" in query or "limit" in query):
+        page = next((k for k, v in body.items() if isinstance(v, list)), None)
+        if page:
+            route["page"] = page
+    route["body"] = body
+    return route
+
+
+def render(route: Dict, query: Dict[str, str]) -> Any:
+    body = route["body"]
+    key = route.get("page")
+    if key and isinstance(body, dict) and isinstance(body.get(key), list):
+        offset = int(query.get("offset") or 0)
+        limit = int(query.get("limit") or len(body[key]))
+        body = {**body, key: body[key][offset:offset + limit]}
+    repeat = route.get("repeat_for")
+    if repeat and "," in query.get(repeat, ""):
+        body = [body] * len(query[repeat].split(","))
+    return body
+
+
+def create_app(fixtures: Fixtures, config: Dict, record: bool = False, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Upstream stub")
+    rng = random.Random(seed)
+    stats: Counter = Counter()
+    rendered: Dict[tuple, bytes] = {}   # (route id, query) -> encoded body
+    state = {"config": config}
+    recording = asyncio.Lock()   # one live fetch per missing route
+
+    def injection(host: str) -> Dict:
+        cfg = state["config"]
+        return {**DEFAULT_INJECTION, **cfg.get("default", {}), **cfg.get("hosts", {}).get(host, {})}
+
+    @app.get("/_stub/stats")
+    async def get_stats():
+        per_host: Dict[str, Dict[str, int]] = {}
+        for (host, status), n in stats.items():
+            per_host.setdefault(host, {})[str(status)] = n
+        return {"requests": sum(stats.values()), "hosts": per_host, "config": state["config"]}
+
+    @app.post("/_stub/reset")
+    async def reset():
+        stats.clear()
+        return {"ok": True}
+
+    @app.put("/_stub/config")
+    async def put_config(request: Request):
+        state["config"] = await request.json()
+        return state["config"]
+
+    @app.get("/{host}/{path:path}")
+    async def upstream(host: str, path: str, request: Request):
+        path = "/" + path
+        query = dict(request.query_params)
+        inj = injection(host)
+        delay = max(0.0, inj["latency_ms"] + rng.uniform(-1, 1) * inj["jitter_ms"]) / 1000.0
+        roll = rng.random()
+        if roll < inj["timeout_rate"]:
+            stats[(host, "timeout")] += 1
+            await asyncio.sleep(inj["timeout_s"])
+            return Response(status_code=504)
+        await asyncio.sleep(delay)
+        if roll < inj["timeout_rate"] + inj["error_rate"]:
+            stats[(host, inj["error_status"])] += 1
+            return JSONResponse({"error": "injected"}, status_code=inj["error_status"],
+                                headers={"Retry-After": "1"} if inj["error_status"] in (429, 503) else None)
+
+        route = fixtures.find(host, path, query)
+        if route is None and record:
+            async with recording:
+                route = fixtures.find(host, path, query)
+                if route is None:
+                    async with httpx.AsyncClient(follow_redirects=True, timeout=60) as client:
+                        resp = await client.get(f"https://{host}{path}", params=request.query_params, headers={
+                            "User-Agent": request.headers.get("user-agent", "bench-recorder")})
+                    if not resp.is_success:
+                        stats[(host, resp.status_code)] += 1
+                        return Response(resp.content, status_code=resp.status_code,
+                                        media_type=resp.headers.get("content-type"))
+                    try:
+                        body = resp.json()
+                    except ValueError:
+                        body = resp.text
+                    route = recorded_route(path, query, resp.status_code, body)
+                    fixtures.add(host, route)
+        if route is None:
+            stats[(host, 404)] += 1
+            return JSONResponse({"error": f"no fixture for {host}{path}"}, status_code=404)
+
+        stats[(host, route.get("status", 200))] += 1
+        # the same few fixtures are served thousands of times: encode each variant once
+        key = (id(route), tuple(sorted(query.items())) if route.get("page") or route.get("repeat_for") else ())
+        content = rendered.get(key)
+        if content is None:
+            content = rendered[key] = json.dumps(render(route, query)).encode("utf-8")
+        return Response(content, status_code=route.get("status", 200), media_type="application/json")
+
+    return app
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--config", help="injection config JSON file")
+    ap.add_argument("--latency-ms", type=float, help="default latency (overrides the config)")
+    ap.add_argument("--error-rate", type=float, help="default error rate (overrides the config)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--fixtures", default=FIXTURES_DIR, help="fixture directory (default: bench/fixtures)")
+    ap.add_argument("--record", action="store_true", help="fetch and save missing fixtures from the real upstreams")
+    args = ap.parse_args(argv)
+
+    config: Dict = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as fh:
+            config = json.load(fh)
+    default = config.setdefault("default", {})
+    if args.latency_ms is not None:
+        default["latency_ms"] = args.latency_ms
+    if args.error_rate is not None:
+        default["error_rate"] = args.error_rate
+
+    import uvicorn
+    if args.record:
+        os.makedirs(args.fixtures, exist_ok=True)
+    uvicorn.run(create_app(Fixtures(args.fixtures), config, record=args.record, seed=args.seed),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Per-upstream circuit breakers shared by myPoint.py and api_llm/main.py.
+
+closed     calls go through; ``failures`` consecutive failures (transport
+           errors, timeouts, 5xx) open the breaker
+open       calls fail at once with CircuitOpen for ``reset_timeout`` seconds
+half_open  up to ``probes`` trial calls go through; a success closes the
+           breaker, a failure opens it again
+
+While a breaker is open the apps answer from the last good cached payload
+(marked stale) instead of waiting for a dead upstream to time out.
+"""
+import os
+import time
+from typing import Dict, Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+DEFAULTS = {
+    "failures": int(os.getenv("BREAKER_FAILURES", "5")),
+    "reset_timeout": float(os.getenv("BREAKER_RESET_TIMEOUT", "30")),
+    "probes": int(os.getenv("BREAKER_PROBES", "1")),
+}
+
+
+class CircuitOpen(Exception):
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(f"{upstream}: circuit open, retry after {retry_after:.1f}s")
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, int(self.retry_after + 0.999)))
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int, reset_timeout: float, probes: int):
+        self.name = name
+        self.failure_threshold = failures
+        self.reset_timeout = reset_timeout
+        self.max_probes = probes
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.opens = 0
+        self.last_error: Optional[str] = None
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go to the upstream now."""
+        if self.state == OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpen(self.name, remaining)
+            self.state, self.probes = HALF_OPEN, 0
+        if self.state == HALF_OPEN:
+            if self.probes >= self.max_probes:
+                raise CircuitOpen(self.name, self.reset_timeout)
+            self.probes += 1
+
+    def after_call(self, healthy: Optional[bool], error: Optional[str] = None):
+        """Record the outcome of a call let through by before_call (None: no verdict, e.g. cancelled)."""
+        if self.state == HALF_OPEN:
+            self.probes = max(0, self.probes - 1)
+        if healthy is None:
+            return
+        if healthy:
+            self.state, self.failures = CLOSED, 0
+            return
+        self.failures += 1
+        self.last_error = error
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state, self.opened_at = OPEN, time.monotonic()
+            self.opens += 1
+
+    def snapshot(self) -> Dict:
+        retry_after = 0.0
+        if self.state == OPEN:
+            retry_after = max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "retry_after": round(retry_after, 1),
+            "opens": self.opens,
+            "last_error": self.last_error,
+        }
+
+
+class Breakers:
+    """One breaker per upstream host; ``config`` overrides DEFAULTS per host."""
+
+    def __init__(self, config: Optional[Dict[str, Dict]] = None):
+        self.config = dict(config or {})
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host, **{**DEFAULTS, **self.config.get(host, {})})
+            self._breakers[host] = breaker
+        return breaker
+
+    def status(self) -> Dict[str, Dict]:
+        return {host: b.snapshot() for host, b in sorted(self._breakers.items())}
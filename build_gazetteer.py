@@ -0,0 +1,157 @@
+"""
+Build the offline geocoder's gazetteer (see geocoder.py) from GeoNames.
+
+    python build_gazetteer.py --state Kerala                  # downloads, writes gazetteer.csv
+    python build_gazetteer.py --state "Kerala,Tamil Nadu" -o /data/gazetteer.csv
+    python build_gazetteer.py --dump IN.zip --postal IN-postal.zip --admin1 admin1CodesASCII.txt \\
+        --admin2 admin2Codes.txt                             # from files already downloaded
+
+Sources (CC BY 4.0, https://www.geonames.org):
+  - export/dump/IN.zip: populated places (feature class P) and markets (MKT)
+    with population, plus admin1/admin2 code tables for state and district names
+  - export/zip/IN.zip: post offices with pincode, district and state
+
+Places are kept for the requested states only. A post office whose name
+matches a place in the same district gives that place its pincode. Other
+post offices are added as localities of their own. Importance is derived
+from population (log scale, 0..1), so towns outrank villages of the same name.
+
+myPoint.py reads the file named by GAZETTEER_PATH (default: gazetteer.csv
+next to geocoder.py, else the small bundled gazetteer_kerala.csv).
+"""
+import io
+import os
+import re
+import csv
+import sys
+import math
+import zipfile
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional
+
+GEONAMES = "https://download.geonames.org/export"
+URLS = {
+    "dump": f"{GEONAMES}/dump/IN.zip",
+    "postal": f"{GEONAMES}/zip/IN.zip",
+    "admin1": f"{GEONAMES}/dump/admin1CodesASCII.txt",
+    "admin2": f"{GEONAMES}/dump/admin2Codes.txt",
+}
+OUT_DEFAULT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.csv")
+COLUMNS = ["name", "lat", "lon", "type", "district", "state", "pincode", "importance", "alt_names"]
+
+# GeoNames feature code -> gazetteer type (see geocoder._PLACE_TYPES)
+_FEATURE_TYPES = {
+    "PPLC": "city", "PPLA": "city", "PPLA2": "town", "PPLA3": "town", "PPLA4": "town",
+    "PPL": "village", "PPLL": "hamlet", "PPLF": "hamlet", "PPLX": "suburb", "MKT": "market",
+}
+# "Kakkanad S.O", "Thrissur H.O": post-office class suffixes
+_POST_OFFICE = re.compile(r"\s+(?:[BSH]\.?O|G\.?P\.?O)\.?$", re.I)
+
+
+def _fetch(name: str, path: Optional[str]) -> bytes:
+    if path:
+        with open(path, "rb") as fh:
+            return fh.read()
+    import httpx
+    print(f"downloading {URLS[name]}", file=sys.stderr)
+    resp = httpx.get(URLS[name], timeout=300, follow_redirects=True)
+    resp.raise_for_status()
+    return resp.content
+
+
+def _lines(blob: bytes, member: str = "IN.txt") -> Iterator[List[str]]:
+    """Tab-separated rows of a GeoNames file, zipped or not."""
+    if blob[:2] == b"PK":
+        with zipfile.ZipFile(io.BytesIO(blob)) as zf:
+            blob = zf.read(member)
+    for line in io.StringIO(blob.decode("utf-8")):
+        if line.strip() and not line.startswith("#"):
+            yield line.rstrip("\n").split("\t")
+
+
+def _key(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", name.lower()).strip()
+
+
+def _importance(population: int) -> str:
+    return f"{min(1.0, math.log10(population + 1) / 7):.3f}" if population > 0 else ""
+
+
+def build(dump: bytes, postal: bytes, admin1: bytes, admin2: bytes, states: Iterable[str]) -> List[Dict]:
+    wanted = {_key(s) for s in states}
+    state_names = {}   # admin1 code ("13") -> name
+    for row in _lines(admin1):
+        country, code = row[0].split(".", 1)
+        if country == "IN" and _key(row[2] or row[1]) in wanted:
+            state_names[code] = row[2] or row[1]
+    district_names = {}   # (admin1, admin2) -> name
+    for row in _lines(admin2):
+        parts = row[0].split(".")
+        if parts[0] == "IN" and parts[1] in state_names:
+            district_names[(parts[1], parts[2])] = row[2] or row[1]
+
+    places: List[Dict] = []
+    by_name: Dict[tuple, tuple] = {}   # (name, district) -> (population, place); the largest takes the pincode
+    for row in _lines(dump):
+        feature_class, code, admin1_code = row[6], row[7], row[10]
+        if admin1_code not in state_names:
+            continue
+        ptype = _FEATURE_TYPES.get(code)
+        if ptype is None or (feature_class != "P" and code != "MKT"):
+            continue
+        district = district_names.get((admin1_code, row[11]), "")
+        population = int(row[14] or 0)
+        alt = [a for a in row[3].split(",") if a and a.isascii() and a != row[1]][:10]
+        place = {"name": row[1], "lat": row[4], "lon": row[5], "type": ptype, "district": district,
+                 "state": state_names[admin1_code], "pincode": "", "importance": _importance(population),
+                 "alt_names": ";".join(alt)}
+        places.append(place)
+        k = (_key(row[1]), _key(district))
+        if k not in by_name or population > by_name[k][0]:
+            by_name[k] = (population, place)
+
+    seen_pins = set()
+    for row in _lines(postal):
+        state, district = row[3], row[5]
+        if _key(state) not in wanted or not row[9]:
+            continue
+        name = _POST_OFFICE.sub("", row[2]).strip()
+        pin = row[1]
+        _, place = by_name.get((_key(name), _key(district)), (0, None))
+        if place is not None:
+            place["pincode"] = place["pincode"] or pin
+            continue
+        if (_key(name), pin) in seen_pins:
+            continue
+        seen_pins.add((_key(name), pin))
+        places.append({"name": name, "lat": row[9], "lon": row[10], "type": "locality", "district": district,
+                       "state": state, "pincode": pin, "importance": "", "alt_names": ""})
+    return places
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--state", default="Kerala", help="comma-separated state names")
+    ap.add_argument("-o", "--out", default=OUT_DEFAULT)
+    for name in URLS:
+        ap.add_argument(f"--{name}", help=f"local copy of {URLS[name]} (default: download it)")
+    args = ap.parse_args(argv)
+
+    sources = {name: _fetch(name, getattr(args, name)) for name in URLS}
+    places = build(sources["dump"], sources["postal"], sources["admin1"], sources["admin2"],
+                   [s.strip() for s in args.state.split(",") if s.strip()])
+    if not places:
+        print(f"no places found for {args.state!r}", file=sys.stderr)
+        return 1
+    tmp = args.out + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(places)
+    os.replace(tmp, args.out)   # the running app reloads on the mtime change
+    print(f"wrote {len(places)} places to {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
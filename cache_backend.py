@@ -0,0 +1,175 @@
+"""
+Shared cross-process cache backends for myPoint.py and api_llm/main.py.
+
+Every worker of both apps opens the same on-disk store, so a payload fetched
+by one worker is a hit for all the others and survives restarts.
+
+Backends are pluggable: subclass ``CacheBackend`` and ``register_backend()``
+it, then select it with ``AGRI_CACHE_BACKEND``. Built in:
+  - sqlite (default): SQLite in WAL mode, zlib-compressed JSON values
+  - none: caches nothing
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "agri_cache.sqlite3")
+
+# Expired entries are kept this long as a last-good fallback (see get_stale)
+STALE_GRACE = float(os.getenv("AGRI_CACHE_STALE_GRACE", str(7 * 86400)))
+
+
+def _json_default(o):
+    # pandas Timestamps, datetimes, dates
+    if hasattr(o, "isoformat"):
+        return o.isoformat()
+    return str(o)
+
+
+def make_key(namespace: str, params) -> str:
+    """Stable cache key from a namespace and a dict / list of (name, value) pairs."""
+    items = params.items() if isinstance(params, dict) else params
+    pairs = sorted((str(k), str(v)) for k, v in items if v is not None)
+    return f"{namespace}:{urlencode(pairs)}"
+
+
+class CacheBackend(ABC):
+    """Interface every backend implements. Values must be JSON-serialisable."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return ``(value, expires_at)`` for a live entry, else None."""
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Like get(), but also returns entries that expired less than STALE_GRACE ago."""
+        return self.get(key)
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Store ``value`` for ``ttl`` seconds."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove ``key`` if present."""
+
+    def purge_expired(self) -> int:
+        return 0
+
+    def get_or_set(self, key: str, ttl: float, fn: Callable[[], Any]) -> Any:
+        """Synchronous read-through: return the cached value or store ``fn()``."""
+        hit = self.get(key)
+        if hit is not None:
+            return hit[0]
+        value = fn()
+        self.set(key, value, ttl)
+        return value
+
+
+class NullCache(CacheBackend):
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class SQLiteCache(CacheBackend):
+    """
+    SQLite store shared by all processes on the host.
+
+    WAL mode lets readers proceed while one writer commits. Connections are
+    per thread and per process (a forked worker never reuses its parent's).
+    """
+
+    PURGE_EVERY = 500  # writes between opportunistic purges of expired rows
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, compress_level: int = 3):
+        self.path = path
+        self.compress_level = compress_level
+        self._local = threading.local()
+        self._writes = 0
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _encode(self, value: Any) -> bytes:
+        raw = json.dumps(value, default=_json_default, separators=(",", ":")).encode("utf-8")
+        return zlib.compress(raw, self.compress_level)
+
+    @staticmethod
+    def _decode(blob: bytes) -> Any:
+        return json.loads(zlib.decompress(blob))
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return self._decode(row[0]), row[1]
+
+    def get_stale(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?", (key, time.time() - STALE_GRACE)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._decode(row[0]), row[1]
+
+    def set(self, key, value, ttl):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, self._encode(value), time.time() + ttl),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self):
+        cur = self._conn().execute("DELETE FROM cache WHERE expires_at <= ?", (time.time() - STALE_GRACE,))
+        return cur.rowcount
+
+
+_BACKENDS: Dict[str, Callable[[], CacheBackend]] = {
+    "sqlite": lambda: SQLiteCache(os.getenv("AGRI_CACHE_PATH", DEFAULT_CACHE_PATH)),
+    "none": NullCache,
+}
+
+
+def register_backend(name: str, factory: Callable[[], CacheBackend]) -> None:
+    _BACKENDS[name] = factory
+
+
+def get_backend(name: Optional[str] = None) -> CacheBackend:
+    name = (name or os.getenv("AGRI_CACHE_BACKEND", "sqlite")).lower()
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown cache backend {name!r}; choose from {sorted(_BACKENDS)}")
+    return _BACKENDS[name]()
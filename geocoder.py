@@ -0,0 +1,328 @@
+"""
+Offline geocoder over a local gazetteer of Indian places, markets and pincodes.
+
+The gazetteer is a CSV (build one from GeoNames with build_gazetteer.py, or
+export an OSM extract or Census village list) with the columns:
+
+    name, lat, lon, type, district, state, pincode, importance, alt_names
+
+Only name/lat/lon are required; alt_names is ';'-separated. It is loaded
+lazily on first use and reloaded when the file's mtime changes.
+
+Forward search scores every query token against a prefix index of place-name
+tokens (plus alt names), falling back to a trigram index for misspellings;
+district, state, type and pincode tokens count as context. Reverse lookup is
+a nearest-neighbour query on a KD-tree over unit-sphere coordinates, so
+Euclidean distance in the tree is monotonic in great-circle distance.
+
+Precision trade-off: a gazetteer of towns and markets rarely has a place
+within the street-level radius of a farm. ``reverse(..., snap_km=...)``
+then answers with the nearest place up to ``snap_km`` away, marked
+``approximate`` with its ``distance_km``. That is a district-level answer.
+The district and state are right except near district borders, but the
+named place is the nearest town, not the farm's own locality. Callers that
+need the locality itself pass snap_km=0 and fall back to Nominatim.
+
+Results use the same fields as the Nominatim responses they replace; callers
+fall back to Nominatim when nothing here is a confident match.
+"""
+import os
+import re
+import csv
+import math
+import time
+import bisect
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from textsim import edit_ratio, trigrams
+
+# gazetteer.csv is what build_gazetteer.py writes; until one is built, the
+# bundled extract (Kerala district headquarters, major towns and markets) answers
+_HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GAZETTEER = next((p for p in (os.path.join(_HERE, "gazetteer.csv"), os.path.join(_HERE, "gazetteer_kerala.csv"))
+                          if os.path.exists(p)), os.path.join(_HERE, "gazetteer.csv"))
+
+MIN_SCORE = 0.75            # mean per-token match weight needed to answer offline
+MAX_PREFIX_EXPANSION = 50   # name tokens one short query token may expand to
+EARTH_RADIUS_KM = 6371.0
+
+# Nominatim-like (class, type, address key) for gazetteer types
+_PLACE_TYPES = {
+    "city": ("place", "city", "city"),
+    "town": ("place", "town", "town"),
+    "village": ("place", "village", "village"),
+    "hamlet": ("place", "hamlet", "hamlet"),
+    "suburb": ("place", "suburb", "suburb"),
+    "locality": ("place", "locality", "locality"),
+    "market": ("amenity", "marketplace", "amenity"),
+    "mandi": ("amenity", "marketplace", "amenity"),
+    "pincode": ("boundary", "postal_code", None),
+}
+
+# Largest distance (km) to the nearest place that still answers a reverse
+# lookup at a given Nominatim zoom; coarser zooms tolerate more
+_REVERSE_MAX_KM = ((14, 3.0), (10, 10.0), (0, 30.0))
+
+
+def _tokens(s: str) -> List[str]:
+    s = unicodedata.normalize("NFKD", s or "").encode("ascii", "ignore").decode("ascii").lower()
+    return [t for t in re.split(r"[^a-z0-9]+", s) if t]
+
+
+def _unit_xyz(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def _haversine_km(lat1, lon1, lat2, lon2) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class _KDTree:
+    """Static 3-d KD-tree stored implicitly: the median of each range is its node."""
+
+    def __init__(self, points: np.ndarray):
+        order = np.arange(len(points))
+        axis = np.zeros(len(points), dtype=np.int8)
+        stack = [(0, len(points), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= 1:
+                continue
+            ax = depth % 3
+            mid = (lo + hi) // 2
+            idx = order[lo:hi]
+            order[lo:hi] = idx[np.argpartition(points[idx, ax], mid - lo)]
+            axis[mid] = ax
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+        # plain lists: per-element access in nearest() is much faster than on arrays
+        self._pts = points.tolist()
+        self._order = order.tolist()
+        self._axis = axis.tolist()
+
+    def nearest(self, q) -> Tuple[int, float]:
+        q = [float(v) for v in q]
+        best, best_d = -1, float("inf")
+        stack = [(0, len(self._pts))]
+        while stack:
+            lo, hi = stack.pop()
+            if hi <= lo:
+                continue
+            mid = (lo + hi) // 2
+            i = self._order[mid]
+            p = self._pts[i]
+            d = (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+            if d < best_d:
+                best, best_d = i, d
+            ax = self._axis[mid]
+            diff = q[ax] - p[ax]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            if diff * diff < best_d:
+                stack.append(far)
+            stack.append(near)
+        return best, best_d
+
+
+class Gazetteer:
+    def __init__(self, path: str = DEFAULT_GAZETTEER, check_interval: float = 60.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = float("-inf")
+        self._places: List[Dict] = []
+        self._tree: Optional[_KDTree] = None
+
+    @property
+    def source(self) -> Dict:
+        return {"service": "Local gazetteer", "endpoint": os.path.basename(self.path)}
+
+    def _load(self):
+        places: List[Dict] = []
+        name_index: Dict[str, Set[int]] = {}
+        ctx_index: Dict[str, Set[int]] = {}
+        with open(self.path, newline="", encoding="utf-8") as fh:
+            for row in csv.DictReader(fh):
+                try:
+                    lat = float(row.get("lat") or row.get("latitude"))
+                    lon = float(row.get("lon") or row.get("longitude"))
+                except (TypeError, ValueError):
+                    continue
+                name = (row.get("name") or "").strip()
+                if not name:
+                    continue
+                pid = len(places)
+                try:
+                    importance = float(row["importance"]) if row.get("importance") else None
+                except ValueError:
+                    importance = None
+                place = {
+                    "name": name, "lat": lat, "lon": lon,
+                    "type": (row.get("type") or "locality").strip().lower(),
+                    "district": (row.get("district") or "").strip(),
+                    "state": (row.get("state") or "").strip(),
+                    "pincode": (row.get("pincode") or "").strip(),
+                    "importance": importance,
+                }
+                places.append(place)
+                names = [name] + [a for a in (row.get("alt_names") or "").split(";") if a.strip()]
+                for t in {t for nm in names for t in _tokens(nm)}:
+                    name_index.setdefault(t, set()).add(pid)
+                ctx = " ".join([place["district"], place["state"], place["type"], place["pincode"]])
+                for t in set(_tokens(ctx)):
+                    ctx_index.setdefault(t, set()).add(pid)
+
+        grams: Dict[str, Set[str]] = {}
+        for t in name_index:
+            for g in trigrams(t):
+                grams.setdefault(g, set()).add(t)
+        tree = None
+        if places:
+            coords = np.array([(p["lat"], p["lon"]) for p in places], dtype=float)
+            tree = _KDTree(_unit_xyz(coords[:, 0], coords[:, 1]))
+
+        self._places, self._name_index, self._ctx_index = places, name_index, ctx_index
+        self._name_sorted, self._ctx_sorted = sorted(name_index), sorted(ctx_index)
+        self._grams, self._tree = grams, tree
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return  # no gazetteer (yet); keep whatever we had
+            if mtime != self._mtime:
+                self._load()
+                self._mtime = mtime
+
+    def __len__(self):
+        self._maybe_reload()
+        return len(self._places)
+
+    # ---------- forward ----------
+
+    @staticmethod
+    def _expand(token: str, index: Dict[str, Set[int]], sorted_tokens: List[str]) -> Dict[int, float]:
+        weights: Dict[int, float] = {}
+
+        def add(ids, w):
+            for i in ids:
+                if w > weights.get(i, 0.0):
+                    weights[i] = w
+
+        add(index.get(token, ()), 1.0)
+        if len(token) >= 3:
+            start = bisect.bisect_left(sorted_tokens, token)
+            for t in sorted_tokens[start:start + MAX_PREFIX_EXPANSION]:
+                if not t.startswith(token):
+                    break
+                if t != token:
+                    add(index[t], 0.9)
+        return weights
+
+    def _fuzzy(self, token: str) -> Dict[int, float]:
+        # misspellings ("kozhikkode", "trissur"): trigram prefilter, then edit distance
+        qg = trigrams(token)
+        counts: Dict[str, int] = {}
+        for g in qg:
+            for t in self._grams.get(g, ()):
+                counts[t] = counts.get(t, 0) + 1
+        weights: Dict[int, float] = {}
+        for t, shared in counts.items():
+            if shared / (len(qg) + len(trigrams(t)) - shared) < 0.3:
+                continue
+            sim = edit_ratio(token, t)
+            if sim >= 0.75:
+                for i in self._name_index[t]:
+                    weights[i] = max(weights.get(i, 0.0), 0.9 * sim)
+        return weights
+
+    def search(self, q: str, limit: int = 5, min_score: float = MIN_SCORE) -> List[Dict]:
+        """Nominatim-shaped results for confident matches, best first; [] if none."""
+        self._maybe_reload()
+        qtokens = _tokens(q)
+        if not qtokens or not self._places:
+            return []
+        per_token = []
+        for t in qtokens:
+            name_w = self._expand(t, self._name_index, self._name_sorted) or self._fuzzy(t)
+            ctx_w = self._expand(t, self._ctx_index, self._ctx_sorted)
+            per_token.append((name_w, ctx_w))
+
+        # a candidate has to match the query on its name, not just its district
+        candidates: Set[int] = set()
+        for name_w, _ in per_token:
+            candidates.update(name_w)
+        scored = []
+        for i in candidates:
+            total = sum(max(name_w.get(i, 0.0), ctx_w.get(i, 0.0)) for name_w, ctx_w in per_token)
+            score = total / len(qtokens)
+            if score >= min_score:
+                scored.append((score, self._places[i]["importance"] or 0.0, i))
+        scored.sort(reverse=True)
+        return [self._result(i, score) for score, _, i in scored[:limit]]
+
+    # ---------- reverse ----------
+
+    def reverse(self, lat: float, lon: float, zoom: int = 16, snap_km: float = 0.0) -> Optional[Dict]:
+        """
+        Nearest place, or None if it is too far away for the requested zoom.
+        Up to ``snap_km`` away, a place beyond the zoom's radius still answers,
+        marked approximate (see the module docstring).
+        """
+        self._maybe_reload()
+        if self._tree is None:
+            return None
+        i, _ = self._tree.nearest(_unit_xyz(np.array(lat, dtype=float), np.array(lon, dtype=float)))
+        p = self._places[i]
+        max_km = next(km for z, km in _REVERSE_MAX_KM if zoom >= z)
+        km = _haversine_km(lat, lon, p["lat"], p["lon"])
+        if km > max(max_km, snap_km):
+            return None
+        r = self._result(i)
+        out = {"display_name": r["display_name"], "lat": r["lat"], "lon": r["lon"], "address": r["address"]}
+        if km > max_km:
+            out.update(approximate=True, distance_km=round(km, 1))
+        return out
+
+    # ---------- formatting ----------
+
+    def _result(self, i: int, score: Optional[float] = None) -> Dict:
+        p = self._places[i]
+        cls, typ, addr_key = _PLACE_TYPES.get(p["type"], ("place", p["type"], p["type"]))
+        address = {}
+        if addr_key:
+            address[addr_key] = p["name"]
+        if p["district"]:
+            address["state_district"] = p["district"]
+        if p["state"]:
+            address["state"] = p["state"]
+        if p["pincode"]:
+            address["postcode"] = p["pincode"]
+        address["country"] = "India"
+        address["country_code"] = "in"
+        parts = [p["name"], p["district"], p["state"], p["pincode"], "India"]
+        display = ", ".join(dict.fromkeys(x for x in parts if x))
+        importance = p["importance"] if p["importance"] is not None else (round(score, 3) if score is not None else None)
+        return {
+            "display_name": display,
+            "lat": p["lat"],
+            "lon": p["lon"],
+            "type": typ,
+            "class": cls,
+            "importance": importance,
+            "address": address,
+        }
@@ -0,0 +1,51 @@
+"""
+Spatial quantisation for point-based upstreams.
+
+Each source is snapped to (an approximation of) its native grid, so every
+point inside one grid cell maps to the same cell id, the same upstream query
+coordinates and therefore the same cache entry. Cell ids are integer (row,
+col) pairs on a regular lat/lon lattice, which doubles as a spatial hash
+index for the cache: nearby queries land on identical keys.
+"""
+from typing import Dict, Tuple
+
+# source -> (lat step, lon step) in degrees; nodes sit at -90 + i*dlat, -180 + j*dlon
+GRIDS: Dict[str, Tuple[float, float]] = {
+    "nasa_power": (0.5, 0.625),      # MERRA-2 meteorology grid
+    "open_meteo": (0.1, 0.1),        # ~11 km global model grid
+    "soilgrids": (0.0025, 0.0025),   # 250 m raster
+    "openaq": (0.01, 0.01),          # ~1 km; nearest-station searches use a 10 km radius
+    "meteostat": (0.05, 0.05),       # nearest-station resolution
+}
+
+
+def cell_id(source: str, lat: float, lon: float) -> Tuple[int, int]:
+    dlat, dlon = GRIDS[source]
+    lat = min(90.0, max(-90.0, float(lat)))
+    lon = ((float(lon) + 180.0) % 360.0) - 180.0
+    return int(round((lat + 90.0) / dlat)), int(round((lon + 180.0) / dlon))
+
+
+def cell_center(source: str, cell: Tuple[int, int]) -> Tuple[float, float]:
+    dlat, dlon = GRIDS[source]
+    lat = round(-90.0 + cell[0] * dlat, 6)
+    lon = round(((cell[1] * dlon) % 360.0) - 180.0, 6)
+    return lat, lon
+
+
+def snap(source: str, lat: float, lon: float) -> Tuple[float, float]:
+    """Coordinates of the grid node nearest to (lat, lon) for ``source``."""
+    return cell_center(source, cell_id(source, lat, lon))
+
+
+def cell_key(source: str, lat: float, lon: float) -> str:
+    i, j = cell_id(source, lat, lon)
+    return f"{source}@{i},{j}"
+
+
+def describe(source: str, lat: float, lon: float) -> Dict:
+    """Grid metadata to echo back in responses."""
+    cell = cell_id(source, lat, lon)
+    slat, slon = cell_center(source, cell)
+    dlat, dlon = GRIDS[source]
+    return {"cell": f"{cell[0]},{cell[1]}", "lat": slat, "lon": slon, "resolution_deg": [dlat, dlon]}
@@ -0,0 +1,195 @@
+"""
+Crop water balance for irrigation scheduling (FAO-56, single crop coefficient).
+
+For each plot and day:
+
+    ETc = Kc(crop, days after sowing) * ET0
+    Dr  = Dr(previous day) - effective rain + ETc        root-zone depletion, mm
+    irrigate Dr mm (back to field capacity) once Dr > RAW = p * TAW
+
+TAW, the total available water (mm), is the soil's available water capacity
+times the current rooting depth. Rooting depth grows from ROOT_DEPTH_INITIAL
+at sowing to the crop's maximum at the start of mid-season. Available water
+capacity comes from SoilGrids water content at field capacity (wv0033) and
+wilting point (wv1500). Where those are missing it is estimated from sand,
+clay and organic carbon (Saxton & Rawls 2006), and failing that
+DEFAULT_AWC is used.
+
+Everything is vectorised over plots: arrays are (plots, days), and only the
+day-to-day recursion of the balance is a Python loop.
+"""
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# FAO-56 Tables 11, 12 and 22: stage lengths (initial, development, mid,
+# late; days), Kc (initial, mid, end), maximum rooting depth (m) and
+# depletion fraction p. Perennials have no stages and keep Kc mid.
+CROPS: Dict[str, Dict] = {
+    "rice":      {"stages": (30, 30, 60, 30),    "kc": (1.05, 1.20, 0.90), "root_depth": 0.5, "p": 0.20},
+    "banana":    {"stages": (120, 90, 120, 60),  "kc": (0.50, 1.10, 1.00), "root_depth": 0.8, "p": 0.35},
+    "cassava":   {"stages": (20, 40, 90, 60),    "kc": (0.30, 0.80, 0.30), "root_depth": 0.7, "p": 0.35},
+    "groundnut": {"stages": (25, 35, 45, 25),    "kc": (0.40, 1.15, 0.60), "root_depth": 0.8, "p": 0.50},
+    "maize":     {"stages": (20, 35, 40, 30),    "kc": (0.30, 1.20, 0.35), "root_depth": 1.0, "p": 0.55},
+    "tomato":    {"stages": (30, 40, 45, 30),    "kc": (0.60, 1.15, 0.80), "root_depth": 0.7, "p": 0.40},
+    "eggplant":  {"stages": (30, 40, 40, 20),    "kc": (0.60, 1.05, 0.90), "root_depth": 0.7, "p": 0.45},
+    "cabbage":   {"stages": (40, 60, 50, 15),    "kc": (0.70, 1.05, 0.95), "root_depth": 0.5, "p": 0.45},
+    "cowpea":    {"stages": (20, 30, 30, 20),    "kc": (0.40, 1.05, 0.35), "root_depth": 0.6, "p": 0.45},
+    "green_bean": {"stages": (20, 30, 30, 10),   "kc": (0.50, 1.05, 0.90), "root_depth": 0.5, "p": 0.45},
+    "sugarcane": {"stages": (35, 60, 190, 120),  "kc": (0.40, 1.25, 0.75), "root_depth": 1.2, "p": 0.65},
+    "coconut":   {"stages": None,                "kc": (0.95, 1.00, 1.00), "root_depth": 1.0, "p": 0.65},
+}
+
+CROP_ALIASES = {
+    "paddy": "rice", "tapioca": "cassava", "brinjal": "eggplant", "beans": "green_bean",
+    "green beans": "green_bean", "peanut": "groundnut", "corn": "maize", "palm": "coconut",
+}
+
+STAGE_NAMES = ("initial", "development", "mid", "late")
+ROOT_DEPTH_INITIAL = 0.3     # m, effective rooting depth at sowing
+DEFAULT_AWC = 0.14           # m3/m3, medium loam
+EFFECTIVE_RAIN = 0.8         # share of rainfall that reaches the root zone
+AWC_DEPTHS = {"0-5cm": 50, "5-15cm": 100, "15-30cm": 150, "30-60cm": 300, "60-100cm": 400}   # mm thick
+
+
+def crop_name(crop: Optional[str]) -> Optional[str]:
+    """Canonical CROPS key for a crop name or alias, or None."""
+    c = (crop or "").strip().lower().replace("-", " ")
+    c = CROP_ALIASES.get(c, c).replace(" ", "_")
+    return c if c in CROPS else None
+
+
+def _saxton_rawls(sand: float, clay: float, om: float):
+    # sand, clay as fractions, om (organic matter) in % by weight; returns (theta_33, theta_1500) m3/m3
+    s, c = sand, clay
+    t1500 = -0.024 * s + 0.487 * c + 0.006 * om + 0.005 * s * om - 0.013 * c * om + 0.068 * s * c + 0.031
+    t33 = -0.251 * s + 0.195 * c + 0.011 * om + 0.006 * s * om - 0.027 * c * om + 0.452 * s * c + 0.299
+    return t33 + (1.283 * t33 * t33 - 0.374 * t33 - 0.015), t1500 + (0.14 * t1500 - 0.02)
+
+
+def available_water(layers: Dict[str, Dict[str, Optional[float]]]):
+    """
+    Thickness-weighted available water capacity (m3/m3) over 0-100 cm, and
+    how it was obtained. ``layers`` maps a SoilGrids depth label to scaled
+    property values: wv0033/wv1500 in vol%, sand/clay in %, soc in g/kg.
+    """
+    total, weight, methods = 0.0, 0, set()
+    for label, thickness in AWC_DEPTHS.items():
+        v = layers.get(label) or {}
+        awc = None
+        if v.get("wv0033") is not None and v.get("wv1500") is not None:
+            awc, method = (v["wv0033"] - v["wv1500"]) / 100.0, "soilgrids_water_content"
+        elif v.get("sand") is not None and v.get("clay") is not None:
+            om = (v.get("soc") or 0.0) * 1.724 / 10.0   # g/kg organic carbon -> % organic matter
+            fc, wp = _saxton_rawls(v["sand"] / 100.0, v["clay"] / 100.0, om)
+            awc, method = fc - wp, "pedotransfer"
+        if awc is not None and awc > 0:
+            total += awc * thickness
+            weight += thickness
+            methods.add(method)
+    if not weight:
+        return DEFAULT_AWC, "default"
+    return total / weight, "+".join(sorted(methods))
+
+
+def crop_curves(crops: Sequence[str], sowing: Sequence[date], days: Sequence[date]):
+    """
+    Kc, rooting depth (m) and growth stage index for every (plot, day).
+    Stage index: 0-3 FAO stages, -1 before sowing, 4 after harvest, 2 for perennials.
+    """
+    n, d = len(crops), len(days)
+    ordinals = np.array([x.toordinal() for x in days])
+    das = ordinals[None, :] - np.array([s.toordinal() for s in sowing])[:, None]
+    kc = np.zeros((n, d))
+    root = np.zeros((n, d))
+    stage = np.full((n, d), -1, dtype=np.int8)
+    crops = np.asarray(crops)
+    for name in set(crops.tolist()):
+        rows = crops == name
+        c = CROPS[name]
+        k_ini, k_mid, k_end = c["kc"]
+        zr = c["root_depth"]
+        if c["stages"] is None:
+            kc[rows], root[rows], stage[rows] = k_mid, zr, 2
+            continue
+        ini, dev, mid, late = c["stages"]
+        x = das[rows]
+        edges = np.cumsum([ini, dev, mid, late])
+        kc[rows] = np.interp(x, [0, ini, ini + dev, edges[2], edges[3]], [k_ini, k_ini, k_mid, k_mid, k_end])
+        root[rows] = np.interp(x, [0, ini + dev], [min(ROOT_DEPTH_INITIAL, zr), zr])
+        st = np.searchsorted(edges, x, side="right").astype(np.int8)
+        st[x < 0] = -1
+        stage[rows] = st
+    off_season = (stage < 0) | (stage > 3)
+    kc[off_season] = 0.0
+    return kc, root, stage
+
+
+def water_balance(et0: np.ndarray, rain: np.ndarray, kc: np.ndarray, root: np.ndarray,
+                  awc: np.ndarray, p: np.ndarray, depletion0: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Daily root-zone balance for (plots, days) arrays; ``awc``, ``p`` and
+    ``depletion0`` (mm at the start of the first day) are per plot.
+    Returns etc, effective_rain, taw, raw, depletion (end of day) and irrigation, all mm.
+    """
+    et0 = np.nan_to_num(et0)
+    rain = np.nan_to_num(rain)
+    etc = kc * et0
+    eff_rain = rain * EFFECTIVE_RAIN
+    taw = awc[:, None] * root * 1000.0
+    # FAO-56 eq. 84: plants draw down further before stress when ETc is low
+    raw = np.clip(p[:, None] + 0.04 * (5.0 - etc), 0.1, 0.8) * taw
+    depletion = np.empty_like(etc)
+    irrigation = np.zeros_like(etc)
+    dr = np.minimum(np.maximum(depletion0, 0.0), taw[:, 0])
+    for j in range(etc.shape[1]):
+        # rain beyond field capacity drains below the root zone
+        dr = np.minimum(np.maximum(dr - eff_rain[:, j] + etc[:, j], 0.0), taw[:, j])
+        need = (dr > raw[:, j]) & (kc[:, j] > 0)
+        irrigation[:, j] = np.where(need, dr, 0.0)
+        dr = np.where(need, 0.0, dr)
+        depletion[:, j] = dr
+    return {"etc": etc, "effective_rain": eff_rain, "taw": taw, "raw": raw,
+            "depletion": depletion, "irrigation": irrigation}
+
+
+def schedules(plots: List[Dict], days: List[date], et0: np.ndarray, rain: np.ndarray,
+              awc: np.ndarray) -> List[Dict]:
+    """
+    Schedules for ``plots`` (dicts with crop, sowing_date as date, depletion_mm)
+    over ``days``; et0/rain are (plots, days) mm, awc per plot m3/m3.
+    """
+    crops = [p["crop"] for p in plots]
+    kc, root, stage = crop_curves(crops, [p["sowing_date"] for p in plots], days)
+    wb = water_balance(et0, rain, kc, root, awc, np.array([CROPS[c]["p"] for c in crops]),
+                       np.array([p.get("depletion_mm") or 0.0 for p in plots], dtype=float))
+    r = {k: np.round(v, 2).tolist() for k, v in wb.items()}
+    kc_l, stage_l = np.round(kc, 3).tolist(), stage.tolist()
+    et0_l, rain_l = np.round(np.nan_to_num(et0), 2).tolist(), np.round(np.nan_to_num(rain), 2).tolist()
+    labels = [d.isoformat() for d in days]
+    out = []
+    for i in range(len(plots)):
+        rows = []
+        for j, day in enumerate(labels):
+            st = stage_l[i][j]
+            rows.append({
+                "date": day,
+                "stage": "before_sowing" if st < 0 else "after_harvest" if st > 3 else STAGE_NAMES[st],
+                "kc": kc_l[i][j],
+                "et0_mm": et0_l[i][j],
+                "etc_mm": r["etc"][i][j],
+                "rain_mm": rain_l[i][j],
+                "effective_rain_mm": r["effective_rain"][i][j],
+                "taw_mm": r["taw"][i][j],
+                "raw_mm": r["raw"][i][j],
+                "depletion_mm": r["depletion"][i][j],
+                "irrigation_mm": r["irrigation"][i][j],
+            })
+        next_day = next((row["date"] for row in rows if row["irrigation_mm"] > 0), None)
+        out.append({
+            "schedule": rows,
+            "total_irrigation_mm": round(float(wb["irrigation"][i].sum()), 2),
+            "next_irrigation": next_day,
+        })
+    return out
@@ -0,0 +1,119 @@
+"""
+Startup timing and readiness for myPoint.py and api_llm/main.py.
+
+Scale-to-zero deployments care about one number: how long after the
+process starts it can serve. Lifecycle records when the process started
+(from /proc, so interpreter start-up and imports are included), when the
+app module finished importing, and when the lifespan startup completed.
+
+    lifecycle = Lifecycle("myPoint")          # first thing in the module
+    ...
+    lifecycle.imported()                       # end of the module
+    # in the lifespan:
+    with lifecycle.starting():
+        ... open clients, start workers ...
+    yield
+    lifecycle.stopping()
+
+``ready`` is True between the end of startup and the start of shutdown;
+the apps' readiness endpoints answer 503 outside that window, so load
+balancers only route to instances that can serve and stop routing to
+draining ones. ``report()`` gives the phase timings in seconds.
+
+Heavy libraries (pandas) are imported where they are used. ``warm_imports``
+then loads them on a background thread once the app is ready, so the
+first request that needs one does not pay the import either
+(LAZY_IMPORT_WARMUP=0 disables it).
+"""
+import os
+import time
+import logging
+import importlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+LAZY_IMPORT_WARMUP = os.getenv("LAZY_IMPORT_WARMUP", "1") not in ("0", "false", "no")
+STARTUP_BUDGET_S = float(os.getenv("STARTUP_BUDGET_S", "0") or 0)   # log a warning above this; 0 = off
+
+logger = logging.getLogger("lifecycle")
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process was started, or None where /proc is not available."""
+    try:
+        with open("/proc/self/stat") as fh:
+            # the command name (field 2) may contain spaces; fields after it are fixed
+            starttime = int(fh.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as fh:
+            uptime = float(fh.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - starttime / os.sysconf("SC_CLK_TCK"))
+
+
+class Lifecycle:
+    def __init__(self, name: str):
+        self.name = name
+        self._t0 = time.monotonic()
+        age = process_age()
+        # monotonic time the process started; /proc has 10 ms resolution
+        self._process_start = self._t0 - age if age is not None else None
+        self._phases: Dict[str, float] = {}
+        self.ready = False
+        self.stopped = False
+        self.warmed: Dict[str, float] = {}
+
+    def imported(self):
+        self._phases["import_s"] = time.monotonic() - self._t0
+
+    @contextmanager
+    def starting(self):
+        t = time.monotonic()
+        yield
+        now = time.monotonic()
+        self._phases["startup_s"] = now - t
+        self._phases["ready_s"] = now - (self._process_start if self._process_start is not None else self._t0)
+        self.ready = True
+        logger.info("%s ready in %.2fs (%s)", self.name, self._phases["ready_s"], self._format())
+        if STARTUP_BUDGET_S and self._phases["ready_s"] > STARTUP_BUDGET_S:
+            logger.warning("%s startup took %.2fs, over the %.2fs budget", self.name,
+                           self._phases["ready_s"], STARTUP_BUDGET_S)
+
+    def stopping(self):
+        self.ready = False
+        self.stopped = True
+
+    def _format(self) -> str:
+        return ", ".join(f"{k}={v:.3f}" for k, v in self._phases.items())
+
+    def report(self) -> Dict:
+        out = {"ready": self.ready, **{k: round(v, 4) for k, v in self._phases.items()}}
+        if self._process_start is not None:
+            out["uptime_s"] = round(time.monotonic() - self._process_start, 1)
+        if self.warmed:
+            out["warm_imports"] = {k: round(v, 4) for k, v in self.warmed.items()}
+        return out
+
+    def warm_imports(self, modules: Iterable[str]):
+        """Import ``modules`` on a daemon thread, so lazily imported libraries are loaded before they are needed."""
+        if not LAZY_IMPORT_WARMUP:
+            return
+
+        def run():
+            for name in modules:
+                t = time.monotonic()
+                try:
+                    importlib.import_module(name)
+                except ImportError as e:
+                    logger.warning("warm import of %s failed: %s", name, e)
+                    continue
+                self.warmed[name] = time.monotonic() - t
+
+        threading.Thread(target=run, name="warm-imports", daemon=True).start()
+
+    def register(self, registry):
+        """Export the phase timings as gauges on a metrics.Registry."""
+        registry.callback("app_startup_seconds", "Seconds spent in each start-up phase",
+                          lambda: dict(self._phases), labelnames=("phase",))
+        registry.callback("app_ready", "1 while the app accepts traffic", lambda: int(self.ready))
@@ -0,0 +1,289 @@
+"""
+Local Meteostat data store for api_llm/main.py.
+
+The meteostat package is synchronous: it downloads per-station, per-year bulk
+files and parses them with pandas. MeteostatStore runs all of that on a small
+thread pool so it never blocks the event loop, and keeps what it learns in a
+data directory that survives restarts:
+
+  - bulk/       meteostat's own file cache (station list, yearly bulk files),
+                evicted least-recently-used beyond ``max_bytes``
+  - index.db    nearest station per grid point, and one row per
+                (station, day) that has been fetched
+
+A request only downloads the days it does not hold yet, merged into
+contiguous ranges, and one lock per station makes overlapping requests wait
+for each other instead of fetching the same days twice. (Meteostat's yearly
+bulk files stay in bulk/, so several ranges in one year cost one download.)
+Days still recent enough to be revised are refetched once they are older
+than ``recent_ttl``.
+"""
+import os
+import json
+import math
+import time
+import sqlite3
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "meteostat")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    point TEXT PRIMARY KEY,          -- 'lat,lon' of the grid point
+    station TEXT NOT NULL,
+    name TEXT,
+    latitude REAL,
+    longitude REAL,
+    distance REAL,                   -- metres from the grid point
+    resolved_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS days (
+    station TEXT NOT NULL,
+    day TEXT NOT NULL,               -- YYYY-MM-DD
+    row TEXT,                        -- JSON record, NULL if the station has no data that day
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (station, day)
+);
+CREATE TABLE IF NOT EXISTS station_use (
+    station TEXT PRIMARY KEY,
+    used_at REAL NOT NULL
+);
+"""
+
+
+def _clean(v):
+    # NaN/NaT -> None, Timestamps -> ISO strings, numpy scalars -> Python
+    if v is None:
+        return None
+    if hasattr(v, "isoformat"):
+        return None if v != v else v.isoformat()
+    if hasattr(v, "item"):
+        v = v.item()
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    return v
+
+
+def _day_range(start: date, end: date) -> List[str]:
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def merge_ranges(days: List[str], merge_gap: int) -> List[Tuple[date, date]]:
+    """Group sorted ISO days into (first, last) ranges, bridging gaps shorter than ``merge_gap`` days."""
+    ranges: List[Tuple[date, date]] = []
+    for d in (date.fromisoformat(s) for s in sorted(days)):
+        if ranges and (d - ranges[-1][1]).days <= merge_gap:
+            ranges[-1] = (ranges[-1][0], d)
+        else:
+            ranges.append((d, d))
+    return ranges
+
+
+class MeteostatStore:
+    def __init__(self, data_dir: str = DEFAULT_DATA_DIR, workers: int = 2, max_bytes: int = 512 * 1024 * 1024,
+                 bulk_max_age: float = 86400, recent_days: int = 10, recent_ttl: float = 6 * 3600,
+                 station_ttl: float = 30 * 86400, merge_gap: int = 1, keep_unused: float = 90 * 86400):
+        self.data_dir = data_dir
+        self.bulk_dir = os.path.join(data_dir, "bulk")
+        self.path = os.path.join(data_dir, "index.db")
+        self.max_bytes = max_bytes
+        self.bulk_max_age = bulk_max_age
+        self.recent_days = recent_days
+        self.recent_ttl = recent_ttl
+        self.station_ttl = station_ttl
+        self.merge_gap = merge_gap
+        self.keep_unused = keep_unused
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="meteostat")
+        self._local = threading.local()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._evicted_at = 0.0
+        self.fetches = 0
+        os.makedirs(self.bulk_dir, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _station_lock(self, station: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(station, threading.Lock())
+
+    def _configure(self):
+        # meteostat keeps its settings as class attributes; point them at our directory
+        from meteostat import Daily, Stations
+        for cls in (Daily, Stations):
+            cls.cache_dir = self.bulk_dir
+            cls.max_age = self.bulk_max_age
+            cls.autoclean = False   # evict() manages the directory
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    # ---------- stations ----------
+
+    def _cached_station(self, point: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT station, name, latitude, longitude, distance FROM stations WHERE point = ? AND resolved_at > ?",
+            (point, time.time() - self.station_ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "name": row[1], "latitude": row[2], "longitude": row[3], "distance": row[4]}
+
+    def _resolve_station(self, point: str, lat: float, lon: float) -> Optional[Dict]:
+        from meteostat import Stations
+        self._configure()
+        df = Stations().nearby(lat, lon).inventory("daily", True).fetch(1)
+        if df.empty:
+            return None
+        sid, s = df.index[0], df.iloc[0]
+        station = {"id": str(sid), "name": _clean(s.get("name")), "latitude": _clean(s.get("latitude")),
+                   "longitude": _clean(s.get("longitude")), "distance": _clean(s.get("distance"))}
+        self._conn().execute(
+            "INSERT OR REPLACE INTO stations (point, station, name, latitude, longitude, distance, resolved_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (point, station["id"], station["name"], station["latitude"], station["longitude"],
+             station["distance"], time.time()),
+        )
+        return station
+
+    # ---------- days ----------
+
+    def _missing(self, station: str, days: List[str]) -> List[str]:
+        now = time.time()
+        recent = (date.today() - timedelta(days=self.recent_days)).isoformat()
+        have = {
+            d: fetched_at for d, fetched_at in self._conn().execute(
+                "SELECT day, fetched_at FROM days WHERE station = ? AND day BETWEEN ? AND ?",
+                (station, days[0], days[-1]),
+            )
+        }
+        return [d for d in days
+                if d not in have or (d >= recent and now - have[d] > self.recent_ttl)]
+
+    def _fetch(self, station: str, days: List[str]) -> int:
+        """Download the given days for ``station`` and store them; returns upstream fetches made."""
+        from meteostat import Daily
+        with self._station_lock(station):
+            days = self._missing(station, days)   # another request may have filled some meanwhile
+            if not days:
+                return 0
+            self._configure()
+            fetched = 0
+            for first, last in merge_ranges(days, self.merge_gap):
+                df = Daily(station, datetime.combine(first, datetime.min.time()),
+                           datetime.combine(last, datetime.min.time())).fetch()
+                fetched += 1
+                records = {}
+                for rec in df.reset_index().to_dict("records"):
+                    rec = {k: _clean(v) for k, v in rec.items()}
+                    records[str(rec["time"])[:10]] = rec
+                now = time.time()
+                conn = self._conn()
+                with conn:
+                    conn.execute("BEGIN")
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO days (station, day, row, fetched_at) VALUES (?, ?, ?, ?)",
+                        [(station, d, json.dumps(records[d]) if d in records else None, now)
+                         for d in _day_range(first, last)],
+                    )
+            self.fetches += fetched
+        self._maybe_evict()
+        return fetched
+
+    def _rows(self, station: str, days: List[str]) -> List[Dict]:
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO station_use (station, used_at) VALUES (?, ?)", (station, time.time()))
+        return [
+            json.loads(row) for (row,) in conn.execute(
+                "SELECT row FROM days WHERE station = ? AND day BETWEEN ? AND ? AND row IS NOT NULL ORDER BY day",
+                (station, days[0], days[-1]),
+            )
+        ]
+
+    async def daily(self, lat: float, lon: float, start: date, end: date,
+                    before_fetch: Optional[Callable[[], Awaitable]] = None) -> Tuple[Optional[Dict], List[Dict]]:
+        """
+        Daily records of the station nearest to (lat, lon) for start..end
+        inclusive, as (station, rows). ``before_fetch`` is awaited before any
+        download, e.g. to take a rate-limit token. Station is None when there
+        is no station with daily data.
+        """
+        point = f"{lat:.4f},{lon:.4f}"
+        station = await self._run(self._cached_station, point)
+        if station is None:
+            if before_fetch is not None:
+                await before_fetch()
+            station = await self._run(self._resolve_station, point, lat, lon)
+            if station is None:
+                return None, []
+        days = _day_range(start, end)
+        missing = await self._run(self._missing, station["id"], days)
+        if missing:
+            if before_fetch is not None:
+                await before_fetch()
+            await self._run(self._fetch, station["id"], missing)
+        return station, await self._run(self._rows, station["id"], days)
+
+    # ---------- eviction ----------
+
+    def _maybe_evict(self, interval: float = 600):
+        if time.monotonic() - self._evicted_at >= interval:
+            self._evicted_at = time.monotonic()
+            self.evict()
+
+    def evict(self) -> Dict:
+        """Trim bulk files to ``max_bytes`` (least recently used first) and drop long-unused stations."""
+        files = []
+        for root, _, names in os.walk(self.bulk_dir):
+            for n in names:
+                p = os.path.join(root, n)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                files.append((max(st.st_atime, st.st_mtime), st.st_size, p))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, p in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        cutoff = time.time() - self.keep_unused
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            cur = conn.execute(
+                "DELETE FROM days WHERE station IN (SELECT station FROM station_use WHERE used_at < ?)", (cutoff,))
+            conn.execute("DELETE FROM station_use WHERE used_at < ?", (cutoff,))
+        return {"files_removed": removed, "bulk_bytes": total, "rows_removed": cur.rowcount}
+
+    def stats(self) -> Dict:
+        conn = self._conn()
+        return {
+            "data_dir": self.data_dir,
+            "stations": conn.execute("SELECT COUNT(*) FROM stations").fetchone()[0],
+            "days": conn.execute("SELECT COUNT(*) FROM days").fetchone()[0],
+            "upstream_fetches": self.fetches,
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,280 @@
+"""
+Prometheus-style metrics and sampled stage tracing for myPoint.py and api_llm/main.py.
+
+Each app creates one ``Metrics`` and gets:
+  - http_request_duration_seconds{route,method,status}   histogram, per route template
+  - http_requests_in_flight                               gauge
+  - upstream_request_duration_seconds{upstream,status}    histogram, per outbound call
+  - json_serialize_seconds                                histogram, response rendering
+plus whatever the app registers itself (cache gauges, breaker state, ...), all
+served in the text exposition format by ``metrics.endpoint`` at /metrics.
+Request metrics are recorded by MetricsMiddleware.
+
+Values are per process; with several workers each scrape sees one worker.
+
+Tracing: a TRACE_SAMPLE_RATE fraction of requests (default 0) record how long
+each stage took (cache lookups, upstream calls, transforms, serialisation) and
+log one line per request on the "metrics.trace" logger.
+"""
+import os
+import time
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.responses import Response
+
+from payloads import FastJSONResponse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SERIALIZE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+trace_logger = logging.getLogger("metrics.trace")
+
+# stages of the current (sampled) request, or None
+_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _snapshot(self) -> List[tuple]:
+        # copy under the lock; histogram states are [bucket counts, sum, count]
+        with self._lock:
+            return [(k, [v[0][:], v[1], v[2]] if isinstance(v, list) else v) for k, v in self._values.items()]
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in self._snapshot()]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Callback(_Metric):
+    """Read at scrape time: ``fn()`` returns a number or {label value(s): number}."""
+
+    def __init__(self, name: str, help: str, fn: Callable, type: str = "gauge", labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def samples(self) -> List[str]:
+        value = self.fn()
+        if not isinstance(value, dict):
+            return [f"{self.name} {_fmt_value(value)}"]
+        out = []
+        for k, v in value.items():
+            k = k if isinstance(k, tuple) else (k,)
+            out.append(f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}")
+        return out
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        out = []
+        names = self.labelnames + ("le",)
+        for key, (counts, total, n) in self._snapshot():
+            cumulative = 0
+            for le, c in zip(self.buckets, counts):
+                cumulative += c
+                out.append(f"{self.name}_bucket{_fmt_labels(names, key + (_fmt_value(le),))} {cumulative}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, fn, type="gauge", labelnames=()) -> Callback:
+        return self.register(Callback(name, help, fn, type, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception:
+                continue  # a broken collector must not break the scrape
+            lines += metric.header() + samples
+        return "\n".join(lines) + "\n"
+
+
+# ---------- tracing ----------
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of the current request; free when the request is not sampled."""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.append((name, time.perf_counter() - t0))
+
+
+def record_stage(name: str, seconds: float):
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+
+class Metrics:
+    def __init__(self, service: str):
+        self.service = service
+        self.registry = Registry()
+        self.requests = self.registry.histogram(
+            "http_request_duration_seconds", "Request latency by route template",
+            ("route", "method", "status"))
+        self.in_flight = self.registry.gauge("http_requests_in_flight", "Requests being served")
+        self.upstream = self.registry.histogram(
+            "upstream_request_duration_seconds", "Outbound call latency by upstream host and status",
+            ("upstream", "status"))
+        self.serialize = self.registry.histogram(
+            "json_serialize_seconds", "Time spent rendering JSON response bodies", buckets=SERIALIZE_BUCKETS)
+
+        metrics = self
+
+        class TimedJSONResponse(FastJSONResponse):
+            def render(self, content) -> bytes:
+                t0 = time.perf_counter()
+                body = super().render(content)
+                elapsed = time.perf_counter() - t0
+                metrics.serialize.observe(elapsed)
+                record_stage("serialize", elapsed)
+                return body
+
+        # pass as FastAPI(default_response_class=...)
+        self.JSONResponse = TimedJSONResponse
+
+    def observe_upstream(self, host: str, status, seconds: float):
+        """``status`` is the HTTP status code, or the exception class name for failed calls."""
+        self.upstream.observe(seconds, upstream=host, status=status)
+        record_stage(f"upstream:{host}", seconds)
+
+    async def endpoint(self):
+        return Response(self.registry.render(), media_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: ``app.add_middleware(MetricsMiddleware, metrics=metrics)``."""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        m = self.metrics
+        status = [500]
+        trace = [] if TRACE_SAMPLE_RATE and random.random() < TRACE_SAMPLE_RATE else None
+        token = _trace.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        m.in_flight.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            m.in_flight.dec()
+            # the router stores the matched route in the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            m.requests.observe(elapsed, route=route, method=scope["method"], status=status[0])
+            if trace is not None:
+                stages = " ".join(f"{name}={secs * 1000:.1f}ms" for name, secs in trace)
+                trace_logger.info("%s %s %s %s %.1fms %s", m.service, scope["method"], route,
+                                  status[0], elapsed * 1000, stages)
+            _trace.reset(token)
@@ -1,7 +1,25 @@
-from flask import Flask, request, jsonify
-import requests
-from datetime import datetime, timedelta
-import pandas as pd
+# first, so the import time of everything below is measured (lifecycle.py)
+from lifecycle import Lifecycle
+lifecycle = Lifecycle("myPoint")
+
+import asyncio
+import base64
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Dict, Optional
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+import contextvars
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from datetime import datetime, timedelta, timezone
+import numpy as np
 
 import re
 from urllib.parse import urljoin
@@ -9,26 +27,506 @@ from urllib.parse import urlencode
 
 import json
 
-app = Flask(__name__)
+from cache_backend import get_backend, make_key
+from grid import snap, describe as grid_describe
+from pesticides import PesticideMatcher
+from price_store import PriceStore
+from geocoder import Gazetteer, DEFAULT_GAZETTEER
+from rate_limit import Scheduler, RateLimited, INTERACTIVE, BATCH, BACKGROUND
+from breaker import Breakers, CircuitOpen
+from metrics import Metrics, MetricsMiddleware, stage
+from payloads import CompressionMiddleware, dumps, iter_json_array
+from prefetch import Prefetcher, PrefetchMiddleware, prefetching, refresh_within
+from soil_raster import SoilRaster
+import irrigation
+
+@asynccontextmanager
+async def _lifespan(app):
+    with lifecycle.starting():
+        await _startup()
+    # pandas is imported on first use (price endpoints); load it while idle
+    lifecycle.warm_imports(["pandas"])
+    try:
+        yield
+    finally:
+        lifecycle.stopping()
+        await _shutdown()
+
+metrics = Metrics("myPoint")
+app = FastAPI(title="Kerala Farm Assist API", default_response_class=metrics.JSONResponse, lifespan=_lifespan)
+lifecycle.register(metrics.registry)
+logger = logging.getLogger("myPoint")
+
+# Shared on-disk cache (see cache_backend.py); TTLs in seconds
+cache = get_backend()
+PRICES_TTL = 3 * 3600          # Agmarknet publishes once a day
+WEATHER_TTL = 3600
+CLIMATOLOGY_TTL = 30 * 86400
+SOILGRIDS_TTL = 30 * 86400     # static dataset
+GEOCODE_TTL = 7 * 86400
+AIR_TTL = 900
 
 # THIS IS MY FUCKING API KEY, DO NOT STEAL IT
 OGD_API_KEY = "579b464db66ec23bdd000001d4f16af7ec7a4885484833345368a2e7"
 OGD_API_URL = "https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070"
 
-@app.route("/marketInfo/prices", methods=["GET"])
-def prices():
-    # Required filters
-    state = request.args.get("state")
-    district = request.args.get("district")
+# Local warehouse of OGD prices, kept fresh by a background sync (price_store.py)
+price_store = PriceStore(os.getenv("AGRI_PRICE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "prices.sqlite3")))
+PRICE_SYNC_STATES = [s.strip() for s in os.getenv("PRICE_SYNC_STATES", "Kerala").split(",") if s.strip()]
+PRICE_SYNC_INTERVAL = int(os.getenv("PRICE_SYNC_INTERVAL", str(6 * 3600)))
+
+# Optional offline SoilGrids: pre-downloaded GeoTIFF/COG tiles (soil_raster.py);
+# points outside them still go to the ISRIC REST API
+SOILGRIDS_RASTER_DIR = os.getenv("SOILGRIDS_RASTER_DIR")
+soil_raster = SoilRaster(SOILGRIDS_RASTER_DIR) if SOILGRIDS_RASTER_DIR else None
+
+# =====================================================
+# HTTP: one keep-alive connection pool per upstream
+# =====================================================
+
+# Per-upstream (connect, read) timeouts, connection-pool sizes and usage-policy
+# rate limits (requests/s and burst, per API key; see rate_limit.py)
+UPSTREAMS = {
+    "api.data.gov.in": {"timeout": (5, 20), "pool_maxsize": 50, "rate": 5, "burst": 10},
+    "api.open-meteo.com": {"timeout": (5, 10), "pool_maxsize": 100, "rate": 10, "burst": 20},
+    "power.larc.nasa.gov": {"timeout": (5, 20), "pool_maxsize": 50, "rate": 2, "burst": 5},
+    "rest.isric.org": {"timeout": (5, 25), "pool_maxsize": 20, "rate": 5 / 60, "burst": 5},   # 5 calls/min fair use
+    "api.openaq.org": {"timeout": (5, 20), "pool_maxsize": 20, "rate": 1, "burst": 10},
+    "nominatim.openstreetmap.org": {"timeout": (5, 20), "pool_maxsize": 2, "rate": 1, "burst": 1, "max_queue": 10},
+}
+DEFAULT_TIMEOUT = (5, 20)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "100"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "30"))   # wait for a free connection
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_MAX_RETRY_AFTER = float(os.getenv("HTTP_MAX_RETRY_AFTER", "30"))
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_clients = {}
+_ssl_context = None   # one for all pools; building one per client costs ~75 ms
+scheduler = Scheduler({host: cfg for host, cfg in UPSTREAMS.items() if "rate" in cfg})
+breakers = Breakers()
+for _host in UPSTREAMS:
+    breakers.get(_host)
+
+def _client_for(host):
+    # pools for UPSTREAMS are opened at startup; any other host gets one on first use
+    global _ssl_context
+    client = _clients.get(host)
+    if client is None:
+        if _ssl_context is None:
+            _ssl_context = httpx.create_ssl_context()
+        size = UPSTREAMS.get(host, {}).get("pool_maxsize", HTTP_POOL_MAXSIZE)
+        limits = httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=HTTP_KEEPALIVE)
+        client = httpx.AsyncClient(limits=limits, follow_redirects=True, verify=_ssl_context)
+        _clients[host] = client
+    return client
+
+def _retry_delay(resp, attempt):
+    # full-jitter exponential backoff, unless the server told us how long to wait
+    retry_after = resp.headers.get("Retry-After") if resp is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), HTTP_MAX_RETRY_AFTER)
+    return random.uniform(0, HTTP_BACKOFF * (2 ** attempt))
+
+def _api_key(params, headers):
+    if isinstance(params, dict) and params.get("api-key"):
+        return params["api-key"]
+    return (headers or {}).get("X-API-Key")
+
+async def _send(client, host, key, priority, url, params, headers, timeout, stream=False):
+    """One attempt, gated by the upstream's circuit breaker and rate limiter."""
+    breaker = breakers.get(host)
+    breaker.before_call()
+    healthy, error = None, None
+    try:
+        await scheduler.acquire(host, key, priority)
+        t0 = time.perf_counter()
+        try:
+            if stream:
+                request = client.build_request("GET", url, params=params, headers=headers, timeout=timeout)
+                resp = await client.send(request, stream=True)
+            else:
+                resp = await client.get(url, params=params, headers=headers, timeout=timeout)
+        except httpx.TransportError as e:
+            metrics.observe_upstream(host, type(e).__name__, time.perf_counter() - t0)
+            healthy, error = False, f"{type(e).__name__}: {e}"
+            raise
+        metrics.observe_upstream(host, resp.status_code, time.perf_counter() - t0)
+        healthy = resp.status_code < 500
+        if not healthy:
+            error = f"HTTP {resp.status_code}"
+        return resp
+    finally:
+        breaker.after_call(healthy, error)
+
+async def http_get(url, params=None, timeout=None, headers=None, priority=INTERACTIVE, stream=False):
+    """
+    GET through the upstream's pooled client, with retries on 429/5xx and transport errors.
+    Every attempt takes a token from the upstream's rate limiter first; raises
+    RateLimited when the budget would be exceeded and CircuitOpen while the
+    upstream's breaker is open. With ``stream`` the body is not read: the
+    caller iterates it and must ``aclose()`` the response.
+    """
+    host = urlsplit(url).hostname
+    key = _api_key(params, headers)
+    if prefetching():
+        priority = BACKGROUND   # cache warm-up never competes with users
+    if timeout is None:
+        timeout = UPSTREAMS.get(host, {}).get("timeout", DEFAULT_TIMEOUT)
+    connect, read = timeout
+    timeout = httpx.Timeout(read, connect=connect, pool=HTTP_POOL_TIMEOUT)
+    client = _client_for(host)
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        try:
+            resp = await _send(client, host, key, priority, url, params, headers, timeout, stream)
+        except httpx.TransportError:
+            if attempt == HTTP_MAX_RETRIES:
+                raise
+            await asyncio.sleep(_retry_delay(None, attempt))
+            continue
+        if resp.status_code not in _RETRY_STATUSES:
+            return resp
+        delay = _retry_delay(resp, attempt)
+        if stream and attempt < HTTP_MAX_RETRIES:
+            await resp.aclose()
+        if resp.status_code == 429:
+            # the provider is throttling us: hold back every caller, not just this one;
+            # the next acquire() waits out the delay or fails fast with RateLimited
+            scheduler.penalize(host, key, delay)
+            delay = 0
+        if attempt == HTTP_MAX_RETRIES:
+            return resp
+        await asyncio.sleep(delay)
+
+def _parse_latlon(lat, lon):
+    """(lat, lon) as floats, or None if either is not a valid coordinate."""
+    try:
+        flat, flon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= flat <= 90 and -180 <= flon <= 180):
+        return None
+    return flat, flon
+
+async def _get_json(url, params, **kwargs):
+    resp = await http_get(url, params=params, **kwargs)
+    resp.raise_for_status()
+    return resp.json()
+
+# ---------- pagination and streamed pass-through ----------
+
+STREAM_PAGE_SIZE = int(os.getenv("STREAM_PAGE_SIZE", "1000"))    # rows per upstream call when streaming
+STREAM_BATCH = 500                                                # rows normalised and sent per chunk
+
+def _encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    """Row offset from an opaque cursor: 0 for none, None if it is not one of ours."""
+    if not cursor:
+        return 0
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["o"]
+    except (ValueError, TypeError, KeyError):
+        return None
+    return offset if isinstance(offset, int) and offset >= 0 else None
+
+def _wants_stream(request, stream):
+    # request is None when another handler calls this one directly
+    return (stream or "").lower() in ("1", "true", "yes", "ndjson") or \
+        (request is not None and "application/x-ndjson" in request.headers.get("accept", ""))
+
+async def _open_stream(url, params, **kwargs):
+    resp = await http_get(url, params=params, stream=True, **kwargs)
+    if resp.is_error:
+        await resp.aclose()
+        resp.raise_for_status()
+    return resp
+
+async def _stream_items(url, params, key, offset, limit, first=None, **kwargs):
+    """
+    Items of the upstream's ``key`` array for rows offset..offset+limit, one
+    STREAM_PAGE_SIZE page (``offset``/``limit`` params) at a time, parsed as the
+    bytes arrive. ``first`` is the already opened response for the first page.
+    """
+    sent = 0
+    while sent < limit:
+        size = min(STREAM_PAGE_SIZE, limit - sent)
+        resp = first or await _open_stream(url, {**params, "offset": offset + sent, "limit": size}, **kwargs)
+        first = None
+        n = 0
+        try:
+            async for item in iter_json_array(resp.aiter_bytes(), key):
+                yield item
+                n += 1
+        finally:
+            await resp.aclose()
+        sent += n
+        if n < size:
+            return
+
+async def _batched(items, size):
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _upstream_error(message, e):
+    # outbound budget exhausted or upstream known to be down: tell the client when to come back
+    if isinstance(e, (RateLimited, CircuitOpen)):
+        return JSONResponse({"error": message, "details": str(e)}, status_code=503,
+                            headers={"Retry-After": e.retry_after_header})
+    return JSONResponse({"error": message, "details": str(e)}, status_code=502)
+
+cache_requests = metrics.registry.counter("cache_requests_total", "Shared-cache lookups by result", ("result",))
+metrics.registry.callback(
+    "upstream_circuit_open", "1 while the upstream's circuit breaker is open or half-open",
+    lambda: {host: int(b["state"] != "closed") for host, b in breakers.status().items()}, labelnames=("upstream",))
+metrics.registry.callback(
+    "rate_limit_rejected_total", "Outbound calls refused by the rate limiter",
+    lambda: scheduler.stats()["rejected"], type="counter")
+
+# Upstreams answered from a last good payload during the current request
+_stale_served = contextvars.ContextVar("stale_served", default=None)
+
+# key -> the upstream fetch other requests for that key wait on
+_inflight: Dict[str, asyncio.Task] = {}
+
+async def _cached(key, ttl, fetch):
+    """
+    Read-through the shared cache; ``fetch`` is a coroutine function.
+    Concurrent misses for one key share a single ``fetch()``.
+    While the upstream's breaker is open, the last good payload is returned
+    instead (and the response is marked stale by _mark_stale).
+    """
+    with stage("cache.get"):
+        hit = await asyncio.to_thread(cache.get, key)
+    # a prefetch replay refreshes entries that are about to expire
+    if hit is not None and hit[1] - time.time() >= refresh_within.get():
+        cache_requests.inc(result="hit")
+        return hit[0]
+    task = _inflight.get(key)
+    if task is not None:
+        cache_requests.inc(result="coalesced")
+    else:
+        cache_requests.inc(result="refresh" if hit is not None else "miss")
+        task = _inflight[key] = asyncio.ensure_future(_fill(key, ttl, fetch))
+        # every waiter may be cancelled; the error is then nobody's to raise
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        # shield so a cancelled waiter does not cancel the shared fetch
+        return await asyncio.shield(task)
+    except CircuitOpen as e:
+        stale = await asyncio.to_thread(cache.get_stale, key)
+        if stale is None:
+            raise
+        cache_requests.inc(result="stale")
+        served = _stale_served.get()
+        if served is not None:
+            as_of = datetime.utcfromtimestamp(stale[1] - ttl).isoformat() + "Z"
+            served.append({"upstream": e.upstream, "as_of": as_of})
+        return stale[0]
+
+async def _fill(key, ttl, fetch):
+    try:
+        value = await fetch()
+        with stage("cache.set"):
+            await asyncio.to_thread(cache.set, key, value, ttl)
+        return value
+    finally:
+        _inflight.pop(key, None)
+
+@app.middleware("http")
+async def _mark_stale(request, call_next):
+    served = []
+    _stale_served.set(served)
+    response = await call_next(request)
+    if not served or not response.headers.get("content-type", "").startswith("application/json"):
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    payload = json.loads(body)
+    if isinstance(payload, dict):
+        payload["stale"] = {"upstreams": sorted({s["upstream"] for s in served}),
+                            "as_of": min(s["as_of"] for s in served)}
+        body = dumps(payload)
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    headers["Warning"] = '110 - "Response is Stale"'
+    return Response(body, status_code=response.status_code, headers=headers)
+
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Replays popular and configured GETs ahead of expiry; see prefetch.py
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+prefetcher = Prefetcher(app, os.getenv("PREFETCH_CONFIG"), include=(
+    "/marketInfo/", "/v1/weather", "/v1/soil/", "/v1/air/", "/v1/geocode/", "/v1/irrigation/schedule",
+    "/v1/context/"))
+app.add_middleware(PrefetchMiddleware, prefetcher=prefetcher)
+metrics.registry.callback("prefetch_replays_total", "Requests replayed by the cache warm-up",
+                          lambda: prefetcher.counts["replays"], type="counter")
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return await metrics.endpoint()
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness probe: 200 once startup has finished, 503 before that and while shutting down."""
+    return JSONResponse(lifecycle.report(), status_code=200 if lifecycle.ready else 503)
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+# Each batch request keeps at most BATCH_CONCURRENCY upstream calls in flight
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_POINTS = int(os.getenv("BATCH_MAX_POINTS", "10000"))
+
+async def _bounded_map(fn, items, limit=BATCH_CONCURRENCY):
+    """Yield (item, result, error) in completion order with at most ``limit`` calls in flight."""
+    items = iter(items)
+    pending = {}
+    for item in itertools.islice(items, limit):
+        pending[asyncio.ensure_future(fn(item))] = item
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                try:
+                    yield item, task.result(), None
+                except Exception as e:
+                    yield item, None, e
+                for nxt in itertools.islice(items, 1):
+                    pending[asyncio.ensure_future(fn(nxt))] = nxt
+    finally:
+        # client went away mid-stream
+        for task in pending:
+            task.cancel()
+
+def _parse_points(body, lat_key="lat", lon_key="lon"):
+    """Validate a batch body's 'points' list; returns (points, error)."""
+    points = body.get("points")
+    if not isinstance(points, list) or not points:
+        return None, "Body must be JSON with a non-empty 'points' list"
+    if len(points) > BATCH_MAX_POINTS:
+        return None, f"At most {BATCH_MAX_POINTS} points per request"
+    out = []
+    for i, p in enumerate(points):
+        pt = _parse_latlon(p.get(lat_key), p.get(lon_key)) if isinstance(p, dict) else None
+        if pt is None:
+            return None, f"Point {i} needs valid '{lat_key}' and '{lon_key}'"
+        out.append({"index": i, "id": p.get("id"), "lat": pt[0], "lon": pt[1]})
+    return out, None
+
+def _ndjson(lines, batched=False):
+    # batched: ``lines`` yields lists of lines, each sent as one chunk
+    async def encode():
+        async for line in lines:
+            if batched:
+                yield b"".join(dumps(item) + b"\n" for item in line)
+            else:
+                yield dumps(line) + b"\n"
+    return StreamingResponse(encode(), media_type="application/x-ndjson")
 
+async def _startup():
+    for host in UPSTREAMS:
+        _client_for(host)
+    if PRICE_SYNC_STATES:
+        loop = asyncio.get_running_loop()
+        threading.Thread(target=_price_sync_loop, args=(loop,), name="price-sync", daemon=True).start()
+    if PREFETCH_ENABLED:
+        prefetcher.start()
+
+async def _shutdown():
+    global _ssl_context
+    await prefetcher.stop()
+    if soil_raster is not None:
+        soil_raster.close()
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
+    _ssl_context = None
+
+@app.get("/v1/upstreams/status")
+async def upstreams_status():
+    """Circuit-breaker state and rate-limit budget per upstream."""
+    return {"breakers": breakers.status(), "rate_limits": scheduler.stats(),
+            "soilgrids_rasters": soil_raster.stats() if soil_raster is not None else None}
+
+@app.get("/v1/prefetch/status")
+async def prefetch_status():
+    """Cache warm-up: learned and configured targets, schedules and replay counts."""
+    return prefetcher.stats()
+
+PRICES_MAX_PAGE = int(os.getenv("PRICES_MAX_PAGE", "1000"))   # rows per JSON page; stream for more
+
+@app.get("/marketInfo/prices")
+async def prices(
+    request: Request,
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    market: Optional[str] = None,
+    commodity: Optional[str] = None,
+    variety: Optional[str] = None,
+    limit: Optional[str] = None,
+    cursor: Optional[str] = None,
+    stream: Optional[str] = None,
+):
+    """
+    Agmarknet mandi prices, ₹/kg.
+    Params:
+      - state, district (required); market, commodity, variety (optional)
+      - limit (optional, default 100): rows per page, at most PRICES_MAX_PAGE;
+        with stream, the total number of rows
+      - cursor (optional): ``next_cursor`` of the previous page
+      - stream=1 or Accept: application/x-ndjson: NDJSON, one record per line,
+        in constant memory however many rows
+    """
+    # Required filters
     if not state or not district:
-        return jsonify({"error": "Missing required filters 'state' and 'district'"}), 400
+        return JSONResponse({"error": "Missing required filters 'state' and 'district'"}, status_code=400)
 
     # Optional filters
-    market = request.args.get("market")
-    commodity = request.args.get("commodity")
-    variety = request.args.get("variety")
-    limit = request.args.get("limit", 100)
+    try:
+        limit = int(limit or 100)
+    except ValueError:
+        limit = 100
+    offset = _decode_cursor(cursor)
+    if offset is None:
+        return JSONResponse({"error": "Invalid cursor"}, status_code=400)
+    streaming = _wants_stream(request, stream)
+    if not streaming:
+        limit = max(1, min(limit, PRICES_MAX_PAGE))
+
+    if await asyncio.to_thread(price_store.covers, state, district):
+        if streaming:
+            return _ndjson(_stream_store_prices(state, district, market, commodity, variety, offset, limit), batched=True)
+        with stage("prices.store"):
+            # one extra row tells whether there is a next page
+            rows = await asyncio.to_thread(price_store.query, state, district, market, commodity, variety,
+                                           limit=limit + 1, offset=offset)
+        with stage("prices.transform"):
+            out = await asyncio.to_thread(_price_results, [dict(r) for r in rows[:limit]])
+        out["next_cursor"] = _encode_cursor(offset + limit) if len(rows) > limit else None
+        return out
 
     params = {
         "api-key": OGD_API_KEY,
@@ -46,74 +544,264 @@ def prices():
     if variety:
         params["filters[variety]"] = variety
 
+    if streaming:
+        # nothing is cached or buffered: pages are parsed and forwarded as they arrive
+        try:
+            first = await _open_stream(OGD_API_URL, {**params, "offset": offset, "limit": min(STREAM_PAGE_SIZE, limit)})
+        except Exception as e:
+            return _upstream_error("Failed to fetch data from OGD API", e)
+        records = _stream_items(OGD_API_URL, params, "records", offset, limit, first=first)
+        return _ndjson(_stream_ogd_prices(records), batched=True)
+
+    if offset:
+        params["offset"] = offset
+
+    async def fetch():
+        data = await _get_json(OGD_API_URL, params)
+        # keep whatever we saw; the scope is only marked covered by a full sync
+        await asyncio.to_thread(price_store.upsert, data.get("records", []))
+        return data
+
+    key = make_key("ogd_prices", {k: v for k, v in params.items() if k != "api-key"})
     try:
-        res = requests.get(OGD_API_URL, params=params, timeout=20)
-        res.raise_for_status()
+        data = await _cached(key, PRICES_TTL, fetch)
     except Exception as e:
-        return jsonify({"error": "Failed to fetch data from OGD API", "details": str(e)}), 502
-    
-    def convert_quintal_to_kg(price_str):
-        try:
-            val = float(price_str)
-            return round(val / 100.0, 2)  # ₹/quintal to ₹/kg
-        except:
-            return None
+        return _upstream_error("Failed to fetch data from OGD API", e)
 
-    data = res.json()
-    results = []
+    with stage("prices.transform"):
+        out = await asyncio.to_thread(_price_results, data.get("records", []))
+    got = len(data.get("records", []))
+    try:
+        more = offset + got < int(data["total"])
+    except (KeyError, TypeError, ValueError):
+        more = got >= limit
+    out["next_cursor"] = _encode_cursor(offset + got) if more and got else None
+    return out
+
+async def _stream_store_prices(state, district, market, commodity, variety, offset, limit):
+    sent = 0
+    while sent < limit:
+        size = min(STREAM_PAGE_SIZE, limit - sent)
+        rows = await asyncio.to_thread(price_store.query, state, district, market, commodity, variety,
+                                       limit=size, offset=offset + sent)
+        if rows:
+            yield (await asyncio.to_thread(_price_results, [dict(r) for r in rows]))["results"]
+        sent += len(rows)
+        if len(rows) < size:
+            return
+
+async def _stream_ogd_prices(records):
+    try:
+        async for batch in _batched(records, STREAM_BATCH):
+            # keep whatever we saw; the scope is only marked covered by a full sync
+            await asyncio.to_thread(price_store.upsert, batch)
+            yield (await asyncio.to_thread(_price_results, batch))["results"]
+    except Exception as e:
+        # the status line is long gone: report the failure in-band
+        yield [{"error": "Failed to fetch data from OGD API", "details": str(e)}]
+
+_PRICE_FIELDS = ["state", "district", "market", "commodity", "variety", "grade", "arrival_date"]
+_PRICE_COLUMNS = {
+    "min_price": "price_min_inr_per_kg",
+    "modal_price": "price_modal_inr_per_kg",
+    "max_price": "price_max_inr_per_kg",
+}
+
+def _quintal_to_kg(values):
+    # ₹/quintal to ₹/kg for a whole column; unparseable prices become NaN. Not
+    # rounded: aggregates are computed at full precision and rounded on output.
+    import pandas as pd
+    return pd.to_numeric(values, errors="coerce") / 100.0
 
+def _price_results(records):
     fetched_at = datetime.utcnow().isoformat() + "Z"
-    for record in data.get("records", []):
-        results.append({
-            "state": record.get("state"),
-            "district": record.get("district"),
-            "market": record.get("market"),
-            "commodity": record.get("commodity"),
-            "variety": record.get("variety"),
-            "grade": record.get("grade"),
-            "arrival_date": record.get("arrival_date"),
-            "price_min_inr_per_kg": convert_quintal_to_kg(record.get("min_price")),
-            "price_modal_inr_per_kg": convert_quintal_to_kg(record.get("modal_price")),
-            "price_max_inr_per_kg": convert_quintal_to_kg(record.get("max_price")),
-            "source": {
-                "dataset": "OGD Agmarknet Daily Mandi Prices",
-                "resource_id": "9ef84268-d588-465a-a308-a864a43d0070",
-                "fetched_at": fetched_at
-            }
-        })
+    if not records:
+        return {"count": 0, "results": []}
 
-    return jsonify({
+    import pandas as pd   # imported on first use: keeps it out of cold start
+    df = pd.DataFrame.from_records(records)
+    out = df.reindex(columns=_PRICE_FIELDS)
+    for src, dst in _PRICE_COLUMNS.items():
+        out[dst] = _quintal_to_kg(df[src]).round(2) if src in df else np.nan
+    out = out.astype(object).where(out.notna(), None)
+    fetched = df["synced_at"].fillna(fetched_at) if "synced_at" in df else [fetched_at] * len(df)
+
+    results = out.to_dict("records")
+    for row, ts in zip(results, fetched):
+        row["source"] = {
+            "dataset": "OGD Agmarknet Daily Mandi Prices",
+            "resource_id": "9ef84268-d588-465a-a308-a864a43d0070",
+            "fetched_at": ts
+        }
+
+    return {
         "count": len(results),
         "results": results
-    })
+    }
+
+PRICE_STATS_MAX_ROWS = 200000
+
+@app.get("/marketInfo/prices/stats")
+async def price_stats(
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    market: Optional[str] = None,
+    commodity: Optional[str] = None,
+    variety: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    window: Optional[str] = None,
+):
+    """
+    Per commodity/market price statistics over a date range, computed server-side.
+    Params:
+      - state, district (required)
+      - commodity, market, variety (optional)
+      - date_from, date_to (optional, YYYY-MM-DD)
+      - window (optional, default 7): rolling-mean window in market days
+    """
+    if not state or not district:
+        return JSONResponse({"error": "Missing required filters 'state' and 'district'"}, status_code=400)
+
+    try:
+        window = max(1, int(window or 7))
+    except ValueError:
+        window = 7
+    try:
+        # normalised, so the store's ISO string comparison and pandas see the same dates
+        date_from, date_to = (datetime.strptime(d, "%Y-%m-%d").strftime("%Y-%m-%d") if d else None
+                              for d in (date_from, date_to))
+    except ValueError:
+        return JSONResponse({"error": "Invalid date_from/date_to; use YYYY-MM-DD"}, status_code=400)
+
+    if await asyncio.to_thread(price_store.covers, state, district):
+        with stage("prices.store"):
+            rows = await asyncio.to_thread(price_store.query, state, district, market, commodity, variety,
+                                           limit=PRICE_STATS_MAX_ROWS, date_from=date_from, date_to=date_to)
+        records = [dict(r) for r in rows]
+    else:
+        params = {"api-key": OGD_API_KEY, "format": "json", "limit": 10000,
+                  "filters[state]": state, "filters[district]": district}
+        for k, v in (("market", market), ("commodity", commodity), ("variety", variety)):
+            if v:
+                params[f"filters[{k}]"] = v
+        try:
+            data = await _cached(make_key("ogd_prices", {k: v for k, v in params.items() if k != "api-key"}),
+                                 PRICES_TTL, lambda: _get_json(OGD_API_URL, params))
+        except Exception as e:
+            return _upstream_error("Failed to fetch data from OGD API", e)
+        records = data.get("records", [])
+
+    query = {"state": state, "district": district, "market": market, "commodity": commodity,
+             "variety": variety, "date_from": date_from, "date_to": date_to, "window": window}
+    with stage("prices.stats"):
+        stats = await asyncio.to_thread(_price_stats, records, window, date_from, date_to)
+    return {"query": query, "count": len(stats), "results": stats}
+
+def _price_stats(records, window, date_from=None, date_to=None):
+    if not records:
+        return []
+    import pandas as pd
+    df = pd.DataFrame.from_records(records)
+    df["date"] = pd.to_datetime(df["arrival_date"], format="%d/%m/%Y", errors="coerce")
+    if date_from:
+        df = df[df["date"] >= pd.Timestamp(date_from)]
+    if date_to:
+        df = df[df["date"] <= pd.Timestamp(date_to)]
+    df = df.dropna(subset=["date"])
+    if df.empty:
+        return []
+    for src in _PRICE_COLUMNS:
+        df[src] = _quintal_to_kg(df[src]) if src in df else np.nan
+
+    keys = ["commodity", "market"]
+    summary = df.groupby(keys).agg(
+        price_min_inr_per_kg=("min_price", "min"),
+        price_modal_mean_inr_per_kg=("modal_price", "mean"),
+        price_max_inr_per_kg=("max_price", "max"),
+        rows=("modal_price", "size"),
+        first_date=("date", "min"),
+        last_date=("date", "max"),
+    )
+
+    # one modal price per market day (averaged over varieties/grades)
+    daily = df.groupby(keys + ["date"], as_index=False)["modal_price"].mean().sort_values(keys + ["date"])
+    by_group = daily.groupby(keys, sort=False)["modal_price"]
+    daily["rolling_mean"] = by_group.rolling(window, min_periods=1).mean().reset_index(level=[0, 1], drop=True)
+    daily["dod_change"] = by_group.diff()
+    daily["dod_change_pct"] = (by_group.pct_change() * 100).replace([np.inf, -np.inf], np.nan)
+    daily["date"] = daily["date"].dt.strftime("%Y-%m-%d")
+    daily[["modal_price", "rolling_mean", "dod_change", "dod_change_pct"]] = \
+        daily[["modal_price", "rolling_mean", "dod_change", "dod_change_pct"]].round(2)
+    daily = daily.astype(object).where(daily.notna(), None)
+
+    price_cols = ["price_min_inr_per_kg", "price_modal_mean_inr_per_kg", "price_max_inr_per_kg"]
+    summary[price_cols] = summary[price_cols].round(2)
+    summary["first_date"] = summary["first_date"].dt.strftime("%Y-%m-%d")
+    summary["last_date"] = summary["last_date"].dt.strftime("%Y-%m-%d")
+    summary = summary.astype(object).where(summary.notna(), None)
+
+    out = []
+    for (comm, mkt), series in daily.groupby(keys, sort=False):
+        row = summary.loc[(comm, mkt)].to_dict()
+        row.update({"commodity": comm, "market": mkt, "rows": int(row["rows"])})
+        # columnar series keeps the payload small for charting
+        row["series"] = series.drop(columns=keys).to_dict("list")
+        out.append(row)
+    return out
+
+async def _fetch_ogd_page(offset, limit, state=None):
+    params = {"api-key": OGD_API_KEY, "format": "json", "offset": offset, "limit": limit}
+    if state:
+        params["filters[state]"] = state
+    return await _get_json(OGD_API_URL, params, priority=BACKGROUND)
+
+def _price_sync_loop(loop):
+    # runs in its own thread; upstream calls go back through the app's event loop
+    def fetch_page(offset, limit, state=None):
+        return asyncio.run_coroutine_threadsafe(_fetch_ogd_page(offset, limit, state), loop).result()
+
+    while True:
+        for state in PRICE_SYNC_STATES:
+            try:
+                price_store.sync(fetch_page, state=state)
+            except Exception as e:
+                logger.warning("price sync for %s failed: %s", state, e)
+        time.sleep(PRICE_SYNC_INTERVAL)
 
 #///////////////////////////////WEATHER//////////////////////////////////////
 
-@app.route("/v1/weather", methods=["GET"])
-def weather():
-    lat = request.args.get("lat")
-    lon = request.args.get("lon")
-    # Optional date range or default to today + 7 days forecast
-    start_date = request.args.get("start_date", datetime.utcnow().date().isoformat())
-    end_date = request.args.get("end_date", (datetime.utcnow() + timedelta(days=7)).date().isoformat())
+# Upstreams are fetched concurrently; each uses its UPSTREAMS timeout and the
+# whole fan-out is bounded by WEATHER_DEADLINE seconds.
+WEATHER_DEADLINE = 25
 
-    def get_open_meteo_forecast(lat, lon, start_date, end_date):
-        base_url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "start_date": start_date,
-            "end_date": end_date,
-            "hourly": "temperature_2m,precipitation,windspeed_10m,shortwave_radiation",
-            "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,et0_fao_evapotranspiration,uv_index_max,uv_index_clear_sky_max",
-            "timezone": "Asia/Kolkata"
-        }
-        resp = requests.get(base_url, params=params)
-        resp.raise_for_status()
-        return resp.json()
+async def get_open_meteo_forecast(lat, lon, start_date, end_date, priority=INTERACTIVE):
+    # also read by the irrigation engine, so both share one cache entry per cell and window
+    base_url = "https://api.open-meteo.com/v1/forecast"
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": start_date,
+        "end_date": end_date,
+        "hourly": "temperature_2m,precipitation,windspeed_10m,shortwave_radiation",
+        "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum,et0_fao_evapotranspiration,uv_index_max,uv_index_clear_sky_max",
+        "timezone": "Asia/Kolkata"
+    }
+    return await _cached(make_key("open_meteo_forecast", params), WEATHER_TTL,
+                         lambda: _get_json(base_url, params, priority=priority))
 
+@app.get("/v1/weather")
+async def weather(
+    lat: Optional[str] = None,
+    lon: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+):
+    # Optional date range or default to today + 7 days forecast
+    start_date = start_date or datetime.utcnow().date().isoformat()
+    end_date = end_date or (datetime.utcnow() + timedelta(days=7)).date().isoformat()
 
-    def get_nasa_power(lat, lon, start_date, end_date):
+    async def get_nasa_power(lat, lon, start_date, end_date):
         base_url = "https://power.larc.nasa.gov/api/temporal/daily/point"
         params = {
             "parameters": "ALLSKY_SFC_SW_DWN,T2M,PRECTOT,WS10M",
@@ -124,11 +812,10 @@ def weather():
             "end": end_date.replace("-", ""),
             "format": "JSON"
         }
-        resp = requests.get(base_url, params=params)
-        resp.raise_for_status()
-        return resp.json()
+        return await _cached(make_key("nasa_power_daily", params), WEATHER_TTL,
+                             lambda: _get_json(base_url, params))
 
-    def get_nasa_power_climatology(lat, lon):
+    async def get_nasa_power_climatology(lat, lon):
         base_url = "https://power.larc.nasa.gov/api/temporal/climatology/point"
         params = {
             "parameters": "T2M,PRECTOT,ALLSKY_SFC_SW_DWN",
@@ -137,45 +824,111 @@ def weather():
             "latitude": lat,
             "format": "JSON"
         }
-        resp = requests.get(base_url, params=params)
-        resp.raise_for_status()
-        return resp.json()
+        return await _cached(make_key("nasa_power_climatology", params), CLIMATOLOGY_TTL,
+                             lambda: _get_json(base_url, params))
 
 
     if not lat or not lon:
-        return jsonify({"error": "Missing required parameters 'lat' and 'lon'"}), 400
+        return JSONResponse({"error": "Missing required parameters 'lat' and 'lon'"}, status_code=400)
+    point = _parse_latlon(lat, lon)
+    if point is None:
+        return JSONResponse({"error": "Invalid lat/lon"}, status_code=400)
 
-    try:
-        open_meteo = get_open_meteo_forecast(lat, lon, start_date, end_date)
-        nasa_power = get_nasa_power(lat, lon, start_date, end_date)
-        nasa_power_clim = get_nasa_power_climatology(lat, lon)
-        # IMD warnings and hydrology data would be additional calls here
-    except Exception as e:
-        return jsonify({"error": f"Failed to fetch external data", "details": str(e)}), 502
+    # query each source at its grid node so nearby farms share cache entries
+    om_lat, om_lon = snap("open_meteo", *point)
+    np_lat, np_lon = snap("nasa_power", *point)
 
-    return jsonify({
-        "open_meteo": open_meteo,
-        "nasa_power": nasa_power,
-        "nasa_power_climatology": nasa_power_clim,
-        # Add IMD, WRIS etc when implemented
-    })
+    async def timed(coro):
+        t0 = time.monotonic()
+        value = await coro
+        return value, round((time.monotonic() - t0) * 1000)
+
+    # IMD warnings and hydrology data would be additional sources here
+    tasks = {
+        "open_meteo": asyncio.ensure_future(timed(get_open_meteo_forecast(om_lat, om_lon, start_date, end_date))),
+        "nasa_power": asyncio.ensure_future(timed(get_nasa_power(np_lat, np_lon, start_date, end_date))),
+        "nasa_power_climatology": asyncio.ensure_future(timed(get_nasa_power_climatology(np_lat, np_lon))),
+    }
+    await asyncio.wait(tasks.values(), timeout=WEATHER_DEADLINE)
+
+    out = {}
+    sources = {}
+    for name, task in tasks.items():
+        out[name] = None
+        if not task.done():
+            task.cancel()
+            sources[name] = {"status": "timeout"}
+            continue
+        try:
+            out[name], elapsed_ms = task.result()
+            sources[name] = {"status": "ok", "elapsed_ms": elapsed_ms}
+        except (RateLimited, CircuitOpen) as e:
+            status = "rate_limited" if isinstance(e, RateLimited) else "circuit_open"
+            sources[name] = {"status": status, "details": str(e), "retry_after": e.retry_after_header}
+        except Exception as e:
+            sources[name] = {"status": "error", "details": str(e)}
+
+    if all(src["status"] != "ok" for src in sources.values()):
+        limited = [int(src["retry_after"]) for src in sources.values() if "retry_after" in src]
+        if limited:
+            return JSONResponse({"error": "Failed to fetch external data", "sources": sources}, status_code=503,
+                                headers={"Retry-After": str(min(limited))})
+        return JSONResponse({"error": "Failed to fetch external data", "sources": sources}, status_code=502)
+
+    out["sources"] = sources
+    out["grid"] = {"open_meteo": grid_describe("open_meteo", *point), "nasa_power": grid_describe("nasa_power", *point)}
+    # Add IMD, WRIS etc when implemented
+    return out
 
 #############################PESTICIDES###############################
-@app.route("/v1/pesticides", methods=["GET"])
-def pesticide_check():
-    banned_df = pd.read_csv("list_of_banned_pesticides.csv")
-    banned_set = set(banned_df['Pesticide_Name'].str.lower().str.strip())
-    name = request.args.get("name", "").strip().lower()
+# Loaded once; reloads itself when the CSV changes on disk
+banned_pesticides = PesticideMatcher()
+PESTICIDE_BATCH_MAX = 1000
+
+@app.get("/v1/pesticides")
+async def pesticide_check(name: Optional[str] = None):
+    name = (name or "").strip().lower()
 
     if not name:
-        return jsonify({"error": "Please provide pesticide name via 'name' query parameter"}), 400
+        return JSONResponse({"error": "Please provide pesticide name via 'name' query parameter"}, status_code=400)
 
-    status = "banned" if name in banned_set else "safe"
+    res = banned_pesticides.check(name)
 
-    return jsonify({
+    return {
         "pesticide": name,
-        "status": status
-    })
+        "status": res["status"],
+        "match": res["match"]
+    }
+
+@app.post("/v1/pesticides/batch")
+async def pesticide_check_batch(request: Request):
+    """
+    Check many product names in one call.
+    Body: {"names": ["Endosulfan 35% EC", "Imidacloprid 17.8 SL", ...]}
+    """
+    body = await _json_body(request)
+    names = body.get("names")
+    if not isinstance(names, list) or not names:
+        return JSONResponse({"error": "Body must be JSON with a non-empty 'names' list"}, status_code=400)
+    if len(names) > PESTICIDE_BATCH_MAX:
+        return JSONResponse({"error": f"At most {PESTICIDE_BATCH_MAX} names per request"}, status_code=400)
+
+    def check_all():
+        results = []
+        for raw in names:
+            name = str(raw or "").strip().lower()
+            res = banned_pesticides.check(name)
+            results.append({"pesticide": name, "status": res["status"], "match": res["match"]})
+        return results
+
+    # fuzzy matching hundreds of names is CPU work; keep it off the event loop
+    results = await asyncio.to_thread(check_all)
+
+    return {
+        "count": len(results),
+        "banned_count": sum(1 for r in results if r["status"] == "banned"),
+        "results": results
+    }
 
 
 _SOILGRIDS_SCALE = {
@@ -228,47 +981,137 @@ def _values_to_dict(vals):
         return bag
     return {}
 
-@app.route("/v1/soil/soilgrids", methods=["GET"])
-def soil_soilgrids():
-    lat = request.args.get("lat")
-    lon = request.args.get("lon")
+@app.get("/v1/soil/soilgrids")
+async def soil_soilgrids(
+    lat: Optional[str] = None,
+    lon: Optional[str] = None,
+    properties: Optional[str] = None,
+    depths: Optional[str] = None,
+):
     if not lat or not lon:
-        return jsonify({"error": "Missing lat/lon"}), 400
+        return JSONResponse({"error": "Missing lat/lon"}, status_code=400)
+    point = _parse_latlon(lat, lon)
+    if point is None:
+        return JSONResponse({"error": "Invalid lat/lon"}, status_code=400)
+    # SoilGrids is a 250 m raster; every point in a cell gets the same answer
+    cell_lat, cell_lon = snap("soilgrids", *point)
+
+    props = _soil_props(properties)
+    depths = _soil_depths(depths)
+
+    js = (await _soilgrids_rasters([(cell_lat, cell_lon)], props, depths)).get((cell_lat, cell_lon))
+    endpoint = "local rasters" if js is not None else _SOILGRIDS_BASE
+    if js is None:
+        try:
+            js = await _fetch_soilgrids(cell_lat, cell_lon, props, depths)
+        except Exception as e:
+            return _upstream_error("Failed to fetch SoilGrids", e)
+
+    layers = _soilgrids_layers(js)
+    if layers is None:
+        return JSONResponse({"error": "Unexpected SoilGrids schema", "raw_keys": list(js.keys()) if isinstance(js, dict) else "n/a"}, status_code=502)
 
-    props_q = request.args.get("properties", ",".join(_SOILGRIDS_PROPS.keys())).lower()
+    results = _soilgrids_results(layers)
+
+    return {
+        "query": {"lat": lat, "lon": lon, "properties": props, "depths": depths, "stat_preference": ["mean", "Q0.5", "mid(Q0.05,Q0.95)"]},
+        "grid": grid_describe("soilgrids", *point),
+        "count": len(results),
+        "results": results,
+        "source": {"service": "ISRIC SoilGrids v2", "endpoint": endpoint}
+    }
+
+@app.post("/v1/soil/soilgrids/batch")
+async def soil_soilgrids_batch(request: Request):
+    """
+    SoilGrids for many points, streamed as NDJSON (one line per point).
+    Body:
+      - points (required): [{"lat": .., "lon": .., "id": optional}, ...]
+      - properties, depths (optional): list or comma-separated, as for the GET endpoint
+    Points in the same 250 m cell share one upstream call; with local rasters
+    all covered cells are sampled together.
+    """
+    body = await _json_body(request)
+    points, err = _parse_points(body)
+    if err:
+        return JSONResponse({"error": err}, status_code=400)
+
+    def as_csv(v):
+        return ",".join(v) if isinstance(v, list) else v
+
+    props = _soil_props(as_csv(body.get("properties")))
+    depths = _soil_depths(as_csv(body.get("depths")))
+
+    cells = {}
+    for p in points:
+        cells.setdefault(snap("soilgrids", p["lat"], p["lon"]), []).append(p)
+
+    local = await _soilgrids_rasters(list(cells), props, depths)
+
+    async def fetch_cell(cell):
+        js = local.get(cell) or await _fetch_soilgrids(cell[0], cell[1], props, depths, priority=BATCH)
+        layers = _soilgrids_layers(js)
+        if layers is None:
+            raise ValueError("Unexpected SoilGrids schema")
+        return _soilgrids_results(layers)
+
+    async def lines():
+        async for cell, results, err in _bounded_map(fetch_cell, list(cells)):
+            for p in cells[cell]:
+                line = {"index": p["index"], "id": p["id"], "lat": p["lat"], "lon": p["lon"],
+                        "grid": grid_describe("soilgrids", p["lat"], p["lon"])}
+                if err is not None:
+                    line["error"] = f"Failed to fetch SoilGrids: {err}"
+                    if isinstance(err, (RateLimited, CircuitOpen)):
+                        line["retry_after"] = err.retry_after_header
+                else:
+                    line["count"] = len(results)
+                    line["results"] = results
+                yield line
+
+    return _ndjson(lines())
+
+_SOILGRIDS_BASE = "https://rest.isric.org/soilgrids/v2.0/properties/query"
+
+def _soil_props(props_q):
+    props_q = (props_q or ",".join(_SOILGRIDS_PROPS.keys())).lower()
     req_props = [p.strip() for p in props_q.split(",") if p.strip()]
     props = [p for p in req_props if p in _SOILGRIDS_PROPS]
-    if not props:
-        props = list(_SOILGRIDS_PROPS.keys())
+    return props or list(_SOILGRIDS_PROPS.keys())
 
-    depths_q = request.args.get("depths")
+def _soil_depths(depths_q):
     if depths_q:
         depths = _norm_depths([d for d in depths_q.split(",") if d.strip()])
-        if not depths:
-            depths = [f"{d}cm" for d in _STD_DEPTHS]
-    else:
-        depths = [f"{d}cm" for d in _STD_DEPTHS]
+        if depths:
+            return depths
+    return [f"{d}cm" for d in _STD_DEPTHS]
 
-    base = "https://rest.isric.org/soilgrids/v2.0/properties/query"
-    params = [("lon", lon), ("lat", lat)]
+async def _fetch_soilgrids(cell_lat, cell_lon, props, depths, priority=INTERACTIVE):
+    params = [("lon", cell_lon), ("lat", cell_lat)]
     for p in props:
         params.append(("property", p))
     for d in depths:
         params.append(("depth", d))
     # ask server for all stats; we’ll pick best available below
-    try:
-        r = requests.get(base, params=params, timeout=25, headers={"User-Agent": "kerala-farm-assist/1.0", "Accept": "application/json"})
-        r.raise_for_status()
-        js = r.json()
-    except Exception as e:
-        return jsonify({"error": "Failed to fetch SoilGrids", "details": str(e)}), 502
+    return await _cached(make_key("soilgrids", params), SOILGRIDS_TTL,
+                         lambda: _get_json(_SOILGRIDS_BASE, params, priority=priority,
+                                           headers={"User-Agent": "kerala-farm-assist/1.0", "Accept": "application/json"}))
 
+async def _soilgrids_rasters(cells, props, depths):
+    """REST-shaped SoilGrids JSON per cell from the local rasters, for the cells they cover."""
+    if soil_raster is None or not cells:
+        return {}
+    with stage("soilgrids.raster"):
+        found = await asyncio.to_thread(soil_raster.sample, cells, props, depths)
+    return {cell: js for cell, js in zip(cells, found) if js is not None}
+
+def _soilgrids_layers(js):
     layers = None
     if isinstance(js, dict):
         layers = js.get("properties", {}).get("layers") or js.get("layers")
-    if not isinstance(layers, list):
-        return jsonify({"error": "Unexpected SoilGrids schema", "raw_keys": list(js.keys()) if isinstance(js, dict) else "n/a"}), 502
+    return layers if isinstance(layers, list) else None
 
+def _soilgrids_results(layers):
     results = []
     for layer in layers:
         name = layer.get("name")
@@ -298,117 +1141,386 @@ def soil_soilgrids():
                 "value_type": "mean_or_median_scaled",
                 "value": val
             })
+    return results
 
-    return jsonify({
-        "query": {"lat": lat, "lon": lon, "properties": props, "depths": depths, "stat_preference": ["mean", "Q0.5", "mid(Q0.05,Q0.95)"]},
+#############################IRRIGATION###############################
+# FAO-56 crop water balance (irrigation.py) over the Open-Meteo ET0/rain
+# forecast that /v1/weather caches and SoilGrids water-holding capacity.
+# One plot's schedule depends only on its weather cell, soil cell, crop,
+# sowing date and starting depletion, so it is memoised on those.
+IRRIGATION_DAYS = 8          # today + 7, the same window /v1/weather caches
+IRRIGATION_MAX_DAYS = 16     # Open-Meteo forecast horizon
+IRRIGATION_SOIL_PROPS = ["wv0033", "wv1500", "sand", "clay", "soc"]
+
+def _parse_plot(p, i, label=None):
+    """Validate one plot dict; returns (plot, error)."""
+    label = label or f"Plot {i}"
+    if not isinstance(p, dict):
+        return None, f"{label} must be an object"
+    pt = _parse_latlon(p.get("lat"), p.get("lon"))
+    if pt is None:
+        return None, f"{label} needs valid 'lat' and 'lon'"
+    crop = irrigation.crop_name(p.get("crop"))
+    if crop is None:
+        return None, f"{label}: unknown crop {p.get('crop')!r}; see /v1/irrigation/crops"
+    try:
+        sowing = datetime.strptime(str(p.get("sowing_date")), "%Y-%m-%d").date()
+    except ValueError:
+        return None, f"{label} needs 'sowing_date' as YYYY-MM-DD"
+    try:
+        depletion = float(p.get("depletion_mm") or 0)
+        area = float(p["area_ha"]) if p.get("area_ha") is not None else None
+    except (TypeError, ValueError):
+        return None, f"{label}: 'depletion_mm' and 'area_ha' must be numbers"
+    return {"index": i, "id": p.get("id"), "lat": pt[0], "lon": pt[1], "crop": crop,
+            "sowing_date": sowing, "depletion_mm": depletion, "area_ha": area}, None
+
+async def _soil_awc(cell, priority=INTERACTIVE, js=None):
+    js = js or await _fetch_soilgrids(cell[0], cell[1], IRRIGATION_SOIL_PROPS, list(irrigation.AWC_DEPTHS), priority=priority)
+    layers = _soilgrids_layers(js)
+    if layers is None:
+        raise ValueError("Unexpected SoilGrids schema")
+    names = {v: k for k, v in _SOILGRIDS_PROPS.items()}
+    profile = {}
+    for r in _soilgrids_results(layers):
+        profile.setdefault(r["depth"], {})[names.get(r["property"], r["property"])] = r["value"]
+    return irrigation.available_water(profile)
+
+def _daily_series(js, key, labels):
+    daily = (js or {}).get("daily") or {}
+    by_day = dict(zip(daily.get("time") or [], daily.get(key) or []))
+    return [by_day.get(d) if by_day.get(d) is not None else np.nan for d in labels]
+
+async def _irrigation_schedules(plots, days, priority=INTERACTIVE):
+    """Result dict per plot (same order); memoised per (cells, crop, sowing date, start, depletion)."""
+    start_date, end_date = days[0].isoformat(), days[-1].isoformat()
+    for p in plots:
+        p["om_cell"] = snap("open_meteo", p["lat"], p["lon"])
+        p["soil_cell"] = snap("soilgrids", p["lat"], p["lon"])
+        p["memo_key"] = make_key("irrigation", {
+            "om": "%s,%s" % p["om_cell"], "soil": "%s,%s" % p["soil_cell"], "crop": p["crop"],
+            "sowing": p["sowing_date"].isoformat(), "start": start_date, "end": end_date,
+            "depletion": round(p["depletion_mm"], 1)})
+
+    with stage("cache.get"):
+        hits = await asyncio.to_thread(lambda: [cache.get(p["memo_key"]) for p in plots])
+    results = [h[0] if h is not None else None for h in hits]
+    todo = [p for p, r in zip(plots, results) if r is None]
+    cache_requests.inc(len(plots) - len(todo), result="hit")
+    cache_requests.inc(len(todo), result="miss")
+
+    if todo:
+        async def collect(fn, cells):
+            out = {}
+            async for cell, value, err in _bounded_map(fn, cells):
+                out[cell] = (value, err)
+            return out
+
+        soil_cells = sorted({p["soil_cell"] for p in todo})
+        local = await _soilgrids_rasters(soil_cells, IRRIGATION_SOIL_PROPS, list(irrigation.AWC_DEPTHS))
+        weather, soil = await asyncio.gather(
+            collect(lambda c: get_open_meteo_forecast(c[0], c[1], start_date, end_date, priority=priority),
+                    {p["om_cell"] for p in todo}),
+            # SoilGrids allows 5 calls a minute: never queue long for it; plots whose soil
+            # is not cached yet use the default capacity and are not memoised
+            collect(lambda c: _soil_awc(c, INTERACTIVE, local.get(c)), soil_cells),
+        )
+        ready = []
+        for p in todo:
+            js, err = weather[p["om_cell"]]
+            if err is not None:
+                p["error"] = err
+            else:
+                ready.append(p)
+        if ready:
+            labels = [d.isoformat() for d in days]
+            with stage("irrigation.compute"):
+                et0 = np.array([_daily_series(weather[p["om_cell"]][0], "et0_fao_evapotranspiration", labels)
+                                for p in ready], dtype=float)
+                rain = np.array([_daily_series(weather[p["om_cell"]][0], "precipitation_sum", labels)
+                                 for p in ready], dtype=float)
+                soil_info = []
+                for p in ready:
+                    value, err = soil[p["soil_cell"]]
+                    awc, method = value if err is None else (irrigation.DEFAULT_AWC, "default")
+                    soil_info.append({"awc": round(awc, 4), "method": method,
+                                      **({"error": str(err)} if err is not None else {})})
+                computed = irrigation.schedules(ready, days, et0, rain, np.array([s["awc"] for s in soil_info]))
+            for p, res, soil_ in zip(ready, computed, soil_info):
+                res["soil"] = soil_
+                p["result"] = res
+            # soil that fell back to the default is not memoised, so it is retried next time
+            fresh = [(p["memo_key"], p["result"]) for p in ready if "error" not in p["result"]["soil"]]
+            with stage("cache.set"):
+                await asyncio.to_thread(lambda: [cache.set(k, v, WEATHER_TTL) for k, v in fresh])
+        results = [r if r is not None else p.get("result") for p, r in zip(plots, results)]
+
+    out = []
+    for p, res in zip(plots, results):
+        line = {"index": p["index"], "id": p["id"], "lat": p["lat"], "lon": p["lon"], "crop": p["crop"],
+                "sowing_date": p["sowing_date"].isoformat(),
+                "grid": {"open_meteo": grid_describe("open_meteo", p["lat"], p["lon"]),
+                         "soilgrids": grid_describe("soilgrids", p["lat"], p["lon"])}}
+        if res is None:
+            line["error"] = f"Failed to fetch weather: {p['error']}"
+            if isinstance(p["error"], (RateLimited, CircuitOpen)):
+                line["retry_after"] = p["error"].retry_after_header
+        else:
+            line.update(res)
+            if p["area_ha"] is not None:
+                # 1 mm over 1 ha is 10 m3
+                line["total_irrigation_m3"] = round(res["total_irrigation_mm"] * 10 * p["area_ha"], 1)
+        out.append(line)
+    return out
+
+def _irrigation_days(days):
+    try:
+        n = int(days) if days is not None else IRRIGATION_DAYS
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= n <= IRRIGATION_MAX_DAYS:
+        return None
+    today = datetime.utcnow().date()
+    return [today + timedelta(days=i) for i in range(n)]
+
+@app.get("/v1/irrigation/crops")
+async def irrigation_crops():
+    return {
+        "crops": irrigation.CROPS,
+        "aliases": irrigation.CROP_ALIASES,
+        "stages": list(irrigation.STAGE_NAMES),
+        "source": "FAO Irrigation and Drainage Paper 56, Tables 11, 12 and 22",
+    }
+
+@app.get("/v1/irrigation/schedule")
+async def irrigation_schedule(
+    lat: Optional[str] = None,
+    lon: Optional[str] = None,
+    crop: Optional[str] = None,
+    sowing_date: Optional[str] = None,
+    days: Optional[str] = None,
+    depletion_mm: Optional[str] = None,
+    area_ha: Optional[str] = None,
+):
+    """
+    Daily crop water balance and irrigation advice for one plot.
+      - crop: see /v1/irrigation/crops; sowing_date: YYYY-MM-DD
+      - days: forecast days (default 8, max 16)
+      - depletion_mm: root-zone depletion today (default 0, soil at field capacity)
+      - area_ha: optional, adds irrigation volume in m3
+    """
+    plot, err = _parse_plot({"lat": lat, "lon": lon, "crop": crop, "sowing_date": sowing_date,
+                             "depletion_mm": depletion_mm, "area_ha": area_ha}, 0, label="Request")
+    if err:
+        return JSONResponse({"error": err}, status_code=400)
+    window = _irrigation_days(days)
+    if window is None:
+        return JSONResponse({"error": f"'days' must be between 1 and {IRRIGATION_MAX_DAYS}"}, status_code=400)
+    (line,) = await _irrigation_schedules([plot], window)
+    if "error" in line:
+        return _upstream_error("Failed to fetch Open-Meteo forecast", plot["error"])
+    line.pop("index")
+    line.pop("id")
+    return line
+
+@app.post("/v1/irrigation/schedule/batch")
+async def irrigation_schedule_batch(request: Request):
+    """
+    Schedules for many plots in one call.
+    Body:
+      - plots (required): [{"lat", "lon", "crop", "sowing_date", "id"?, "depletion_mm"?, "area_ha"?}, ...]
+      - days (optional): forecast days, default 8, max 16
+    Plots are computed together; upstream calls are made once per weather
+    cell and soil cell, and repeated plots are answered from the memo.
+    """
+    body = await _json_body(request)
+    raw = body.get("plots")
+    if not isinstance(raw, list) or not raw:
+        return JSONResponse({"error": "Body must be JSON with a non-empty 'plots' list"}, status_code=400)
+    if len(raw) > BATCH_MAX_POINTS:
+        return JSONResponse({"error": f"At most {BATCH_MAX_POINTS} plots per request"}, status_code=400)
+    plots = []
+    for i, p in enumerate(raw):
+        plot, err = _parse_plot(p, i)
+        if err:
+            return JSONResponse({"error": err}, status_code=400)
+        plots.append(plot)
+    window = _irrigation_days(body.get("days"))
+    if window is None:
+        return JSONResponse({"error": f"'days' must be between 1 and {IRRIGATION_MAX_DAYS}"}, status_code=400)
+
+    results = await _irrigation_schedules(plots, window, priority=BATCH)
+    # already plain JSON types: render directly instead of through jsonable_encoder
+    return metrics.JSONResponse({
         "count": len(results),
+        "start_date": window[0].isoformat(),
+        "end_date": window[-1].isoformat(),
+        "errors": sum(1 for r in results if "error" in r),
         "results": results,
-        "source": {"service": "ISRIC SoilGrids v2", "endpoint": base}
     })
+
 # ==========================================================
 # AIR QUALITY: OpenAQ v2 — latest measurements near a point
 # ==========================================================
 
-@app.route("/v1/air/nearest", methods=["GET"])
-def air_nearest():
+AIR_MAX_PAGE = int(os.getenv("AIR_MAX_PAGE", "100"))   # locations per JSON page; stream for more
+
+@app.get("/v1/air/nearest")
+async def air_nearest(
+    request: Request,
+    lat: Optional[str] = None,
+    lon: Optional[str] = None,
+    radius_m: Optional[str] = None,
+    limit: Optional[str] = None,
+    parameters: Optional[str] = None,
+    cursor: Optional[str] = None,
+    stream: Optional[str] = None,
+):
     """
     Latest air quality measurements from OpenAQ near a coordinate.
     Params:
       - lat (required)
       - lon (required)
       - radius_m (optional, default 10000)
-      - limit (optional, default 5)
+      - limit (optional, default 5): locations per page, at most AIR_MAX_PAGE;
+        with stream, the total number of locations
       - parameters (optional, comma-separated e.g., pm25,pm10,no2,o3,so2,co)
+      - cursor (optional): ``next_cursor`` of the previous page
+      - stream=1 or Accept: application/x-ndjson: NDJSON, one measurement per line
     """
-    lat = request.args.get("lat")
-    lon = request.args.get("lon")
     if not lat or not lon:
-        return jsonify({"error": "Missing lat/lon"}), 400
+        return JSONResponse({"error": "Missing lat/lon"}, status_code=400)
+    point = _parse_latlon(lat, lon)
+    if point is None:
+        return JSONResponse({"error": "Invalid lat/lon"}, status_code=400)
+    cell_lat, cell_lon = snap("openaq", *point)
 
     try:
-        radius = int(request.args.get("radius_m", 10000))
+        radius = int(radius_m or 10000)
     except:
         radius = 10000
 
     try:
-        limit = int(request.args.get("limit", 5))
+        limit = int(limit or 5)
     except:
         limit = 5
+    offset = _decode_cursor(cursor)
+    if offset is None:
+        return JSONResponse({"error": "Invalid cursor"}, status_code=400)
+    streaming = _wants_stream(request, stream)
+    if not streaming:
+        limit = max(1, min(limit, AIR_MAX_PAGE))
 
     params = {
-        "coordinates": f"{lat},{lon}",
+        "coordinates": f"{cell_lat},{cell_lon}",
         "radius": radius,
         "limit": limit,
         "order_by": "distance",
         "sort": "asc"
     }
     # Optional filter by pollutant parameters
-    parameters_csv = request.args.get("parameters")
+    parameters_csv = parameters
     if parameters_csv:
         params["parameters[]"] = [p.strip() for p in parameters_csv.split(",") if p.strip()]
 
     url = "https://api.openaq.org/v2/latest"
+    headers = {"User-Agent": "kerala-farm-assist/1.0"}
+    if streaming:
+        try:
+            first = await _open_stream(url, {**params, "offset": offset, "limit": min(STREAM_PAGE_SIZE, limit)},
+                                       headers=headers)
+        except Exception as e:
+            return _upstream_error("Failed to fetch OpenAQ", e)
+        return _ndjson(_stream_air(_stream_items(url, params, "results", offset, limit, first=first, headers=headers)),
+                       batched=True)
+
+    if offset:
+        params["offset"] = offset
     try:
-        r = requests.get(url, params=params, timeout=20, headers={"User-Agent": "kerala-farm-assist/1.0"})
-        r.raise_for_status()
-        js = r.json()
+        js = await _cached(make_key("openaq_latest", params), AIR_TTL,
+                           lambda: _get_json(url, params, headers=headers))
     except Exception as e:
-        return jsonify({"error": "Failed to fetch OpenAQ", "details": str(e)}), 502
+        return _upstream_error("Failed to fetch OpenAQ", e)
 
     # Simplify output
-    simplified = []
-    for loc in js.get("results", []):
-        coord = loc.get("coordinates") or {}
-        for m in loc.get("measurements", []):
-            simplified.append({
-                "location": loc.get("location"),
-                "distance_m": loc.get("distance"),
-                "parameter": m.get("parameter"),
-                "value": m.get("value"),
-                "unit": m.get("unit"),
-                "last_updated": m.get("lastUpdated"),
-                "lat": coord.get("latitude"),
-                "lon": coord.get("longitude"),
-                "city": loc.get("city"),
-                "country": loc.get("country")
-            })
+    locations = js.get("results", [])
+    simplified = [row for loc in locations for row in _air_rows(loc)]
+    found = (js.get("meta") or {}).get("found")
+    more = offset + len(locations) < found if isinstance(found, int) else len(locations) >= limit
 
-    return jsonify({
+    return {
         "query": {"lat": lat, "lon": lon, "radius_m": radius, "limit": limit, "parameters": params.get("parameters[]")},
+        "grid": grid_describe("openaq", *point),
         "count": len(simplified),
         "results": simplified,
+        "next_cursor": _encode_cursor(offset + len(locations)) if more and locations else None,
         "source": {"service": "OpenAQ v2", "endpoint": url}
-    })
+    }
+
+def _air_rows(loc):
+    # one row per measurement of an OpenAQ location
+    coord = loc.get("coordinates") or {}
+    for m in loc.get("measurements", []):
+        yield {
+            "location": loc.get("location"),
+            "distance_m": loc.get("distance"),
+            "parameter": m.get("parameter"),
+            "value": m.get("value"),
+            "unit": m.get("unit"),
+            "last_updated": m.get("lastUpdated"),
+            "lat": coord.get("latitude"),
+            "lon": coord.get("longitude"),
+            "city": loc.get("city"),
+            "country": loc.get("country")
+        }
+
+async def _stream_air(locations):
+    try:
+        async for batch in _batched(locations, STREAM_BATCH):
+            yield [row for loc in batch for row in _air_rows(loc)]
+    except Exception as e:
+        yield [{"error": "Failed to fetch OpenAQ", "details": str(e)}]
 
 # =================================================
-# GEOCODING: Nominatim (OpenStreetMap) — no API key
+# GEOCODING: local gazetteer first (geocoder.py), then
+# Nominatim (OpenStreetMap) — no API key
 # =================================================
 
 _NOMINATIM_BASE = "https://nominatim.openstreetmap.org"
+gazetteer = Gazetteer(os.getenv("GAZETTEER_PATH", DEFAULT_GAZETTEER))
+# reverse lookups snap to the nearest gazetteer place this close, at district
+# precision (see geocoder.py); 0 sends everything outside the zoom's radius to Nominatim
+GEOCODE_REVERSE_SNAP_KM = float(os.getenv("GEOCODE_REVERSE_SNAP_KM", "30"))
 
 def _nominatim_headers():
     # Respect usage policy: set a descriptive User-Agent
     return {"User-Agent": "kerala-farm-assist/1.0"}
 
-@app.route("/v1/geocode/search", methods=["GET"])
-def geocode_search():
+@app.get("/v1/geocode/search")
+async def geocode_search(
+    q: Optional[str] = None,
+    limit: Optional[str] = None,
+    countrycodes: str = "in",
+):
     """
-    Forward geocoding with Nominatim.
+    Forward geocoding: offline gazetteer, falling back to Nominatim.
     Params:
       - q (required): free text, e.g., "Aluva market Ernakulam Kerala"
       - limit (optional, default 5)
       - countrycodes (optional, default 'in')
     """
-    q = request.args.get("q")
     if not q:
-        return jsonify({"error": "Missing 'q'"}), 400
+        return JSONResponse({"error": "Missing 'q'"}, status_code=400)
 
     try:
-        limit = int(request.args.get("limit", 5))
+        limit = int(limit or 5)
     except:
         limit = 5
 
-    countrycodes = request.args.get("countrycodes", "in")
+    if "in" in countrycodes.lower().split(","):
+        results = await asyncio.to_thread(gazetteer.search, q, limit)
+        if results:
+            return {"count": len(results), "results": results, "source": gazetteer.source}
 
     params = {
         "q": q,
@@ -419,11 +1531,10 @@ def geocode_search():
     }
     url = f"{_NOMINATIM_BASE}/search"
     try:
-        r = requests.get(url, params=params, timeout=20, headers=_nominatim_headers())
-        r.raise_for_status()
-        items = r.json()
+        items = await _cached(make_key("nominatim_search", params), GEOCODE_TTL,
+                              lambda: _get_json(url, params, headers=_nominatim_headers()))
     except Exception as e:
-        return jsonify({"error": "Failed to geocode", "details": str(e)}), 502
+        return _upstream_error("Failed to geocode", e)
 
     results = []
     for it in items:
@@ -437,31 +1548,41 @@ def geocode_search():
             "address": it.get("address")
         })
 
-    return jsonify({
+    return {
         "count": len(results),
         "results": results,
         "source": {"service": "Nominatim", "endpoint": url}
-    })
+    }
 
-@app.route("/v1/geocode/reverse", methods=["GET"])
-def geocode_reverse():
+@app.get("/v1/geocode/reverse")
+async def geocode_reverse(
+    lat: Optional[str] = None,
+    lon: Optional[str] = None,
+    zoom: Optional[str] = None,
+):
     """
-    Reverse geocoding with Nominatim.
+    Reverse geocoding: nearest gazetteer place, falling back to Nominatim.
+    A place beyond the zoom's radius but within GEOCODE_REVERSE_SNAP_KM
+    answers with "approximate": true and its "distance_km".
     Params:
       - lat (required)
       - lon (required)
       - zoom (optional, 0..18, default 16)
     """
-    lat = request.args.get("lat")
-    lon = request.args.get("lon")
     if not lat or not lon:
-        return jsonify({"error": "Missing lat/lon"}), 400
+        return JSONResponse({"error": "Missing lat/lon"}, status_code=400)
 
     try:
-        zoom = int(request.args.get("zoom", 16))
+        zoom = int(zoom or 16)
     except:
         zoom = 16
 
+    point = _parse_latlon(lat, lon)
+    if point is not None:
+        out = await asyncio.to_thread(gazetteer.reverse, point[0], point[1], zoom, GEOCODE_REVERSE_SNAP_KM)
+        if out is not None:
+            return {"result": out, "source": gazetteer.source}
+
     params = {
         "lat": lat,
         "lon": lon,
@@ -471,11 +1592,10 @@ def geocode_reverse():
     }
     url = f"{_NOMINATIM_BASE}/reverse"
     try:
-        r = requests.get(url, params=params, timeout=20, headers=_nominatim_headers())
-        r.raise_for_status()
-        js = r.json()
+        js = await _cached(make_key("nominatim_reverse", params), GEOCODE_TTL,
+                           lambda: _get_json(url, params, headers=_nominatim_headers()))
     except Exception as e:
-        return jsonify({"error": "Failed to reverse geocode", "details": str(e)}), 502
+        return _upstream_error("Failed to reverse geocode", e)
 
     out = {
         "display_name": js.get("display_name"),
@@ -483,11 +1603,187 @@ def geocode_reverse():
         "lon": float(js.get("lon")) if js.get("lon") else None,
         "address": js.get("address")
     }
-    return jsonify({
+    return {
         "result": out,
         "source": {"service": "Nominatim", "endpoint": url}
-    })
+    }
+
+#############################FARM CONTEXT###############################
+# One call for the LLM agent instead of six. Independent sources run
+# concurrently through the existing handlers (and so their caches); prices
+# wait for the district from reverse geocoding, and the irrigation schedule
+# for the forecast it reads from the cache. Each source has its own deadline:
+# a slow one is reported in "sources", never waited for.
+CONTEXT_DEADLINES = {
+    "location": 6,
+    "weather": 10,
+    "soil": 10,
+    "air": 8,
+    "prices": 8,      # after location
+    "pesticides": 2,
+    "irrigation": 10, # after weather
+}
+CONTEXT_PRICE_ROWS = 20
+CONTEXT_SOIL_DEPTHS = "0-5,5-15,15-30"
+
+# irrigation crop -> Agmarknet commodity, for the prices filter
+_CONTEXT_COMMODITIES = {
+    "rice": "Paddy(Dhan)(Common)", "banana": "Banana", "cassava": "Tapioca", "groundnut": "Groundnut",
+    "maize": "Maize", "tomato": "Tomato", "eggplant": "Brinjal", "cabbage": "Cabbage",
+    "cowpea": "Cowpea(Veg)", "green_bean": "Beans", "sugarcane": "Sugarcane", "coconut": "Coconut",
+}
+
+async def _context_section(name, coro):
+    """(payload, source status) for one section, within its deadline."""
+    deadline = CONTEXT_DEADLINES[name]
+    t0 = time.monotonic()
+    try:
+        res = await asyncio.wait_for(coro, deadline)
+    except asyncio.TimeoutError:
+        return None, {"status": "timeout", "deadline_s": deadline}
+    except (RateLimited, CircuitOpen) as e:
+        status = "rate_limited" if isinstance(e, RateLimited) else "circuit_open"
+        return None, {"status": status, "details": str(e), "retry_after": e.retry_after_header}
+    except Exception as e:
+        return None, {"status": "error", "details": str(e)}
+    if isinstance(res, Response):
+        # a handler's error response
+        body = json.loads(res.body)
+        status = {"status": "unavailable" if res.status_code == 503 else "error",
+                  "details": body.get("details") or body.get("error")}
+        if "retry-after" in res.headers:
+            status["retry_after"] = res.headers["retry-after"]
+        return None, status
+    return res, {"status": "ok", "elapsed_ms": round((time.monotonic() - t0) * 1000)}
+
+def _compact_location(res):
+    addr = res["result"].get("address") or {}
+    district = addr.get("state_district") or addr.get("county") or ""
+    district = re.sub(r"\s+district$", "", district, flags=re.I).strip() or None
+    return {"name": res["result"].get("display_name"), "district": district, "state": addr.get("state"),
+            "source": res["source"].get("service") if isinstance(res.get("source"), dict) else res.get("source")}
+
+def _compact_soil(res):
+    out = {}
+    for r in res["results"]:
+        out.setdefault(r["property"], {})[r["depth"]] = r["value"]
+    return out
+
+def _compact_air(res):
+    # nearest reading per pollutant (results come sorted by distance)
+    out = {}
+    for r in res["results"]:
+        out.setdefault(r["parameter"], {k: r[k] for k in ("value", "unit", "location", "distance_m", "last_updated")})
+    return out
+
+def _compact_prices(res):
+    keep = ("commodity", "variety", "market", "arrival_date", "price_min_inr_per_kg",
+            "price_modal_inr_per_kg", "price_max_inr_per_kg")
+    return [{k: r.get(k) for k in keep} for r in res["results"]]
+
+def _compact_irrigation(res):
+    rows = res["schedule"]
+    return {
+        "next_irrigation": res["next_irrigation"],
+        "total_irrigation_mm": res["total_irrigation_mm"],
+        "soil": res["soil"],
+        "daily": {k: [r[k] for r in rows] for k in ("date", "stage", "etc_mm", "rain_mm", "irrigation_mm")},
+    }
+
+@app.get("/v1/context/farm")
+async def farm_context(
+    lat: Optional[str] = None,
+    lon: Optional[str] = None,
+    crop: Optional[str] = None,
+    sowing_date: Optional[str] = None,
+    pesticides: Optional[str] = None,
+):
+    """
+    Everything the agent needs about a farm in one compact document.
+    Params:
+      - lat, lon (required)
+      - crop (optional): filters mandi prices; with sowing_date (YYYY-MM-DD)
+        adds the irrigation schedule
+      - pesticides (optional, comma-separated): banned-list check
+    Sections: location, weather (daily forecast), soil, air, prices, pesticides,
+    irrigation; "sources" gives each one's status and time.
+    """
+    if not lat or not lon:
+        return JSONResponse({"error": "Missing required parameters 'lat' and 'lon'"}, status_code=400)
+    point = _parse_latlon(lat, lon)
+    if point is None:
+        return JSONResponse({"error": "Invalid lat/lon"}, status_code=400)
+    crop_key = irrigation.crop_name(crop)
+    if crop and sowing_date and crop_key is None:
+        return JSONResponse({"error": f"Unknown crop {crop!r}; see /v1/irrigation/crops"}, status_code=400)
+    t0 = time.monotonic()
+
+    days = _irrigation_days(None)
+    om_lat, om_lon = snap("open_meteo", *point)
+    start_date, end_date = days[0].isoformat(), days[-1].isoformat()
+
+    async def weather_daily():
+        js = await get_open_meteo_forecast(om_lat, om_lon, start_date, end_date)
+        return {"daily": js.get("daily"), "daily_units": js.get("daily_units")}
+
+    async def check_pesticides():
+        names = [n.strip() for n in pesticides.split(",") if n.strip()]
+        return [await pesticide_check(n) for n in names]
+
+    tasks = {
+        "location": asyncio.ensure_future(_context_section("location", geocode_reverse(lat, lon, zoom="10"))),
+        "weather": asyncio.ensure_future(_context_section("weather", weather_daily())),
+        "soil": asyncio.ensure_future(_context_section("soil", soil_soilgrids(lat, lon, depths=CONTEXT_SOIL_DEPTHS))),
+        "air": asyncio.ensure_future(_context_section("air", air_nearest(None, lat, lon, limit="3"))),
+    }
+    if pesticides:
+        tasks["pesticides"] = asyncio.ensure_future(_context_section("pesticides", check_pesticides()))
+
+    async def prices_after_location():
+        loc, status = await tasks["location"]
+        place = _compact_location(loc) if loc else {}
+        if not place.get("state") or not place.get("district"):
+            return None, {"status": "skipped", "details": f"district unknown (location: {status['status']})"}
+        commodity = _CONTEXT_COMMODITIES.get(crop_key, crop.title() if crop else None)
+        return await _context_section("prices", prices(None, state=place["state"], district=place["district"],
+                                                       commodity=commodity, limit=str(CONTEXT_PRICE_ROWS)))
+
+    async def irrigation_after_weather():
+        # the forecast is cached by now, so the schedule costs no second Open-Meteo call
+        await tasks["weather"]
+        return await _context_section("irrigation", irrigation_schedule(lat, lon, crop=crop, sowing_date=sowing_date))
+
+    tasks["prices"] = asyncio.ensure_future(prices_after_location())
+    if crop_key and sowing_date:
+        tasks["irrigation"] = asyncio.ensure_future(irrigation_after_weather())
+    results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+
+    compact = {"location": _compact_location, "soil": _compact_soil, "air": _compact_air,
+               "prices": _compact_prices, "irrigation": _compact_irrigation}
+    out = {"query": {"lat": lat, "lon": lon, "crop": crop_key or crop, "sowing_date": sowing_date}}
+    sources = {}
+    for name, (value, status) in results.items():
+        out[name] = compact[name](value) if value is not None and name in compact else value
+        sources[name] = status
+
+    if all(src["status"] != "ok" for src in sources.values()):
+        limited = [int(src["retry_after"]) for src in sources.values() if "retry_after" in src]
+        if limited:
+            return JSONResponse({"error": "Failed to fetch external data", "sources": sources}, status_code=503,
+                                headers={"Retry-After": str(min(limited))})
+        return JSONResponse({"error": "Failed to fetch external data", "sources": sources}, status_code=502)
+
+    out["sources"] = sources
+    out["elapsed_ms"] = round((time.monotonic() - t0) * 1000)
+    return out
+
 
+lifecycle.imported()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Production: run several workers, e.g.
+    #   uvicorn myPoint:app --host 0.0.0.0 --port 5000 --workers 4
+    # (or gunicorn -k uvicorn.workers.UvicornWorker myPoint:app)
+    import uvicorn
+    uvicorn.run("myPoint:app", host="0.0.0.0", port=int(os.getenv("PORT", "5000")),
+                workers=int(os.getenv("WEB_CONCURRENCY", "1")))
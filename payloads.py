@@ -0,0 +1,301 @@
+"""
+Response encoding shared by myPoint.py and api_llm/main.py.
+
+  - dumps(): orjson when installed (several times faster than json), else
+    the stdlib json module; both write NaN and infinities as null
+  - FastJSONResponse: a JSONResponse rendered with dumps()
+  - CompressionMiddleware: brotli or gzip by Accept-Encoding, including
+    streamed responses, which are flushed chunk by chunk so NDJSON lines
+    still arrive as they are produced
+  - stream_json(): one JSON document streamed in chunks, for long row lists
+  - iter_json_array(): the items of one array in an upstream JSON document,
+    parsed as the bytes arrive, for pass-through of large result sets
+"""
+import json
+import math
+import zlib
+import codecs
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+
+from starlette.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def _default(o):
+    # pandas Timestamps, datetimes, dates, numpy scalars
+    if hasattr(o, "isoformat"):
+        return o.isoformat()
+    if hasattr(o, "item"):
+        v = o.item()
+        return None if isinstance(v, float) and not math.isfinite(v) else v
+    return str(o)
+
+
+def _finite(o):
+    # json writes NaN/Infinity, which is not JSON; orjson writes null
+    if isinstance(o, float):
+        return o if math.isfinite(o) else None
+    if isinstance(o, dict):
+        return {k: _finite(v) for k, v in o.items()}
+    if isinstance(o, (list, tuple)):
+        return [_finite(v) for v in o]
+    return o
+
+
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+else:
+    def dumps(obj: Any) -> bytes:
+        try:
+            out = json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+        except ValueError:
+            # rare: walk the document only when it holds a non-finite float
+            out = json.dumps(_finite(obj), default=_default, ensure_ascii=False, separators=(",", ":"))
+        return out.encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def stream_json(head: Dict[str, Any], key: str, rows: List[Any], chunk_rows: int = 500) -> StreamingResponse:
+    """Stream ``{**head, key: rows}`` without building the whole body in memory."""
+    async def body() -> AsyncIterator[bytes]:
+        prefix = dumps(head)
+        yield prefix[:-1] + (b"," if head else b"") + dumps(key) + b":["
+        for i in range(0, len(rows), chunk_rows):
+            part = dumps(rows[i:i + chunk_rows])[1:-1]
+            if part:
+                yield (b"," if i else b"") + part
+        yield b"]}"
+    return StreamingResponse(body(), media_type="application/json")
+
+
+_WS = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+async def iter_json_array(chunks: AsyncIterable[bytes], key: str,
+                          meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[Any]:
+    """
+    Yield the items of the top-level ``key`` array of a JSON object read from
+    ``chunks``, holding at most one item (plus one chunk) in memory. The
+    object's other top-level members are decoded into ``meta`` if given.
+    """
+    it = chunks.__aiter__()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, eof = "", 0, False
+
+    async def more() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        try:
+            data = await it.__anext__()
+        except StopAsyncIteration:
+            eof = True
+            data = b""
+        buf = buf[pos:] + utf8.decode(data, final=eof)
+        pos = 0
+        return True
+
+    async def skip_ws() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not await more():
+                raise ValueError("Truncated JSON document")
+
+    async def value() -> Any:
+        nonlocal pos
+        await skip_ws()
+        while True:
+            try:
+                v, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not await more():
+                    raise
+                continue
+            # a number may continue in the next chunk
+            if end == len(buf) and not eof:
+                await more()
+                continue
+            pos = end
+            return v
+
+    async def expect(ch: str):
+        nonlocal pos
+        if await skip_ws() != ch:
+            raise ValueError(f"Expected {ch!r} in JSON document, got {buf[pos]!r}")
+        pos += 1
+
+    await expect("{")
+    first = True
+    while True:
+        c = await skip_ws()
+        if c == "}":
+            return
+        if not first:
+            await expect(",")
+        first = False
+        name = await value()
+        await expect(":")
+        if name != key or await skip_ws() != "[":
+            v = await value()
+            if meta is not None:
+                meta[name] = v
+            continue
+        pos += 1
+        n = 0
+        while True:
+            if await skip_ws() == "]":
+                pos += 1
+                break
+            if n:
+                await expect(",")
+            yield await value()
+            n += 1
+
+
+# ---------- compression ----------
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._c = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._c.compress(data) + self._c.flush()
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._c = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._c.process(data) + self._c.finish()
+
+
+def _vary(headers) -> bytes:
+    """The response's Vary values (e.g. Origin from CORS) merged into one header with Accept-Encoding."""
+    values = []
+    for k, v in headers:
+        if k.lower() == b"vary":
+            values += [t.strip() for t in v.decode("latin-1").split(",") if t.strip()]
+    if "*" in values:
+        return b"*"
+    if "accept-encoding" not in {t.lower() for t in values}:
+        values.append("Accept-Encoding")
+    return ", ".join(dict.fromkeys(values)).encode("latin-1")
+
+
+def _qvalues(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}; a coding without q has q=1."""
+    out = {}
+    for tok in header.split(","):
+        name, *params = [p.strip() for p in tok.split(";")]
+        if not name:
+            continue
+        q = 1.0
+        for p in params:
+            if p.startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        out[name] = q
+    return out
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware: ``app.add_middleware(CompressionMiddleware)``. Prefers
+    brotli when the client accepts it and the module is installed. Bodies
+    below ``minimum_size`` and non-text types pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose(self, scope) -> str:
+        accept = ""
+        for k, v in scope.get("headers", ()):
+            if k == b"accept-encoding":
+                accept = v.decode("latin-1").lower()
+        q = _qvalues(accept)
+        candidates = (["br"] if brotli is not None else []) + ["gzip"]
+        # highest q wins, brotli on a tie; q=0 means "not acceptable"
+        best = max(candidates, key=lambda c: q.get(c, q.get("*", 0.0)))
+        return best if q.get(best, q.get("*", 0.0)) > 0 else ""
+
+    async def __call__(self, scope, receive, send):
+        encoding = self._choose(scope) if scope["type"] == "http" else ""
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if compressor is None:
+                headers = {k.lower(): v for k, v in start.get("headers", [])}
+                ctype = headers.get(b"content-type", b"").decode("latin-1")
+                if (b"content-encoding" in headers or not ctype.startswith(COMPRESSIBLE_TYPES)
+                        or (not more and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Brotli(self.brotli_quality) if encoding == "br" else _Gzip(self.gzip_level)
+                raw = [(k, v) for k, v in start.get("headers", []) if k.lower() not in (b"content-length", b"vary")]
+                raw += [(b"content-encoding", encoding.encode()), (b"vary", _vary(start.get("headers", [])))]
+                if not more:
+                    body = compressor.finish(body)
+                    raw.append((b"content-length", str(len(body)).encode()))
+                    await send({**start, "headers": raw})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start, "headers": raw})
+
+            data = compressor.chunk(body) if more else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
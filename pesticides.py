@@ -0,0 +1,153 @@
+"""
+Banned-pesticide matcher.
+
+The list is loaded once into an in-memory index and reloaded when the CSV's
+mtime changes. Lookups try, in order:
+  1. exact normalised name or alias ("endosulphan" == "Endosulfan")
+  2. a banned name contained in a product label ("Thiodan 35% EC" style)
+  3. fuzzy match over a trigram index, confirmed by edit distance
+"""
+import os
+import re
+import csv
+import time
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set
+
+from textsim import edit_ratio, trigrams
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "list_of_banned_pesticides.csv")
+
+# Common names, acronyms and trade names for listed actives. Keys must match a
+# Pesticide_Name in the CSV; an optional "Aliases" column (';'-separated) adds more.
+_ALIASES = {
+    "Benzene Hexachloride": ["BHC", "HCH"],
+    "Lindane": ["Gamma-HCH", "gamma BHC"],
+    "Dibromochloropropane": ["DBCP"],
+    "Ethylene Dibromide": ["EDB"],
+    "Pentachloro Nitrobenzene": ["PCNB", "Quintozene"],
+    "Trichloro acetic acid": ["TCA"],
+    "Paradichlorobenzene": ["PDCB"],
+    "Toxaphene": ["Camphechlor"],
+    "Chinomethionate": ["Morestan", "Quinomethionate"],
+    "Leptophos": ["Phosvel"],
+    "Mevinphos": ["Phosdrin"],
+    "Disulfoton": ["Thiodemeton"],
+    "Endosulfan": ["Thiodan"],
+    "Dichlorvos": ["DDVP"],
+    "Ethyl Parathion": ["Parathion"],
+    "Nicotin Sulfate": ["Nicotine Sulfate"],
+}
+
+# Formulation codes and filler words stripped from product labels
+_FORMULATION_TOKENS = {
+    "ec", "wp", "sc", "sl", "wg", "wdg", "dp", "gr", "g", "cs", "ulv", "fs", "sp",
+    "ew", "od", "zc", "cg", "dust", "granules", "w", "v", "ww", "wv",
+}
+
+FUZZY_MIN_SCORE = 0.85
+
+
+def normalize(name: str) -> str:
+    """Lowercase, strip accents/punctuation/strengths, unify -sulph-/-sulf- spelling."""
+    s = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii").lower()
+    s = s.replace("sulph", "sulf")
+    s = re.sub(r"\d+(\.\d+)?\s*%?", " ", s)
+    tokens = [t for t in re.split(r"[^a-z]+", s) if t and t not in _FORMULATION_TOKENS]
+    return " ".join(tokens)
+
+
+class PesticideMatcher:
+    def __init__(self, path: str = DEFAULT_CSV, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._load()
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime
+        names: List[str] = []
+        index: Dict[str, int] = {}       # normalised name/alias -> canonical id
+        keys: List[str] = []             # normalised keys, for fuzzy/contains search
+        key_ids: List[int] = []
+        with open(self.path, newline="", encoding="utf-8") as fh:
+            for row in csv.DictReader(fh):
+                canonical = (row.get("Pesticide_Name") or "").strip()
+                if not canonical:
+                    continue
+                aliases = [a.strip() for a in (row.get("Aliases") or "").split(";") if a.strip()]
+                aliases += _ALIASES.get(canonical, [])
+                cid = len(names)
+                names.append(canonical)
+                for nm in [canonical] + aliases:
+                    k = normalize(nm)
+                    if k and k not in index:
+                        index[k] = cid
+                        keys.append(k)
+                        key_ids.append(cid)
+        grams: Dict[str, Set[int]] = {}
+        for i, k in enumerate(keys):
+            for g in trigrams(k):
+                grams.setdefault(g, set()).add(i)
+        # longest first so "methoxy ethyl mercury chloride" wins over its suffix
+        by_len = sorted(range(len(keys)), key=lambda i: -len(keys[i]))
+        self._names, self._index, self._keys, self._key_ids = names, index, keys, key_ids
+        self._grams, self._by_len = grams, by_len
+        self._mtime = mtime
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                if os.stat(self.path).st_mtime != self._mtime:
+                    self._load()
+            except OSError:
+                pass  # keep serving the last good list
+
+    def __len__(self):
+        return len(self._names)
+
+    def check(self, name: str) -> Dict:
+        """Return {"status": "banned"|"safe", "match": {...} or None} for one product name."""
+        self._maybe_reload()
+        q = normalize(name)
+        match = self._match(q) if q else None
+        return {"status": "banned" if match else "safe", "match": match}
+
+    def _match(self, q: str) -> Optional[Dict]:
+        cid = self._index.get(q)
+        if cid is not None:
+            return self._hit(cid, q, "exact", 1.0)
+
+        padded = f" {q} "
+        for i in self._by_len:
+            if f" {self._keys[i]} " in padded:
+                return self._hit(self._key_ids[i], self._keys[i], "contains", 1.0)
+
+        counts: Dict[int, int] = {}
+        qg = trigrams(q)
+        for g in qg:
+            for i in self._grams.get(g, ()):
+                counts[i] = counts.get(i, 0) + 1
+        best, best_score = None, 0.0
+        for i, shared in counts.items():
+            # cheap Jaccard prefilter before the quadratic edit distance
+            if shared / (len(qg) + len(trigrams(self._keys[i])) - shared) < 0.3:
+                continue
+            score = edit_ratio(q, self._keys[i])
+            if score > best_score:
+                best, best_score = i, score
+        if best is not None and best_score >= FUZZY_MIN_SCORE:
+            return self._hit(self._key_ids[best], self._keys[best], "fuzzy", round(best_score, 3))
+        return None
+
+    def _hit(self, cid: int, matched: str, match_type: str, score: float) -> Dict:
+        return {"name": self._names[cid], "matched_as": matched, "match_type": match_type, "score": score}
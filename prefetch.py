@@ -0,0 +1,278 @@
+"""
+Cache warm-up for myPoint.py and api_llm/main.py.
+
+The Prefetcher replays popular GET requests against the app in-process, so
+the first farmer of the day does not pay for a cold cache. Which requests:
+
+  - learned: PrefetchMiddleware counts successful GETs under the app's
+    cacheable path prefixes, with exponential decay (``half_life``), and
+    the top ``top_k`` are replayed
+  - configured: ``targets`` in the JSON config file (PREFETCH_CONFIG)
+
+Every ``interval`` seconds each target is replayed with ``refresh_within``
+set to ``ahead``: the apps' caches treat entries expiring within that window
+as misses, so they are refreshed before anyone sees them expire, while
+entries with plenty of life left are plain hits. ``schedules`` replay their
+targets once a day at a wall-clock time with every entry refreshed, e.g.
+right after Agmarknet's daily publish.
+
+Replays are spaced to at most ``rate`` per second, and while
+``prefetching()`` is true the apps make their upstream calls at BACKGROUND
+priority, so user traffic always goes first.
+
+Config file (all keys optional):
+
+    {"top_k": 20, "interval": 300, "ahead": 900, "rate": 0.5,
+     "timezone": "Asia/Kolkata",
+     "targets": ["/marketInfo/prices?state=Kerala&district=Ernakulam"],
+     "schedules": [{"at": "10:30", "targets": ["/marketInfo/prices?state=Kerala"]},
+                   {"at": "05:30", "top": true}]}
+
+The file is re-read when its mtime changes. Learned counts are per process.
+
+``stats()`` backs unauthenticated status endpoints, so learned targets are
+shown as path, grid cell and score only: the full query strings hold users'
+exact coordinates. PREFETCH_SHOW_TARGETS=1 shows them in full, for debugging.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import contextvars
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode
+from zoneinfo import ZoneInfo
+
+import httpx
+
+from grid import cell_key
+
+logger = logging.getLogger("prefetch")
+
+# > 0 while a prefetch replays a request: cache entries expiring within this
+# many seconds count as misses
+refresh_within: contextvars.ContextVar = contextvars.ContextVar("refresh_within", default=0.0)
+
+PREFETCH_HEADER = "x-prefetch"
+# query parameters never learned or shown (replays use the server's own keys)
+_SECRET_PARAMS = {"api-key", "api_key", "apikey", "key", "token"}
+_COORD_PARAMS = (("lat", "lon"), ("latitude", "longitude"))
+SHOW_TARGETS = os.getenv("PREFETCH_SHOW_TARGETS", "0") not in ("0", "false", "no")
+
+DEFAULTS = {
+    "top_k": int(os.getenv("PREFETCH_TOP_K", "20")),
+    "interval": float(os.getenv("PREFETCH_INTERVAL", "300")),
+    "ahead": float(os.getenv("PREFETCH_AHEAD", "900")),
+    "rate": float(os.getenv("PREFETCH_RATE", "0.5")),
+    "half_life": float(os.getenv("PREFETCH_HALF_LIFE", str(6 * 3600))),
+    "timezone": "Asia/Kolkata",
+    "targets": [],
+    "schedules": [],
+}
+
+
+def prefetching() -> bool:
+    return refresh_within.get() > 0
+
+
+def normalize_target(path: str, query: str) -> str:
+    pairs = sorted((k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k.lower() not in _SECRET_PARAMS)
+    return f"{path}?{urlencode(pairs)}" if pairs else path
+
+
+def summarize_target(target: str) -> Dict:
+    """Path and ~11 km grid cell of a target, without its query string."""
+    path, _, query = target.partition("?")
+    params = dict(parse_qsl(query))
+    out = {"path": path}
+    for lat, lon in _COORD_PARAMS:
+        try:
+            out["cell"] = cell_key("open_meteo", float(params[lat]), float(params[lon]))
+            break
+        except (KeyError, ValueError):
+            continue
+    return out
+
+
+def _describe(target: str) -> str:
+    if SHOW_TARGETS:
+        return target
+    summary = summarize_target(target)
+    return f"{summary['path']} ({summary['cell']})" if "cell" in summary else summary["path"]
+
+
+class AccessLog:
+    """Exponentially decayed hit counts per request target."""
+
+    def __init__(self, half_life: float, max_keys: int = 5000):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self._scores: Dict[str, tuple] = {}   # target -> (score, as of)
+
+    def _decayed(self, score: float, t: float, now: float) -> float:
+        return score * 0.5 ** ((now - t) / self.half_life)
+
+    def record(self, target: str):
+        now = time.time()
+        score, t = self._scores.get(target, (0.0, now))
+        self._scores[target] = (self._decayed(score, t, now) + 1.0, now)
+        if len(self._scores) > self.max_keys:
+            # forget the cold half
+            ranked = sorted(self._scores, key=lambda k: self._decayed(*self._scores[k], now))
+            for k in ranked[: len(ranked) // 2]:
+                del self._scores[k]
+
+    def top(self, k: int) -> List[tuple]:
+        now = time.time()
+        ranked = sorted(((self._decayed(s, t, now), target) for target, (s, t) in self._scores.items()), reverse=True)
+        return [(target, round(score, 2)) for score, target in ranked[:k]]
+
+
+class Prefetcher:
+    def __init__(self, app, config_path: Optional[str] = None, include: Iterable[str] = ()):
+        self.app = app
+        self.config_path = config_path
+        self.include = tuple(include)
+        self.config = dict(DEFAULTS)
+        self._mtime = None
+        self.log = AccessLog(self.config["half_life"])
+        self._task: Optional[asyncio.Task] = None
+        self._last_cycle = 0.0
+        self._schedule_runs: Dict[int, str] = {}   # schedule index -> date it last ran
+        self.counts = {"replays": 0, "errors": 0, "cycles": 0, "scheduled_runs": 0, "last_error": None}
+        self._reload()
+
+    def _reload(self):
+        if not self.config_path:
+            return
+        try:
+            mtime = os.stat(self.config_path).st_mtime
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.config_path, encoding="utf-8") as fh:
+                loaded = json.load(fh)
+        except (OSError, ValueError) as e:
+            logger.warning("prefetch config %s unreadable: %s", self.config_path, e)
+            return
+        self._mtime = mtime
+        self.config = {**DEFAULTS, **loaded}
+        self.log.half_life = float(self.config["half_life"])
+        self._schedule_runs.clear()
+
+    def wants(self, path: str) -> bool:
+        return path.startswith(self.include)
+
+    def record(self, path: str, query: str):
+        self.log.record(normalize_target(path, query))
+
+    # ---------- running ----------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        transport = httpx.ASGITransport(app=self.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://prefetch") as client:
+            while True:
+                try:
+                    await self._tick(client)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("prefetch cycle failed: %s", e)
+                await asyncio.sleep(min(30.0, float(self.config["interval"])))
+
+    async def _tick(self, client: httpx.AsyncClient):
+        self._reload()
+        cfg = self.config
+        now = datetime.now(ZoneInfo(cfg["timezone"]))
+        for i, sched in enumerate(cfg["schedules"]):
+            if now.strftime("%H:%M") >= sched.get("at", "99:99") and self._schedule_runs.get(i) != now.date().isoformat():
+                self._schedule_runs[i] = now.date().isoformat()
+                targets = list(sched.get("targets") or [])
+                if sched.get("top"):
+                    targets += self.targets()
+                self.counts["scheduled_runs"] += 1
+                # scheduled: refresh everything, however much life it has left
+                await self.replay(client, dict.fromkeys(targets), float("inf"))
+        if time.monotonic() - self._last_cycle >= float(cfg["interval"]):
+            self._last_cycle = time.monotonic()
+            self.counts["cycles"] += 1
+            await self.replay(client, self.targets(), float(cfg["ahead"]))
+
+    def targets(self) -> List[str]:
+        configured = list(self.config["targets"])
+        learned = [t for t, _ in self.log.top(int(self.config["top_k"]))]
+        return list(dict.fromkeys(configured + learned))
+
+    async def replay(self, client: httpx.AsyncClient, targets: Iterable[str], horizon: float):
+        spacing = 1.0 / max(float(self.config["rate"]), 1e-6)
+        token = refresh_within.set(horizon)
+        try:
+            for target in targets:
+                t0 = time.monotonic()
+                try:
+                    resp = await client.get(target, headers={PREFETCH_HEADER: "1"})
+                    self.counts["replays"] += 1
+                    if resp.status_code >= 400:
+                        self.counts["errors"] += 1
+                        self.counts["last_error"] = f"{_describe(target)}: HTTP {resp.status_code}"
+                except Exception as e:
+                    self.counts["errors"] += 1
+                    # the message may quote the request URL
+                    self.counts["last_error"] = f"{_describe(target)}: {e if SHOW_TARGETS else type(e).__name__}"
+                await asyncio.sleep(max(0.0, spacing - (time.monotonic() - t0)))
+        finally:
+            refresh_within.reset(token)
+
+    def stats(self) -> Dict:
+        return {
+            **self.counts,
+            "running": self._task is not None and not self._task.done(),
+            "config": {k: v for k, v in self.config.items() if k not in ("targets", "schedules")},
+            "schedules": self.config["schedules"],
+            "configured_targets": self.config["targets"],
+            "learned": [{"target": t, "score": s} if SHOW_TARGETS else {**summarize_target(t), "score": s}
+                        for t, s in self.log.top(int(self.config["top_k"]))],
+        }
+
+
+class PrefetchMiddleware:
+    """ASGI middleware: ``app.add_middleware(PrefetchMiddleware, prefetcher=prefetcher)``; learns popular GETs."""
+
+    def __init__(self, app, prefetcher: Prefetcher):
+        self.app = app
+        self.prefetcher = prefetcher
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not self.prefetcher.wants(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        if any(k == PREFETCH_HEADER.encode() for k, _ in scope.get("headers", ())):
+            await self.app(scope, receive, send)
+            return
+        status = [0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+        if 200 <= status[0] < 300:
+            self.prefetcher.record(scope["path"], scope.get("query_string", b"").decode("latin-1"))
@@ -0,0 +1,200 @@
+"""
+Local Agmarknet price warehouse.
+
+A background job pages the OGD daily-mandi-price resource into SQLite, one
+state at a time, and records which (state, district) scopes are covered and
+when. /marketInfo/prices answers covered scopes from indexed local queries and
+only goes to the live API for scopes the warehouse has not synced yet.
+
+Several workers may run the sync loop; a lease row in the database makes sure
+only one of them pages a given state at a time. An interrupted sync resumes
+from the last committed offset.
+"""
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "prices.sqlite3")
+
+# Row identity; grade is included because OGD publishes one row per grade
+KEY_COLUMNS = ("state", "district", "market", "commodity", "variety", "grade", "arrival_date")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    state TEXT NOT NULL COLLATE NOCASE,
+    district TEXT NOT NULL COLLATE NOCASE,
+    market TEXT NOT NULL COLLATE NOCASE,
+    commodity TEXT NOT NULL COLLATE NOCASE,
+    variety TEXT NOT NULL COLLATE NOCASE,
+    grade TEXT NOT NULL COLLATE NOCASE,
+    arrival_date TEXT NOT NULL,
+    arrival_iso TEXT,
+    min_price REAL,
+    max_price REAL,
+    modal_price REAL,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (state, district, market, commodity, variety, grade, arrival_date)
+);
+CREATE INDEX IF NOT EXISTS prices_lookup
+    ON prices (state, district, commodity, market, variety, arrival_iso);
+CREATE TABLE IF NOT EXISTS coverage (
+    state TEXT NOT NULL COLLATE NOCASE,
+    district TEXT NOT NULL COLLATE NOCASE,   -- '*' for a whole state
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (state, district)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    scope TEXT PRIMARY KEY,
+    next_offset INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    started_at REAL,
+    lease_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def _to_iso(arrival_date: Optional[str]) -> Optional[str]:
+    # OGD uses dd/mm/yyyy
+    try:
+        return datetime.strptime(arrival_date, "%d/%m/%Y").date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(v) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+class PriceStore:
+    def __init__(self, path: str = DEFAULT_DB_PATH, max_age: float = 36 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---------- writes ----------
+
+    def upsert(self, records: Iterable[Dict]) -> int:
+        now = datetime.utcnow().isoformat() + "Z"
+        rows = []
+        for r in records:
+            key = [(r.get(c) or "").strip() for c in KEY_COLUMNS]
+            if not all(key[:2]) or not key[-1]:
+                continue
+            rows.append(key + [_to_iso(key[-1]), _to_float(r.get("min_price")),
+                               _to_float(r.get("max_price")), _to_float(r.get("modal_price")), now])
+        if rows:
+            conn = self._conn()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO prices (state, district, market, commodity, variety, grade,"
+                    " arrival_date, arrival_iso, min_price, max_price, modal_price, synced_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        return len(rows)
+
+    def _acquire_lease(self, scope: str, seconds: float) -> bool:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR IGNORE INTO sync_state (scope) VALUES (?)", (scope,))
+        cur = conn.execute(
+            "UPDATE sync_state SET lease_until = ? WHERE scope = ? AND lease_until < ?",
+            (now + seconds, scope, now),
+        )
+        return cur.rowcount == 1
+
+    def sync(self, fetch_page: Callable[[int, int, Optional[str]], Dict], state: Optional[str] = None,
+             page_size: int = 1000, lease: float = 600) -> int:
+        """
+        Page the OGD resource into the store. ``fetch_page(offset, limit, state)``
+        returns the decoded OGD JSON. Returns the number of rows written, or -1
+        if another worker holds the lease for this scope.
+        """
+        scope = (state or "*").lower()
+        if not self._acquire_lease(scope, lease):
+            return -1
+        conn = self._conn()
+        try:
+            row = conn.execute("SELECT next_offset, started_at FROM sync_state WHERE scope = ?", (scope,)).fetchone()
+            offset, started_at = row["next_offset"], row["started_at"]
+            if not offset:
+                started_at = time.time()
+                conn.execute("UPDATE sync_state SET started_at = ? WHERE scope = ?", (started_at, scope))
+            written = 0
+            while True:
+                data = fetch_page(offset, page_size, state)
+                records = data.get("records") or []
+                written += self.upsert(records)
+                offset += len(records)
+                total = _to_float(data.get("total"))
+                conn.execute(
+                    "UPDATE sync_state SET next_offset = ?, total = ?, lease_until = ? WHERE scope = ?",
+                    (offset, total, time.time() + lease, scope),
+                )
+                if not records or len(records) < page_size or (total is not None and offset >= total):
+                    break
+            self._mark_covered(state, started_at, conn)
+            conn.execute("UPDATE sync_state SET next_offset = 0 WHERE scope = ?", (scope,))
+            return written
+        finally:
+            conn.execute("UPDATE sync_state SET lease_until = 0 WHERE scope = ?", (scope,))
+
+    def _mark_covered(self, state: Optional[str], synced_at: float, conn: sqlite3.Connection):
+        if state:
+            conn.execute("INSERT OR REPLACE INTO coverage (state, district, synced_at) VALUES (?, '*', ?)",
+                         (state, synced_at))
+        else:
+            states = [r["state"] for r in conn.execute("SELECT DISTINCT state FROM prices")]
+            conn.executemany("INSERT OR REPLACE INTO coverage (state, district, synced_at) VALUES (?, '*', ?)",
+                             [(s, synced_at) for s in states])
+
+    # ---------- reads ----------
+
+    def covers(self, state: str, district: str) -> bool:
+        row = self._conn().execute(
+            "SELECT MAX(synced_at) AS t FROM coverage WHERE state = ? AND district IN (?, '*')",
+            (state, district),
+        ).fetchone()
+        return bool(row and row["t"] and row["t"] > time.time() - self.max_age)
+
+    def query(self, state: str, district: str, market: Optional[str] = None, commodity: Optional[str] = None,
+              variety: Optional[str] = None, limit: int = 100, offset: int = 0,
+              date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[sqlite3.Row]:
+        sql = ["SELECT * FROM prices WHERE state = ? AND district = ?"]
+        args: List = [state, district]
+        for col, val in (("commodity", commodity), ("market", market), ("variety", variety)):
+            if val:
+                sql.append(f"AND {col} = ?")
+                args.append(val)
+        if date_from:
+            sql.append("AND arrival_iso >= ?")
+            args.append(date_from)
+        if date_to:
+            sql.append("AND arrival_iso <= ?")
+            args.append(date_to)
+        # the rest of the primary key breaks ties: offset-paged cursors need a total order
+        sql.append("ORDER BY arrival_iso DESC, market, commodity, variety, grade, arrival_date LIMIT ? OFFSET ?")
+        args += [limit, offset]
+        return self._conn().execute(" ".join(sql), args).fetchall()
@@ -0,0 +1,164 @@
+"""
+Outbound request scheduler shared by myPoint.py and api_llm/main.py.
+
+Every upstream call first takes a token from the bucket for its (host, API
+key). Buckets refill at the provider's published rate. When a bucket is empty,
+callers queue by priority, so an interactive geocode is served before a batch
+job or the background price sync. If the queue ahead of the caller (waiters
+of the same or higher priority) is full, or the expected wait is longer than
+the caller may wait, ``acquire`` raises ``RateLimited`` at once with a
+retry-after estimate; the apps turn that into 503 + Retry-After.
+
+Budgets are per process. When several workers run, each one gets
+1/WEB_CONCURRENCY of every rate, so together they stay within the provider's
+policy.
+"""
+import os
+import math
+import time
+import heapq
+import asyncio
+import hashlib
+import itertools
+from typing import Dict, Optional
+
+INTERACTIVE, BATCH, BACKGROUND = 0, 1, 2
+
+# Longest a caller of each priority waits in the queue (None = no limit)
+DEFAULT_MAX_WAIT = {
+    INTERACTIVE: float(os.getenv("RATE_LIMIT_MAX_WAIT", "2")),
+    BATCH: float(os.getenv("RATE_LIMIT_BATCH_MAX_WAIT", "30")),
+    BACKGROUND: None,
+}
+DEFAULT_MAX_QUEUE = int(os.getenv("RATE_LIMIT_MAX_QUEUE", "100"))
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+_DEFAULT = object()
+
+
+class RateLimited(Exception):
+    def __init__(self, upstream: str, retry_after: float, reason: str = "rate limit reached"):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(f"{upstream}: {reason}, retry after {retry_after:.1f}s")
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class _Bucket:
+    def __init__(self, rate: float, burst: float, max_queue: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.waiters = []   # heap of (priority, seq, future)
+        self.queued = 0     # waiters not yet served or cancelled; the heap also holds dead ones
+        self.pump: Optional[asyncio.Task] = None
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def dequeued(self, fut: asyncio.Future):
+        # done callback of every queued future: served, or cancelled by a caller that gave up
+        self.queued -= 1
+
+    def wait_for(self, ahead: int) -> float:
+        """Seconds until a token is free for a caller with ``ahead`` callers in front of it."""
+        return max(0.0, (ahead + 1 - self.tokens) / self.rate)
+
+
+class Scheduler:
+    """
+    Token buckets per (host, API key) with priority queues.
+
+    ``limits`` maps host -> {"rate": tokens/s, "burst": n, "max_queue": n}.
+    Hosts without an entry are not limited.
+    """
+
+    def __init__(self, limits: Dict[str, Dict], max_wait: Optional[Dict[int, Optional[float]]] = None):
+        self.limits = dict(limits)
+        self.max_wait = {**DEFAULT_MAX_WAIT, **(max_wait or {})}
+        self._buckets: Dict[tuple, _Bucket] = {}
+        self._seq = itertools.count()
+        self.rejected = 0
+
+    def _bucket(self, host: str, key: Optional[str]) -> Optional[_Bucket]:
+        key = key_id(key)
+        bucket = self._buckets.get((host, key))
+        if bucket is None:
+            policy = self.limits.get(host)
+            if not policy:
+                return None
+            bucket = _Bucket(policy["rate"] / WORKERS, max(1.0, policy.get("burst", 1) / WORKERS),
+                             policy.get("max_queue", DEFAULT_MAX_QUEUE))
+            self._buckets[(host, key)] = bucket
+        return bucket
+
+    async def acquire(self, host: str, key: Optional[str] = None, priority: int = INTERACTIVE,
+                      max_wait=_DEFAULT):
+        """Wait for a token for ``host``; raises RateLimited instead of waiting too long."""
+        bucket = self._bucket(host, key)
+        if bucket is None:
+            return
+        if max_wait is _DEFAULT:
+            max_wait = self.max_wait.get(priority)
+        bucket.refill()
+        if not bucket.waiters and bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return
+
+        ahead = sum(1 for w in bucket.waiters if w[0] <= priority and not w[2].done())
+        wait = bucket.wait_for(ahead)
+        # only callers served before this one count: background work never fills an interactive queue
+        if ahead >= bucket.max_queue:
+            self.rejected += 1
+            raise RateLimited(host, wait, "queue full")
+        if max_wait is not None and wait > max_wait:
+            self.rejected += 1
+            raise RateLimited(host, wait)
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(bucket.waiters, (priority, next(self._seq), fut))
+        bucket.queued += 1
+        fut.add_done_callback(bucket.dequeued)
+        if bucket.pump is None or bucket.pump.done():
+            bucket.pump = asyncio.ensure_future(self._pump(bucket))
+        # a cancelled caller cancels its future; the pump skips it
+        await fut
+
+    async def _pump(self, bucket: _Bucket):
+        while bucket.waiters:
+            bucket.refill()
+            if bucket.tokens < 1:
+                await asyncio.sleep(bucket.wait_for(0))
+                continue
+            _, _, fut = heapq.heappop(bucket.waiters)
+            if fut.done():
+                continue
+            bucket.tokens -= 1
+            fut.set_result(None)
+
+    def penalize(self, host: str, key: Optional[str], seconds: float):
+        """The upstream said to back off (429 / Retry-After): hold the bucket empty for ``seconds``."""
+        bucket = self._bucket(host, key)
+        if bucket is not None:
+            bucket.refill()
+            bucket.tokens = min(bucket.tokens, -seconds * bucket.rate)
+
+    def stats(self) -> Dict:
+        out = {}
+        for (host, key), b in self._buckets.items():
+            b.refill()
+            name = host if key is None else f"{host}#{key}"
+            out[name] = {"rate": b.rate, "burst": b.burst, "tokens": round(b.tokens, 2),
+                         "queued": b.queued}
+        return {"buckets": out, "rejected": self.rejected}
+
+
+def key_id(api_key: Optional[str]) -> Optional[str]:
+    # buckets are per key, but keys never show up in stats or logs
+    return hashlib.sha1(api_key.encode()).hexdigest()[:8] if api_key else None
@@ -0,0 +1,177 @@
+"""
+Incremental time-series cache for api_llm/main.py.
+
+Range payloads used to be cached as one blob per (cell, start, end), so a
+request that overlapped a cached range by all but a week still downloaded the
+whole range. SeriesCache stores one row per (source, grid cell, variable,
+time slot) instead:
+
+  - ``ensure()`` finds the days of a request that lack a live value for any
+    requested variable, merges them into contiguous ranges, fetches only
+    those ranges, and assembles the answer from stored slots
+  - every slot carries its own expiry, so settled observations can live for
+    weeks (SERIES_PAST_TTL) while forecast hours and not-yet-final values
+    expire with the caller's short TTL
+
+Slot keys are the source's own time labels (NASA POWER "YYYYMMDDHH",
+Open-Meteo "YYYY-MM-DDTHH:MM"), which sort chronologically as strings. The
+last upstream metadata (units, header, elevation, ...) is kept per cell so a
+response assembled purely from stored slots still has the upstream's shape.
+"""
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import weakref
+import threading
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_SERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "series.sqlite3")
+
+# Lifetime of slots old enough that the upstream will not revise them
+PAST_TTL = float(os.getenv("SERIES_PAST_TTL", str(30 * 86400)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    source TEXT NOT NULL,
+    cell TEXT NOT NULL,
+    variable TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    value,                           -- no affinity: ints stay ints
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (source, cell, variable, slot)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS slots_expiry ON slots (expires_at);
+CREATE TABLE IF NOT EXISTS meta (
+    source TEXT NOT NULL,
+    cell TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (source, cell)
+);
+"""
+
+Series = Dict[str, Dict[str, Any]]   # variable -> {slot: value}
+
+
+def merge_days(days: List[date]) -> List[Tuple[date, date]]:
+    """Sorted days -> contiguous (first, last) ranges."""
+    ranges: List[Tuple[date, date]] = []
+    for d in sorted(days):
+        if ranges and (d - ranges[-1][1]).days <= 1:
+            ranges[-1] = (ranges[-1][0], d)
+        else:
+            ranges.append((d, d))
+    return ranges
+
+
+class SeriesCache:
+    def __init__(self, path: str = DEFAULT_SERIES_PATH):
+        self.path = path
+        self._local = threading.local()
+        # per-cell fetch locks, dropped once no request holds or awaits them
+        self._locks: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.hits = 0      # days answered from stored slots
+        self.misses = 0    # days fetched
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # ---------- storage (blocking; called through asyncio.to_thread) ----------
+
+    def live_slots(self, source: str, cell: str, variables: List[str], first: str, last: str,
+                   fresh_for: float = 0.0) -> set:
+        """Slots in [first, last] holding a value for every variable that is live for ``fresh_for`` more seconds."""
+        marks = ",".join("?" * len(variables))
+        rows = self._conn().execute(
+            f"SELECT slot FROM slots WHERE source = ? AND cell = ? AND variable IN ({marks})"
+            " AND slot BETWEEN ? AND ? AND expires_at > ? GROUP BY slot HAVING COUNT(*) = ?",
+            (source, cell, *variables, first, last, time.time() + fresh_for, len(variables)),
+        )
+        return {r[0] for r in rows}
+
+    def put(self, source: str, cell: str, series: Series, expires_at: Callable[[str, Any], float]):
+        rows = [(source, cell, var, slot, value, expires_at(slot, value))
+                for var, values in series.items() for slot, value in values.items()]
+        if rows:
+            conn = self._conn()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany("INSERT OR REPLACE INTO slots VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def get(self, source: str, cell: str, variables: List[str], first: str, last: str) -> Series:
+        series: Series = {v: {} for v in variables}
+        marks = ",".join("?" * len(variables))
+        for var, slot, value in self._conn().execute(
+            f"SELECT variable, slot, value FROM slots WHERE source = ? AND cell = ? AND variable IN ({marks})"
+            " AND slot BETWEEN ? AND ? ORDER BY slot",
+            (source, cell, *variables, first, last),
+        ):
+            series[var][slot] = value
+        return series
+
+    def put_meta(self, source: str, cell: str, meta: Dict):
+        self._conn().execute("INSERT OR REPLACE INTO meta VALUES (?, ?, ?)", (source, cell, json.dumps(meta)))
+
+    def get_meta(self, source: str, cell: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT value FROM meta WHERE source = ? AND cell = ?", (source, cell)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def purge_expired(self, grace: float = 0.0) -> int:
+        cur = self._conn().execute("DELETE FROM slots WHERE expires_at < ?", (time.time() - grace,))
+        return cur.rowcount
+
+    def stats(self) -> Dict:
+        return {
+            "slots": self._conn().execute("SELECT COUNT(*) FROM slots").fetchone()[0],
+            "day_hits": self.hits,
+            "day_misses": self.misses,
+        }
+
+    # ---------- incremental fetch ----------
+
+    async def ensure(self, source: str, cell: str, variables: List[str], days: List[date],
+                     slots_for: Callable[[date], List[str]],
+                     fetch: Callable[[date, date], Awaitable[Tuple[Series, Dict]]],
+                     expires_at: Callable[[str, Any], float],
+                     fresh_for: float = 0.0) -> Tuple[Series, Optional[Dict]]:
+        """
+        Series for ``days`` (and the cell's metadata), fetching only days that
+        lack a live slot. ``fetch(first, last)`` downloads one contiguous range
+        and returns (series, metadata). Slots the upstream did not return are
+        stored as None, so they are not asked for again until they expire.
+        ``fresh_for`` > 0 (a cache warm-up) also refetches slots that expire
+        within that many seconds.
+        """
+        first, last = slots_for(days[0])[0], slots_for(days[-1])[-1]
+        # one fetcher per cell at a time; a waiting request then sees the filled slots
+        lock = self._locks.get((source, cell))
+        if lock is None:
+            lock = self._locks[(source, cell)] = asyncio.Lock()
+        async with lock:
+            live = await asyncio.to_thread(self.live_slots, source, cell, variables, first, last, fresh_for)
+            missing = [d for d in days if not all(s in live for s in slots_for(d))]
+            self.hits += len(days) - len(missing)
+            self.misses += len(missing)
+            for lo, hi in merge_days(missing):
+                series, meta = await fetch(lo, hi)
+                expected = [s for i in range((hi - lo).days + 1)
+                            for s in slots_for(date.fromordinal(lo.toordinal() + i))]
+                filled = {v: {s: (series.get(v) or {}).get(s) for s in expected} for v in variables}
+                await asyncio.to_thread(self.put, source, cell, filled, expires_at)
+                if meta:
+                    await asyncio.to_thread(self.put_meta, source, cell, meta)
+        series = await asyncio.to_thread(self.get, source, cell, variables, first, last)
+        return series, await asyncio.to_thread(self.get_meta, source, cell)
@@ -0,0 +1,151 @@
+"""
+Offline SoilGrids backend for myPoint.py.
+
+The ISRIC REST API answers one point per call and is heavily rate limited,
+which rules out statewide soil maps. SoilRaster reads pre-downloaded
+SoilGrids GeoTIFF / COG tiles (or GDAL VRTs over them) instead, laid out as
+ISRIC publishes them:
+
+    <root>/<property>/<property>_<depth>_<stat>*.tif     e.g. phh2o/phh2o_0-5cm_mean.tif
+
+with any number of tiles per layer (e.g. one per state). Stats are the
+REST API's: mean, Q0.5, Q0.05, Q0.95; missing files are simply absent from
+the answer.
+
+Reads go through rasterio with GTIFF_VIRTUAL_MEM_IO, so uncompressed tiles
+are memory-mapped rather than copied. Compressed COGs decode one internal
+block at a time. Points are grouped by block and each block is read once
+for all the points in it. ``sample()`` returns the REST API's JSON shape
+(raw integer values, unscaled), so the caller's existing scale and
+statistic-fallback logic applies unchanged. A point that no tile covers gets
+None, and the caller can fall back to the REST API.
+
+Needs rasterio (imported on first use).
+"""
+import os
+import glob
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+STATS = ("mean", "Q0.5", "Q0.05", "Q0.95")
+_EXTENSIONS = (".tif", ".tiff", ".vrt")
+
+# GDAL settings for every read: memory-map uncompressed GeoTIFFs, bounded block cache
+_GDAL_ENV = {
+    "GTIFF_VIRTUAL_MEM_IO": "IF_ENOUGH_RAM",
+    "GDAL_CACHEMAX": int(os.getenv("SOILGRIDS_RASTER_CACHE_MB", "256")),
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+}
+
+
+class SoilRaster:
+    def __init__(self, root: str, stats: Sequence[str] = STATS):
+        self.root = root
+        self.stat_names = tuple(stats)
+        self._lock = threading.Lock()              # GDAL dataset handles are not thread-safe
+        self._files: Dict[Tuple[str, str, str], List[str]] = {}
+        self._datasets: Dict[str, Tuple[object, bool]] = {}   # path -> (dataset, needs reprojection)
+        self.block_reads = 0
+        self.points_sampled = 0
+
+    def available(self) -> bool:
+        return os.path.isdir(self.root)
+
+    def layer_files(self, prop: str, depth: str, stat: str) -> List[str]:
+        key = (prop, depth, stat)
+        if key not in self._files:
+            pattern = os.path.join(self.root, prop, f"{prop}_{depth}_{stat}*")
+            self._files[key] = sorted(p for p in glob.glob(pattern) if p.lower().endswith(_EXTENSIONS))
+        return self._files[key]
+
+    def _open(self, path: str):
+        if path not in self._datasets:
+            import rasterio
+            ds = rasterio.open(path)
+            # ISRIC publishes Homolosine; tiles warped to WGS84 need no transform
+            self._datasets[path] = (ds, ds.crs is not None and ds.crs.to_epsg() != 4326)
+        return self._datasets[path]
+
+    def _read_points(self, path: str, lons, lats):
+        """Raw values at each (lon, lat) from one file: None where nodata, False where outside it."""
+        from rasterio.warp import transform
+        from rasterio.transform import rowcol
+        from rasterio.windows import Window
+
+        ds, reproject = self._open(path)
+        xs, ys = transform("EPSG:4326", ds.crs, lons, lats) if reproject else (lons, lats)
+        rows, cols = (np.asarray(a) for a in rowcol(ds.transform, xs, ys))
+        out: List[object] = [False] * len(lons)
+        inside = (rows >= 0) & (rows < ds.height) & (cols >= 0) & (cols < ds.width)
+        if not inside.any():
+            return out
+        bh, bw = ds.block_shapes[0]
+        nodata = ds.nodata
+        idx = np.flatnonzero(inside)
+        blocks: Dict[Tuple[int, int], List[int]] = {}
+        for i, br, bc in zip(idx.tolist(), (rows[idx] // bh).tolist(), (cols[idx] // bw).tolist()):
+            blocks.setdefault((br, bc), []).append(i)
+        for (br, bc), members in blocks.items():
+            r0, c0 = br * bh, bc * bw
+            window = Window(c0, r0, min(bw, ds.width - c0), min(bh, ds.height - r0))
+            block = ds.read(1, window=window)
+            self.block_reads += 1
+            vals = block[rows[members] - r0, cols[members] - c0].tolist()
+            for i, v in zip(members, vals):
+                out[i] = None if nodata is not None and v == nodata else v
+        return out
+
+    def sample(self, points: List[Tuple[float, float]], props: List[str], depths: List[str]) -> List[Optional[Dict]]:
+        """
+        REST-shaped SoilGrids JSON for each (lat, lon), or None for points
+        outside every tile. Blocking; call through asyncio.to_thread.
+        """
+        lats = [p[0] for p in points]
+        lons = [p[1] for p in points]
+        values: Dict[Tuple[str, str], List[Dict]] = {}
+        covered = [False] * len(points)
+        import rasterio
+        with self._lock, rasterio.Env(**_GDAL_ENV):
+            for prop in props:
+                for depth in depths:
+                    bags = [{} for _ in points]
+                    for stat in self.stat_names:
+                        got: List[object] = [False] * len(points)
+                        for path in self.layer_files(prop, depth, stat):
+                            todo = [i for i, v in enumerate(got) if v is False]
+                            if not todo:
+                                break
+                            found = self._read_points(path, [lons[i] for i in todo], [lats[i] for i in todo])
+                            for i, v in zip(todo, found):
+                                got[i] = v
+                        for i, v in enumerate(got):
+                            if v is not False:
+                                bags[i][stat] = v
+                                covered[i] = True
+                    values[(prop, depth)] = bags
+            self.points_sampled += len(points)
+
+        out: List[Optional[Dict]] = []
+        for i in range(len(points)):
+            if not covered[i]:
+                out.append(None)
+                continue
+            layers = [{"name": prop,
+                       "depths": [{"label": depth, "values": values[(prop, depth)][i]} for depth in depths]}
+                      for prop in props]
+            out.append({"type": "Feature",
+                        "geometry": {"type": "Point", "coordinates": [lons[i], lats[i]]},
+                        "properties": {"layers": layers}})
+        return out
+
+    def stats(self) -> Dict:
+        return {"root": self.root, "open_files": len(self._datasets),
+                "block_reads": self.block_reads, "points_sampled": self.points_sampled}
+
+    def close(self):
+        with self._lock:
+            for ds, _ in self._datasets.values():
+                ds.close()
+            self._datasets.clear()
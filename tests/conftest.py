@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+# The apps open their caches and stores at import time: point them at a
+# scratch directory and keep background jobs off before any test imports them.
+_scratch = tempfile.mkdtemp(prefix="agri-tests-")
+for name, value in {
+    "AGRI_CACHE_PATH": os.path.join(_scratch, "cache.sqlite3"),
+    "AGRI_PRICE_DB": os.path.join(_scratch, "prices.sqlite3"),
+    "AGRI_SERIES_PATH": os.path.join(_scratch, "series.sqlite3"),
+    "METEOSTAT_DATA_DIR": os.path.join(_scratch, "meteostat"),
+    "PRICE_SYNC_STATES": "",
+    "PREFETCH_ENABLED": "0",
+    "LAZY_IMPORT_WARMUP": "0",
+}.items():
+    os.environ.setdefault(name, value)
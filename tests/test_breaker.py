@@ -0,0 +1,75 @@
+import pytest
+
+import breaker
+from breaker import CLOSED, HALF_OPEN, OPEN, Breakers, CircuitBreaker, CircuitOpen
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(breaker.time, "monotonic", c)
+    return c
+
+
+def call(b, healthy):
+    b.before_call()
+    b.after_call(healthy, None if healthy else "HTTP 503")
+
+
+def test_opens_after_consecutive_failures(clock):
+    b = CircuitBreaker("h", failures=3, reset_timeout=30, probes=1)
+    call(b, False)
+    call(b, False)
+    call(b, True)                       # a success resets the count
+    assert b.state == CLOSED and b.failures == 0
+    for _ in range(3):
+        call(b, False)
+    assert b.state == OPEN and b.opens == 1 and b.last_error == "HTTP 503"
+    clock.now += 10
+    with pytest.raises(CircuitOpen) as exc:
+        b.before_call()
+    assert exc.value.retry_after == pytest.approx(20)
+    assert exc.value.retry_after_header == "20"
+
+
+def test_half_open_probe_closes_or_reopens(clock):
+    b = CircuitBreaker("h", failures=1, reset_timeout=30, probes=1)
+    call(b, False)
+    clock.now += 30
+    b.before_call()                     # the probe goes through
+    assert b.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):    # only one probe at a time
+        b.before_call()
+    b.after_call(False, "timeout")
+    assert b.state == OPEN and b.opens == 2
+    clock.now += 30
+    call(b, True)
+    assert b.state == CLOSED and b.snapshot()["retry_after"] == 0
+
+
+def test_no_verdict_frees_the_probe(clock):
+    b = CircuitBreaker("h", failures=1, reset_timeout=5, probes=1)
+    call(b, False)
+    clock.now += 5
+    b.before_call()
+    b.after_call(None)                  # cancelled: neither success nor failure
+    assert b.state == HALF_OPEN
+    b.before_call()                     # another probe may go
+    b.after_call(True)
+    assert b.state == CLOSED
+
+
+def test_breakers_per_host_config():
+    bs = Breakers({"slow.example": {"failures": 2}})
+    assert bs.get("slow.example").failure_threshold == 2
+    assert bs.get("other.example").failure_threshold == breaker.DEFAULTS["failures"]
+    assert bs.get("other.example") is bs.get("other.example")
+    assert list(bs.status()) == ["other.example", "slow.example"]
@@ -0,0 +1,68 @@
+"""myPoint._cached: the shared-cache read-through in front of every upstream call."""
+import asyncio
+import itertools
+
+import pytest
+
+import myPoint
+from myPoint import _cached
+
+_keys = itertools.count()
+
+
+class Upstream:
+    def __init__(self, value="payload", error=None, delay=0.05):
+        self.calls = 0
+        self.value, self.error, self.delay = value, error, delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.value
+
+
+def _key():
+    return f"test:cached:{next(_keys)}"
+
+
+def test_concurrent_misses_share_one_fetch():
+    up, key = Upstream(), _key()
+
+    async def main():
+        got = await asyncio.gather(*[_cached(key, 60, up) for _ in range(8)])
+        assert got == ["payload"] * 8
+        assert await _cached(key, 60, up) == "payload"   # now from the shared cache
+
+    asyncio.run(main())
+    assert up.calls == 1
+    assert key not in myPoint._inflight
+
+
+def test_concurrent_misses_share_the_error():
+    up, key = Upstream(error=RuntimeError("upstream down")), _key()
+
+    async def main():
+        return await asyncio.gather(*[_cached(key, 60, up) for _ in range(4)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert up.calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert key not in myPoint._inflight
+
+
+def test_cancelled_waiter_does_not_cancel_the_fetch():
+    up, key = Upstream(), _key()
+
+    async def main():
+        first = asyncio.ensure_future(_cached(key, 60, up))
+        second = asyncio.ensure_future(_cached(key, 60, up))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "payload"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+    assert up.calls == 1
@@ -0,0 +1,115 @@
+import os
+import math
+
+import numpy as np
+import pytest
+
+import build_gazetteer
+import geocoder
+from geocoder import Gazetteer, _KDTree, _haversine_km, _unit_xyz
+from textsim import edit_ratio, trigrams
+
+CSV = """name,lat,lon,type,district,state,pincode,importance,alt_names
+Thrissur,10.5276,76.2144,city,Thrissur,Kerala,680001,0.78,Trichur
+Kozhikode,11.2588,75.7804,city,Kozhikode,Kerala,673001,0.8,Calicut
+Kakkanad,10.0159,76.3419,town,Ernakulam,Kerala,682030,0.55,
+Ernakulam Market,9.9780,76.2800,market,Ernakulam,Kerala,682018,0.4,
+"""
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    path = tmp_path / "gazetteer.csv"
+    path.write_text(CSV)
+    return Gazetteer(str(path), check_interval=0)
+
+
+def test_edit_ratio_and_trigrams():
+    assert edit_ratio("kozhikode", "kozhikode") == 1.0
+    assert edit_ratio("", "x") == 0.0
+    assert edit_ratio("kitten", "sitting") == pytest.approx(1 - 3 / 7)
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+
+
+def test_kdtree_matches_brute_force():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(8, 13, 2000)
+    lon = rng.uniform(74, 78, 2000)
+    pts = _unit_xyz(lat, lon)
+    tree = _KDTree(pts)
+    for q_lat, q_lon in zip(rng.uniform(7, 14, 200), rng.uniform(73, 79, 200)):
+        q = _unit_xyz(np.array(q_lat), np.array(q_lon))
+        i, d = tree.nearest(q)
+        brute = ((pts - q) ** 2).sum(axis=1)
+        assert i == int(brute.argmin())
+        assert d == pytest.approx(brute.min())
+
+
+def test_kdtree_tiny_inputs():
+    assert _KDTree(np.zeros((0, 3))).nearest([1, 0, 0]) == (-1, math.inf)
+    assert _KDTree(np.array([[1.0, 0, 0]])).nearest([0, 1, 0])[0] == 0
+
+
+def test_haversine():
+    # Thrissur to Kozhikode, about 94 km as the crow flies
+    assert _haversine_km(10.5276, 76.2144, 11.2588, 75.7804) == pytest.approx(94.1, abs=0.5)
+    assert _haversine_km(10.0, 76.0, 10.0, 76.0) == 0
+
+
+def test_search_exact_alias_prefix_and_fuzzy(gazetteer):
+    assert gazetteer.search("Thrissur")[0]["address"]["postcode"] == "680001"
+    assert gazetteer.search("calicut")[0]["display_name"].startswith("Kozhikode")
+    assert gazetteer.search("kakkan")[0]["lat"] == 10.0159
+    assert gazetteer.search("Kozhikkode")[0]["address"]["city"] == "Kozhikode"
+    assert gazetteer.search("ernakulam market")[0]["class"] == "amenity"
+    assert gazetteer.search("Mumbai") == []
+
+
+def test_reverse_respects_zoom_distance(gazetteer):
+    near = gazetteer.reverse(10.53, 76.21, zoom=16)
+    assert near["address"]["city"] == "Thrissur"
+    # ~20 km from Thrissur: too far for a street-level answer, fine at district zoom
+    assert gazetteer.reverse(10.7, 76.25, zoom=16) is None
+    assert gazetteer.reverse(10.7, 76.25, zoom=8)["address"]["city"] == "Thrissur"
+
+
+def test_reverse_snaps_within_snap_km(gazetteer):
+    # ~20 km from Thrissur: snapped at district precision, and marked so
+    snapped = gazetteer.reverse(10.7, 76.25, zoom=16, snap_km=30)
+    assert snapped["address"]["state_district"] == "Thrissur"
+    assert snapped["approximate"] is True
+    assert snapped["distance_km"] == pytest.approx(19.3, abs=0.5)
+    assert "approximate" not in gazetteer.reverse(10.53, 76.21, zoom=16, snap_km=30)
+    # the Arabian Sea is beyond any snap
+    assert gazetteer.reverse(10.5, 74.0, zoom=16, snap_km=30) is None
+
+
+def test_missing_file_is_empty(tmp_path):
+    g = Gazetteer(str(tmp_path / "none.csv"))
+    assert len(g) == 0 and g.search("Thrissur") == [] and g.reverse(10.5, 76.2) is None
+
+
+def test_bundled_extract_loads():
+    g = Gazetteer(os.path.join(geocoder._HERE, "gazetteer_kerala.csv"))
+    assert len(g) >= 14
+    assert g.search("Trivandrum")[0]["address"]["state_district"] == "Thiruvananthapuram"
+
+
+def test_build_from_geonames_rows():
+    admin1 = b"IN.13\tKerala\tKerala\t1267254\nIN.25\tTamil Nadu\tTamil Nadu\t1255053\n"
+    admin2 = b"IN.13.1\tThrissur\tThrissur\t1\nIN.13.2\tErnakulam\tErnakulam\t2\n"
+    dump = "\n".join("\t".join(r) for r in [
+        ["1", "Thrissur", "Thrissur", "Trichur,തൃശൂർ", "10.5276", "76.2144", "P", "PPLA2",
+         "IN", "", "13", "1", "", "", "315596", "", "", "", ""],
+        ["2", "Periyar", "Periyar", "", "10.1", "76.3", "H", "STM", "IN", "", "13", "2", "", "", "0", "", "", "", ""],
+        ["3", "Chennai", "Chennai", "", "13.08", "80.27", "P", "PPLA", "IN", "", "25", "", "", "", "1", "", "", "", ""],
+    ]).encode()
+    postal = "\n".join("\t".join(r) for r in [
+        ["IN", "680001", "Thrissur H.O", "Kerala", "13", "Thrissur", "", "", "", "10.52", "76.21", "4"],
+        ["IN", "682021", "Thrikkakara B.O", "Kerala", "13", "Ernakulam", "", "", "", "10.03", "76.33", "4"],
+    ]).encode()
+    places = build_gazetteer.build(dump, postal, admin1, admin2, ["Kerala"])
+    assert [(p["name"], p["type"], p["pincode"]) for p in places] == [
+        ("Thrissur", "town", "680001"), ("Thrikkakara", "locality", "682021")]
+    assert places[0]["alt_names"] == "Trichur"
+    assert places[0]["district"] == "Thrissur"
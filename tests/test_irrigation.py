@@ -0,0 +1,106 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import irrigation
+from irrigation import (DEFAULT_AWC, ROOT_DEPTH_INITIAL, available_water, crop_curves, crop_name, schedules,
+                        water_balance)
+
+SOWN = date(2025, 6, 1)
+
+
+def test_crop_name_aliases():
+    assert crop_name("Paddy") == "rice"
+    assert crop_name("green-beans") == "green_bean"
+    assert crop_name("Tapioca") == "cassava"
+    assert crop_name("durian") is None and crop_name(None) is None
+
+
+# Saxton & Rawls (2006), Table 3 at 2.5% organic matter: (sand, clay) -> (theta_33, theta_1500)
+@pytest.mark.parametrize("sand, clay, fc, wp", [
+    (0.88, 0.05, 0.10, 0.05),     # sand
+    (0.40, 0.20, 0.28, 0.14),     # loam
+    (0.20, 0.15, 0.31, 0.11),     # silt loam
+    (0.25, 0.50, 0.42, 0.30),     # clay
+])
+def test_saxton_rawls_matches_published_table(sand, clay, fc, wp):
+    t33, t1500 = irrigation._saxton_rawls(sand, clay, 2.5)
+    assert t33 == pytest.approx(fc, abs=0.01)
+    assert t1500 == pytest.approx(wp, abs=0.01)
+
+
+def test_available_water_methods():
+    measured = {label: {"wv0033": 30.0, "wv1500": 15.0} for label in irrigation.AWC_DEPTHS}
+    assert available_water(measured) == (pytest.approx(0.15), "soilgrids_water_content")
+
+    # loam texture everywhere; 14.5 g/kg SOC is 2.5% organic matter
+    texture = {label: {"sand": 40.0, "clay": 20.0, "soc": 14.5} for label in irrigation.AWC_DEPTHS}
+    awc, method = available_water(texture)
+    assert method == "pedotransfer" and awc == pytest.approx(0.14, abs=0.01)
+
+    # thickness weighting: 0-5 cm (50 mm) measured, 60-100 cm (400 mm) from texture
+    mixed = {"0-5cm": {"wv0033": 40.0, "wv1500": 10.0}, "60-100cm": texture["0-5cm"]}
+    awc, method = available_water(mixed)
+    assert method == "pedotransfer+soilgrids_water_content"
+    assert awc == pytest.approx((0.30 * 50 + available_water(texture)[0] * 400) / 450)
+
+    assert available_water({}) == (DEFAULT_AWC, "default")
+
+
+def test_crop_curves_follow_fao_stages():
+    # rice: stages 30/30/60/30 days, Kc 1.05 / 1.20 / 0.90, roots to 0.5 m
+    days = [SOWN + timedelta(days=d) for d in (-1, 0, 45, 60, 120, 135, 150, 151)]
+    kc, root, stage = crop_curves(["rice"], [SOWN], days)
+    assert stage[0].tolist() == [-1, 0, 1, 2, 3, 3, 4, 4]
+    assert kc[0].tolist() == pytest.approx([0.0, 1.05, 1.125, 1.20, 1.20, 1.05, 0.0, 0.0])
+    assert root[0, 1] == pytest.approx(ROOT_DEPTH_INITIAL)
+    assert root[0, 3] == pytest.approx(0.5)
+
+
+def test_perennials_keep_mid_season_values():
+    kc, root, stage = crop_curves(["coconut"], [date(2000, 1, 1)], [SOWN])
+    assert (kc[0, 0], root[0, 0], stage[0, 0]) == (1.00, 1.0, 2)
+
+
+def test_water_balance_irrigates_when_depletion_passes_raw():
+    n = 10
+    et0 = np.full((1, n), 5.0)
+    rain = np.zeros((1, n))
+    kc = np.ones((1, n))
+    root = np.full((1, n), 0.5)
+    wb = water_balance(et0, rain, kc, root, np.array([0.15]), np.array([0.5]), np.array([0.0]))
+    # TAW = 0.15 * 0.5 m = 75 mm; ETc = 5 mm/day gives no eq. 84 adjustment, so RAW = 37.5 mm
+    assert wb["taw"][0, 0] == pytest.approx(75.0)
+    assert wb["raw"][0, 0] == pytest.approx(37.5)
+    # depletion 5, 10, ... 35, then 40 > RAW on day 8: irrigate 40 mm back to field capacity
+    assert wb["irrigation"][0].tolist() == [0, 0, 0, 0, 0, 0, 0, 40.0, 0, 0]
+    assert wb["depletion"][0].tolist() == [5, 10, 15, 20, 25, 30, 35, 0, 5, 10]
+
+
+def test_water_balance_rain_drains_and_low_etc_raises_raw():
+    et0 = np.array([[3.0, 3.0]])
+    rain = np.array([[50.0, np.nan]])           # missing rain counts as none
+    wb = water_balance(et0, rain, np.ones((1, 2)), np.full((1, 2), 0.5), np.array([0.15]),
+                       np.array([0.5]), np.array([20.0]))
+    # 40 mm effective rain refills the 20 mm deficit; the surplus drains away
+    assert wb["depletion"][0].tolist() == [0.0, 3.0]
+    # FAO-56 eq. 84: p = 0.5 + 0.04 * (5 - 3) = 0.58
+    assert wb["raw"][0, 0] == pytest.approx(0.58 * 75)
+
+
+def test_no_irrigation_outside_the_season():
+    days = [SOWN - timedelta(days=3) + timedelta(days=i) for i in range(3)]
+    out = schedules([{"crop": "rice", "sowing_date": SOWN, "depletion_mm": 60.0}], days,
+                    np.full((1, 3), 6.0), np.zeros((1, 3)), np.array([0.15]))
+    assert out[0]["total_irrigation_mm"] == 0 and out[0]["next_irrigation"] is None
+    assert {row["stage"] for row in out[0]["schedule"]} == {"before_sowing"}
+
+
+def test_schedules_report_next_irrigation():
+    days = [SOWN + timedelta(days=i) for i in range(5)]
+    out = schedules([{"crop": "banana", "sowing_date": SOWN - timedelta(days=200), "depletion_mm": 50.0}], days,
+                    np.full((1, 5), 5.0), np.zeros((1, 5)), np.array([0.12]))
+    assert out[0]["next_irrigation"] == days[0].isoformat()
+    assert out[0]["schedule"][0]["stage"] == "development"
+    assert out[0]["total_irrigation_mm"] > 0
@@ -0,0 +1,40 @@
+import json
+import asyncio
+
+import httpx
+
+import api_llm.main as main
+
+
+def _batch(points, handler):
+    async def run():
+        main.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as app:
+            try:
+                resp = await app.post("/api/weather/open-meteo/batch", json={"points": points})
+            finally:
+                await main.client.aclose()
+        assert resp.status_code == 200
+        return sorted((json.loads(line) for line in resp.text.splitlines()), key=lambda line: line["index"])
+
+    return asyncio.run(run())
+
+
+def _location(lat, lon):
+    return {"latitude": lat, "longitude": lon, "hourly": {"time": ["2025-06-01T00:00"], "temperature_2m": [27.5]}}
+
+
+def test_every_point_gets_a_line_when_upstream_answers_short():
+    def handler(request):
+        lats = request.url.params["latitude"].split(",")
+        lons = request.url.params["longitude"].split(",")
+        # one location fewer than asked for
+        return httpx.Response(200, json=[_location(float(a), float(o)) for a, o in zip(lats, lons)][:-1])
+
+    points = [{"latitude": 8.5 + i, "longitude": 76.9, "id": f"p{i}"} for i in range(3)]
+    lines = _batch(points, handler)
+
+    assert [line["id"] for line in lines] == ["p0", "p1", "p2"]
+    assert ["error" in line for line in lines] == [False, False, True]
+    assert lines[2]["error"] == "upstream returned 2 of 3 locations"
+    assert lines[2]["latitude"] == 10.5
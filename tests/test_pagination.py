@@ -0,0 +1,22 @@
+import pytest
+
+from myPoint import _decode_cursor, _encode_cursor
+
+
+@pytest.mark.parametrize("offset", [0, 1, 50, 10 ** 9])
+def test_cursor_round_trip(offset):
+    cursor = _encode_cursor(offset)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor) == offset
+
+
+@pytest.mark.parametrize("cursor,expected", [(None, 0), ("", 0)])
+def test_no_cursor_is_first_page(cursor, expected):
+    assert _decode_cursor(cursor) == expected
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", _encode_cursor(-1), _encode_cursor("5"),
+                                    _encode_cursor(1.5)])
+def test_foreign_cursors_are_rejected(cursor):
+    # "e30" is {} without its padding
+    assert _decode_cursor(cursor) is None
@@ -0,0 +1,126 @@
+import sys
+import json
+import asyncio
+import importlib.util
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import payloads
+from payloads import CompressionMiddleware, _qvalues, _vary, dumps, iter_json_array
+
+BODY = "mandi prices " * 200
+
+
+def _client(headers=None):
+    async def page(request):
+        return PlainTextResponse(BODY, headers=headers)
+
+    async def small(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/", page), Route("/small", small)])
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app)
+
+
+def test_gzip_and_single_vary_header():
+    resp = _client().get("/", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers.get_list("vary") == ["Accept-Encoding"]
+    assert resp.text == BODY
+
+
+def test_vary_merges_with_existing_values():
+    resp = _client({"Vary": "Origin"}).get("/", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers.get_list("vary") == ["Origin, Accept-Encoding"]
+
+
+def test_vary_helper():
+    assert _vary([(b"vary", b"Origin"), (b"Vary", b"Cookie, Origin")]) == b"Origin, Cookie, Accept-Encoding"
+    assert _vary([(b"vary", b"accept-encoding")]) == b"accept-encoding"
+    assert _vary([(b"vary", b"*")]) == b"*"
+    assert _vary([]) == b"Accept-Encoding"
+
+
+def test_small_and_unaccepted_bodies_pass_through():
+    client = _client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    resp = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers and resp.text == BODY
+
+
+def test_qvalues():
+    assert _qvalues("br;q=0, gzip") == {"br": 0.0, "gzip": 1.0}
+    assert _qvalues("gzip; q=0.5 ,*;q=0.1, x;q=bad") == {"gzip": 0.5, "*": 0.1, "x": 0.0}
+    assert _qvalues("") == {}
+
+
+@pytest.mark.parametrize("accept,expected", [
+    ("br;q=0, gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("gzip;q=1, br;q=0.5", "gzip"),
+    ("*", "br"),
+    ("*;q=0.5, br;q=0", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("identity", None),
+])
+def test_encoding_honours_qvalues(accept, expected):
+    resp = _client().get("/", headers={"Accept-Encoding": accept})
+    assert resp.headers.get("content-encoding") == expected
+
+
+def _json_fallback(monkeypatch):
+    # a second copy of the module, loaded as if orjson were not installed
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    spec = importlib.util.spec_from_file_location("payloads_without_orjson", payloads.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.orjson is None
+    return module
+
+
+def test_dumps_writes_non_finite_floats_as_null(monkeypatch):
+    np = pytest.importorskip("numpy")
+    doc = {"a": float("nan"), "b": [1.5, float("inf"), {"c": -float("inf")}], "d": np.float64("nan"), "e": "ok"}
+    expected = {"a": None, "b": [1.5, None, {"c": None}], "d": None, "e": "ok"}
+    for encode in (dumps, _json_fallback(monkeypatch).dumps):
+        assert json.loads(encode(doc)) == expected
+        assert b"NaN" not in encode(doc)
+
+
+DOC = {"count": 3, "records": [{"market": "Ernakulam", "price": 4200}, {"market": "Kochi – Vyttila", "price": 1e3},
+                               [1, {"nested": "]"}]], "note": "done"}
+
+
+def _items(blob: bytes, size: int, key="records", meta=None):
+    async def chunks():
+        for i in range(0, len(blob), size):
+            yield blob[i:i + size]
+
+    async def run():
+        return [item async for item in iter_json_array(chunks(), key, meta)]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 10_000])
+def test_iter_json_array_any_chunking(size):
+    # size 1 splits the multi-byte dash and the numbers across chunks
+    blob = json.dumps(DOC, ensure_ascii=False, indent=1).encode()
+    meta = {}
+    assert _items(blob, size, meta=meta) == DOC["records"]
+    assert meta == {"count": 3, "note": "done"}
+
+
+def test_iter_json_array_missing_or_empty_key():
+    assert _items(b'{"records": []}', 3) == []
+    assert _items(b'{"other": [1, 2]}', 3) == []
+
+
+def test_iter_json_array_truncated():
+    with pytest.raises(ValueError):
+        _items(b'{"records": [{"a": 1}, {"b"', 4)
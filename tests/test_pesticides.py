@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from pesticides import PesticideMatcher, normalize
+
+
+@pytest.fixture
+def matcher(tmp_path):
+    path = tmp_path / "banned.csv"
+    path.write_text("Pesticide_Name,Aliases\nEndosulfan,\nMethoxy Ethyl Mercury Chloride,MEMC\nPhorate,\n")
+    return PesticideMatcher(str(path), check_interval=0)
+
+
+def test_normalize_strips_strengths_formulations_and_spelling():
+    assert normalize("Endosulphan 35% EC") == "endosulfan"
+    assert normalize("Phorate 10 G") == "phorate"
+    assert normalize("Métoxy-Ethyl") == "metoxy ethyl"
+
+
+def test_exact_and_alias(matcher):
+    assert matcher.check("endosulfan")["match"]["match_type"] == "exact"
+    hit = matcher.check("Thiodan 35 EC")["match"]          # built-in trade-name alias
+    assert hit["name"] == "Endosulfan" and hit["matched_as"] == "thiodan"
+    assert matcher.check("MEMC")["match"]["name"] == "Methoxy Ethyl Mercury Chloride"
+
+
+def test_contains_prefers_longest_name(matcher):
+    hit = matcher.check("Super methoxy ethyl mercury chloride dust")["match"]
+    assert hit["match_type"] == "contains"
+    assert hit["name"] == "Methoxy Ethyl Mercury Chloride"
+
+
+def test_fuzzy_match_and_threshold(matcher):
+    hit = matcher.check("Endosulfen")["match"]
+    assert hit["match_type"] == "fuzzy" and hit["name"] == "Endosulfan"
+    assert 0.85 <= hit["score"] < 1
+    assert matcher.check("Imidacloprid") == {"status": "safe", "match": None}
+    assert matcher.check("") == {"status": "safe", "match": None}
+
+
+def test_reloads_when_file_changes(matcher):
+    assert matcher.check("Aldrin")["status"] == "safe"
+    with open(matcher.path, "a") as fh:
+        fh.write("Aldrin,\n")
+    st = os.stat(matcher.path)
+    os.utime(matcher.path, (st.st_atime, st.st_mtime + 10))
+    assert matcher.check("Aldrin")["status"] == "banned"
+    assert len(matcher) == 4
+
+
+def test_shipped_list_loads():
+    m = PesticideMatcher()
+    assert len(m) > 50
+    assert m.check("Endosulphan")["status"] == "banned"
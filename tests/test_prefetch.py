@@ -0,0 +1,38 @@
+import json
+
+import prefetch
+from prefetch import AccessLog, Prefetcher, normalize_target, summarize_target
+
+
+def test_normalize_target_sorts_and_drops_secrets():
+    assert normalize_target("/v1/weather", "lon=76.2&api-key=s3cret&lat=10.5") == "/v1/weather?lat=10.5&lon=76.2"
+    assert normalize_target("/v1/weather", "") == "/v1/weather"
+
+
+def test_access_log_ranks_by_decayed_count():
+    log = AccessLog(half_life=3600)
+    for target, n in (("/a", 3), ("/b", 5), ("/c", 1)):
+        for _ in range(n):
+            log.record(target)
+    assert [t for t, _ in log.top(2)] == ["/b", "/a"]
+
+
+def test_summarize_target_keeps_only_path_and_cell():
+    assert summarize_target("/v1/weather?lat=10.5234&lon=76.2141&days=3") == {
+        "path": "/v1/weather", "cell": "open_meteo@1005,2562"}
+    # nearby points share the cell
+    assert summarize_target("/api/weather/open-meteo?latitude=10.49&longitude=76.19")["cell"] == "open_meteo@1005,2562"
+    assert summarize_target("/marketInfo/prices?state=Kerala") == {"path": "/marketInfo/prices"}
+    assert summarize_target("/v1/weather?lat=x&lon=1") == {"path": "/v1/weather"}
+
+
+def test_stats_hide_coordinates_unless_asked(monkeypatch):
+    p = Prefetcher(app=None, include=("/v1/",))
+    p.record("/v1/weather", "lat=10.5234&lon=76.2141")
+    p.record("/v1/weather", "lat=10.5234&lon=76.2141")
+    learned = p.stats()["learned"]
+    assert learned == [{"path": "/v1/weather", "cell": "open_meteo@1005,2562", "score": 2.0}]
+    assert "10.5234" not in json.dumps(p.stats())
+
+    monkeypatch.setattr(prefetch, "SHOW_TARGETS", True)
+    assert p.stats()["learned"][0]["target"] == "/v1/weather?lat=10.5234&lon=76.2141"
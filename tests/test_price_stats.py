@@ -0,0 +1,35 @@
+import pytest
+from starlette.testclient import TestClient
+
+import myPoint
+from myPoint import _price_stats
+
+
+def _record(day, modal, variety="Local"):
+    return {"commodity": "Banana", "market": "Ernakulam", "variety": variety, "arrival_date": day,
+            "min_price": modal, "modal_price": modal, "max_price": modal}
+
+
+def test_stats_aggregate_before_rounding():
+    # ₹1.00/kg -> ₹1.004/kg is +0.4%; rounding each row to paise first would make it 0
+    (row,) = _price_stats([_record("01/06/2025", "100"), _record("02/06/2025", "100.4")], window=2)
+    assert row["series"]["dod_change_pct"] == [None, 0.4]
+    assert row["series"]["modal_price"] == [1.0, 1.0]
+    assert row["price_modal_mean_inr_per_kg"] == 1.0
+    assert row["series"]["rolling_mean"] == [1.0, 1.0]
+
+
+def test_stats_date_filter():
+    records = [_record("31/05/2025", "100"), _record("01/06/2025", "200"), _record("02/06/2025", "300")]
+    (row,) = _price_stats(records, 7, "2025-06-01", "2025-06-01")
+    assert row["series"]["date"] == ["2025-06-01"]
+    assert row["rows"] == 1
+
+
+@pytest.mark.parametrize("params", [{"date_from": "garbage"}, {"date_to": "01/06/2025"},
+                                    {"date_from": "2025-02-30"}])
+def test_invalid_dates_are_rejected(params):
+    client = TestClient(myPoint.app)
+    resp = client.get("/marketInfo/prices/stats", params={"state": "Kerala", "district": "Ernakulam", **params})
+    assert resp.status_code == 400
+    assert "YYYY-MM-DD" in resp.json()["error"]
@@ -0,0 +1,29 @@
+from price_store import PriceStore
+
+
+def _row(day, variety, grade, modal):
+    return {"state": "Kerala", "district": "Ernakulam", "market": "Ernakulam", "commodity": "Banana",
+            "variety": variety, "grade": grade, "arrival_date": day, "modal_price": modal}
+
+
+def test_pages_are_disjoint_and_complete(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.sqlite3"))
+    # inserted out of order: only variety/grade tell same-day rows apart
+    rows = [_row(f"{d:02d}/06/2025", v, g, 100 * d) for d in (2, 1) for g in ("FAQ", "Medium", "Large")
+            for v in ("Robusta", "Nendran", "Palayamthodan")]
+    assert store.upsert(rows) == 18
+
+    seen = []
+    for offset in range(0, 18, 4):
+        seen += [(r["arrival_iso"], r["variety"], r["grade"]) for r in store.query("Kerala", "Ernakulam",
+                                                                                    limit=4, offset=offset)]
+    assert len(seen) == len(set(seen)) == 18
+    assert seen[0] == ("2025-06-02", "Nendran", "FAQ")
+    assert seen == sorted(seen, key=lambda r: (-int(r[0].replace("-", "")), r[1], r[2]))
+
+
+def test_query_date_range(tmp_path):
+    store = PriceStore(str(tmp_path / "prices.sqlite3"))
+    store.upsert([_row(f"{d:02d}/06/2025", "Nendran", "FAQ", 100) for d in range(1, 6)])
+    got = store.query("kerala", "ERNAKULAM", date_from="2025-06-02", date_to="2025-06-04")
+    assert [r["arrival_iso"] for r in got] == ["2025-06-04", "2025-06-03", "2025-06-02"]
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from rate_limit import BACKGROUND, BATCH, INTERACTIVE, RateLimited, Scheduler
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_burst_then_queue_in_priority_order():
+    async def main():
+        sched = Scheduler({"h": {"rate": 50, "burst": 2}}, max_wait={INTERACTIVE: None, BATCH: None})
+        await sched.acquire("h")
+        await sched.acquire("h")                       # burst spent
+        order = []
+
+        async def call(name, priority):
+            await sched.acquire("h", priority=priority)
+            order.append(name)
+
+        await asyncio.gather(call("background", BACKGROUND), call("batch", BATCH), call("interactive", INTERACTIVE))
+        return order
+
+    assert run(main()) == ["interactive", "batch", "background"]
+
+
+def test_rejects_when_wait_exceeds_max_wait():
+    async def main():
+        sched = Scheduler({"h": {"rate": 0.1, "burst": 1}})
+        await sched.acquire("h")
+        with pytest.raises(RateLimited) as exc:
+            await sched.acquire("h", max_wait=1)
+        assert exc.value.retry_after > 1
+        assert sched.rejected == 1
+
+    run(main())
+
+
+def test_queue_full_ignores_cancelled_waiters():
+    async def main():
+        sched = Scheduler({"h": {"rate": 0.5, "burst": 1, "max_queue": 2}})
+        await sched.acquire("h")
+        # two callers time out while queued
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(sched.acquire("h", priority=BACKGROUND), 0.01)
+        assert sched.stats()["buckets"]["h"]["queued"] == 0
+        # the queue has room again: a new caller waits instead of being rejected
+        waiter = asyncio.ensure_future(sched.acquire("h", priority=BACKGROUND))
+        await asyncio.sleep(0)
+        assert sched.stats()["buckets"]["h"]["queued"] == 1
+        assert sched.rejected == 0
+        waiter.cancel()
+
+    run(main())
+
+
+def test_queue_full_rejects_live_waiters():
+    async def main():
+        sched = Scheduler({"h": {"rate": 0.5, "burst": 1, "max_queue": 1}})
+        await sched.acquire("h")
+        waiter = asyncio.ensure_future(sched.acquire("h", priority=BACKGROUND))
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimited, match="queue full"):
+            await sched.acquire("h", priority=BACKGROUND)
+        waiter.cancel()
+
+    run(main())
+
+
+def test_queue_full_counts_only_waiters_ahead():
+    async def main():
+        sched = Scheduler({"h": {"rate": 0.5, "burst": 1, "max_queue": 2}}, max_wait={INTERACTIVE: None})
+        await sched.acquire("h")
+        background = [asyncio.ensure_future(sched.acquire("h", priority=BACKGROUND)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimited, match="queue full"):
+            await sched.acquire("h", priority=BACKGROUND)
+        # a background backlog does not turn interactive callers away
+        interactive = asyncio.ensure_future(sched.acquire("h", priority=INTERACTIVE))
+        await asyncio.sleep(0)
+        assert sched.stats()["buckets"]["h"]["queued"] == 3
+        assert sched.rejected == 1
+        for w in background + [interactive]:
+            w.cancel()
+
+    run(main())
+
+
+def test_unlimited_host_and_per_key_buckets():
+    async def main():
+        sched = Scheduler({"h": {"rate": 0.1, "burst": 1}})
+        for _ in range(5):
+            await sched.acquire("other")
+        await sched.acquire("h", key="a")
+        await sched.acquire("h", key="b")               # separate bucket per API key
+        assert len(sched.stats()["buckets"]) == 2
+
+    run(main())
@@ -0,0 +1,70 @@
+"""A prefetch replay must refresh entries that expire within its horizon all the way to the upstream."""
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+
+import api_llm.main as main
+from prefetch import refresh_within
+
+
+class NasaPower:
+    """Stand-in for the NASA POWER hourly point API; counts the calls it gets."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        start = datetime.strptime(request.url.params["start"], "%Y%m%d")
+        end = datetime.strptime(request.url.params["end"], "%Y%m%d")
+        hours = [start + timedelta(hours=h) for h in range(int((end - start).days + 1) * 24)]
+        values = {f"{t:%Y%m%d%H}": float(self.calls) for t in hours}
+        return httpx.Response(200, json={"type": "Feature", "header": {}, "properties": {
+            "parameter": {p: dict(values) for p in main.NASA_POWER_PARAMETERS}}})
+
+
+def test_prefetch_replay_inside_horizon_reaches_upstream():
+    upstream = NasaPower()
+    # recent days are provisional, so their slots expire with the request's ttl
+    today = datetime.now(main.IST).date()
+    params = {"latitude": 10.52, "longitude": 76.21, "ttl": 600,
+              "start_date": f"{today - timedelta(days=2):%Y%m%d}", "end_date": f"{today:%Y%m%d}"}
+
+    app = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+    async def get():
+        resp = await app.get("/api/agro/nasa-power", params=params)
+        assert resp.status_code == 200, resp.text
+        return resp.json()
+
+    async def replay(horizon):
+        token = refresh_within.set(horizon)
+        try:
+            return await get()
+        finally:
+            refresh_within.reset(token)
+
+    async def run():
+        main.client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+        try:
+            first = await get()
+            await get()
+            assert upstream.calls == 1                 # plain hit
+
+            await replay(60)                           # 600 s of life left: nothing to refresh
+            assert upstream.calls == 1
+
+            refreshed = await replay(3600)             # everything expires within the horizon
+            assert upstream.calls == 2
+            t2m = refreshed["data"]["properties"]["parameter"]["T2M"]
+            assert set(t2m.values()) == {2.0}
+            assert set(first["data"]["properties"]["parameter"]["T2M"].values()) == {1.0}
+
+            assert (await get())["data"]["properties"]["parameter"]["T2M"] == t2m
+            assert upstream.calls == 2
+        finally:
+            await app.aclose()
+            await main.client.aclose()
+
+    asyncio.run(run())
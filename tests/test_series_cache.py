@@ -0,0 +1,98 @@
+import time
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from series_cache import SeriesCache, merge_days
+
+D0 = date(2025, 6, 1)
+
+
+def days(*offsets):
+    return [D0 + timedelta(days=o) for o in offsets]
+
+
+def slots_for(day):
+    return [f"{day:%Y%m%d}{h:02d}" for h in (0, 12)]
+
+
+class Upstream:
+    """Answers any range with value = hour of the slot; records the ranges asked for."""
+
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    async def __call__(self, first, last):
+        self.calls.append((first, last))
+        await asyncio.sleep(self.delay)
+        n = (last - first).days + 1
+        slots = [s for i in range(n) for s in slots_for(first + timedelta(days=i))]
+        return {"T2M": {s: int(s[-2:]) for s in slots}}, {"units": "C"}
+
+
+def expiry(ttl):
+    return lambda slot, value: time.time() + ttl
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SeriesCache(str(tmp_path / "series.sqlite3"))
+
+
+def test_merge_days():
+    assert merge_days([]) == []
+    assert merge_days(days(3, 0, 1, 5, 6)) == [(D0, D0 + timedelta(1)), (D0 + timedelta(3), D0 + timedelta(3)),
+                                               (D0 + timedelta(5), D0 + timedelta(6))]
+
+
+def test_fetches_only_missing_ranges(cache):
+    up = Upstream()
+
+    async def main():
+        await cache.ensure("nasa", "c1", ["T2M"], days(0, 1, 2), slots_for, up, expiry(60))
+        series, meta = await cache.ensure("nasa", "c1", ["T2M"], days(1, 2, 3, 4), slots_for, up, expiry(60))
+        return series, meta
+
+    series, meta = asyncio.run(main())
+    assert up.calls == [(D0, D0 + timedelta(2)), (D0 + timedelta(3), D0 + timedelta(4))]
+    assert len(series["T2M"]) == 8 and meta == {"units": "C"}
+    assert (cache.hits, cache.misses) == (2, 5)
+
+
+def test_expired_slots_are_fetched_again(cache):
+    up = Upstream()
+
+    async def main():
+        await cache.ensure("nasa", "c1", ["T2M"], days(0), slots_for, up, expiry(-1))
+        await cache.ensure("nasa", "c1", ["T2M"], days(0), slots_for, up, expiry(60))
+
+    asyncio.run(main())
+    assert len(up.calls) == 2
+
+
+def test_slots_expiring_within_fresh_for_are_fetched_again(cache):
+    up = Upstream()
+
+    async def main():
+        await cache.ensure("nasa", "c1", ["T2M"], days(0), slots_for, up, expiry(600))
+        await cache.ensure("nasa", "c1", ["T2M"], days(0), slots_for, up, expiry(600), 60)
+        assert len(up.calls) == 1
+        await cache.ensure("nasa", "c1", ["T2M"], days(0), slots_for, up, expiry(600), 3600)
+        assert len(up.calls) == 2
+
+    asyncio.run(main())
+
+
+def test_concurrent_requests_fetch_once_and_release_lock(cache):
+    up = Upstream(delay=0.05)
+
+    async def main():
+        await asyncio.gather(*(cache.ensure("nasa", "c1", ["T2M"], days(0, 1), slots_for, up, expiry(60))
+                               for _ in range(5)))
+
+    asyncio.run(main())
+    assert len(up.calls) == 1
+    # locks live only while a request holds or awaits them
+    assert len(cache._locks) == 0
@@ -0,0 +1,201 @@
+"""api_llm's SimpleTTLCache: coalescing, stale-while-revalidate, bounds and the shared backend."""
+import time
+import asyncio
+
+import pytest
+
+from api_llm.main import SimpleTTLCache, _approx_size
+from cache_backend import CacheBackend
+from payloads import dumps
+from prefetch import refresh_within
+
+
+class Upstream:
+    def __init__(self, value="v", error=None, delay=0.02):
+        self.calls = 0
+        self.value, self.error, self.delay = value, error, delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"{self.value}{self.calls}"
+
+
+class DictBackend(CacheBackend):
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        hit = self.data.get(key)
+        return hit if hit is not None and hit[1] > time.time() else None
+
+    def set(self, key, value, ttl):
+        self.data[key] = (value, time.time() + ttl)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_misses_share_one_fetch_and_count_as_coalesced():
+    async def main():
+        cache, up = SimpleTTLCache(), Upstream()
+        got = await asyncio.gather(*[cache.get_or_set("k", 60, up) for _ in range(5)])
+        assert got == ["v1"] * 5
+        assert await cache.get_or_set("k", 60, up) == "v1"
+        return cache, up
+
+    cache, up = run(main())
+    assert up.calls == 1
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"], stats["inflight"]) == (1, 4, 1, 0)
+
+
+def test_concurrent_misses_share_the_error_and_nothing_is_stored():
+    async def main():
+        cache, up = SimpleTTLCache(), Upstream(error=RuntimeError("down"))
+        results = await asyncio.gather(*[cache.get_or_set("k", 60, up) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.stats()["entries"] == 0
+        up.error = None
+        assert await cache.get_or_set("k", 60, up) == "v2"   # the next caller tries again
+        return up
+
+    assert run(main()).calls == 2
+
+
+def test_cancelled_waiter_does_not_cancel_the_fetch():
+    async def main():
+        cache, up = SimpleTTLCache(), Upstream(delay=0.05)
+        first = asyncio.ensure_future(cache.get_or_set("k", 60, up))
+        second = asyncio.ensure_future(cache.get_or_set("k", 60, up))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "v1"
+        return up
+
+    assert run(main()).calls == 1
+
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    async def main():
+        cache, up = SimpleTTLCache(), Upstream()
+        assert await cache.get_or_set("k", 0, up, stale_ttl=60) == "v1"   # expires at once
+        got = await asyncio.gather(*[cache.get_or_set("k", 0, up, stale_ttl=60) for _ in range(3)])
+        assert got == ["v1"] * 3                                            # no caller waits
+        assert cache.stats()["inflight"] == 1
+        await asyncio.sleep(0.05)
+        assert cache._store["k"]["value"] == "v2"
+        return cache, up
+
+    cache, up = run(main())
+    assert up.calls == 2
+    assert cache.stats()["stale_hits"] == 3
+
+
+def test_past_the_stale_window_callers_wait_for_the_fetch():
+    async def main():
+        cache, up = SimpleTTLCache(), Upstream()
+        await cache.get_or_set("k", 0, up, stale_ttl=0)
+        assert await cache.get_or_set("k", 0, up, stale_ttl=0) == "v2"
+
+    run(main())
+
+
+def test_refresh_ahead_treats_entries_expiring_within_the_horizon_as_misses():
+    async def main():
+        cache, up = SimpleTTLCache(), Upstream()
+        await cache.get_or_set("k", 600, up)
+        token = refresh_within.set(60)
+        assert await cache.get_or_set("k", 600, up) == "v1"
+        refresh_within.reset(token)
+        token = refresh_within.set(3600)
+        assert await cache.get_or_set("k", 600, up) == "v2"
+        refresh_within.reset(token)
+
+    run(main())
+
+
+def test_lru_eviction_by_entry_count():
+    async def main():
+        cache, up = SimpleTTLCache(max_entries=2), Upstream(delay=0)
+        for key in ("a", "b"):
+            await cache.get_or_set(key, 60, up)
+        await cache.get_or_set("a", 60, up)            # a is now the most recently used
+        await cache.get_or_set("c", 60, up)
+        return cache
+
+    cache = run(main())
+    assert list(cache._store) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_and_skips_oversized_values():
+    value = "x" * 100
+    size = _approx_size(value)
+
+    async def main():
+        cache = SimpleTTLCache(max_bytes=size * 2)
+        for key in ("a", "b", "c"):
+            await cache.set(key, value, 60)
+        assert list(cache._store) == ["b", "c"]
+        assert cache.stats()["bytes"] == size * 2
+        await cache.set("huge", "y" * 1000, 60)       # over the whole budget: served, not kept
+        assert "huge" not in cache._store and list(cache._store) == ["b", "c"]
+
+    run(main())
+
+
+def test_sweep_drops_entries_past_their_stale_window():
+    async def main():
+        cache, up = SimpleTTLCache(), Upstream(delay=0)
+        await cache.get_or_set("gone", 0, up, stale_ttl=0)
+        await cache.get_or_set("stale", 0, up, stale_ttl=60)
+        await cache.get_or_set("fresh", 60, up)
+        assert await cache.sweep() == 1
+        return cache
+
+    cache = run(main())
+    assert sorted(cache._store) == ["fresh", "stale"]
+    assert cache.stats()["expired"] == 1 and cache.stats()["bytes"] > 0
+
+
+def test_shared_backend_is_read_through_and_written_back():
+    backend = DictBackend()
+    backend.set("k", "from-backend", 60)
+
+    async def main():
+        cache, up = SimpleTTLCache(backend=backend), Upstream()
+        assert await cache.get_or_set("k", 60, up) == "from-backend"
+        assert await cache.get_or_set("other", 60, up) == "v1"
+        return cache, up
+
+    cache, up = run(main())
+    assert up.calls == 1
+    assert cache.stats()["shared_hits"] == 1
+    assert backend.data["other"][0] == "v1"
+    assert cache._store["k"]["size"] == _approx_size("from-backend")
+
+
+def test_failing_backend_never_fails_a_request():
+    class Broken(DictBackend):
+        def get(self, key):
+            raise OSError("disk gone")
+
+        def set(self, key, value, ttl):
+            raise OSError("disk gone")
+
+    async def main():
+        return await SimpleTTLCache(backend=Broken()).get_or_set("k", 60, Upstream())
+
+    assert run(main()) == "v1"
+
+
+@pytest.mark.parametrize("value", [{"a": [1, 2]}, "text", 3.5])
+def test_approx_size_is_json_length(value):
+    assert _approx_size(value) == len(dumps(value))
@@ -0,0 +1,27 @@
+"""
+String-similarity helpers shared by the pesticide matcher (pesticides.py)
+and the offline geocoder (geocoder.py): a trigram set for index prefilters
+and an edit-distance ratio to confirm fuzzy matches.
+"""
+from typing import Set
+
+
+def trigrams(s: str) -> Set[str]:
+    """Character trigrams of ``s``, padded so that word starts weigh more."""
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_ratio(a: str, b: str) -> float:
+    """1 - Levenshtein distance / longer length: 1.0 for equal strings, 0.0 if one is empty."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return 1.0 - prev[-1] / max(len(a), len(b))